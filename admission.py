@@ -0,0 +1,255 @@
+# admission.py
+"""
+Control de admisión: limita cuántas peticiones de cada clase se atienden a la vez.
+
+En un pico de tráfico (época de exámenes) las peticiones se acumulan esperando una
+conexión del pool y la latencia de todas sube a la vez. Con este middleware cada clase de
+ruta tiene un presupuesto de peticiones simultáneas y una cola de espera acotada:
+
+- si hay hueco, la petición pasa;
+- si no, espera en la cola (FIFO) como mucho ADMISSION_QUEUE_TIMEOUT segundos;
+- si la cola está llena, o se agota la espera, responde enseguida 503 con Retry-After.
+
+Así las peticiones admitidas mantienen una latencia acotada y el resto falla rápido en
+lugar de agotar el tiempo de espera. Los presupuestos se ajustan con ADMISSION_LIMITS
+(ej. "bank=8:64,write=2:8": concurrencia:cola por clase). /metrics, /admin y / nunca
+se limitan. Los contadores son de cada worker.
+
+Las clases que consultan la base de datos comparten además el presupuesto global "db", del
+tamaño del pool (DB_POOL_SIZE + DB_MAX_OVERFLOW): una petición ocupa primero un hueco de su
+clase y después uno de "db", así que entre todas nunca piden más conexiones de las que hay.
+"""
+from collections import deque
+from typing import Dict, Optional, Tuple
+from dotenv import load_dotenv
+import asyncio
+import json
+import os
+
+from database import DB_MAX_OVERFLOW, DB_POOL_SIZE, env_flag
+
+load_dotenv()
+
+ADMISSION_CONTROL = env_flag("ADMISSION_CONTROL", True)
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2")) # Segundos máximos en la cola
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "1")) # Valor de la cabecera Retry-After
+
+DB_CONNECTIONS = DB_POOL_SIZE + DB_MAX_OVERFLOW
+
+# Presupuestos por defecto: (peticiones simultáneas, tamaño de la cola)
+DEFAULT_LIMITS = {
+    "cached": (256, 512),  # Datos de referencia y snapshots: memoria, sin base de datos
+    "bank": (8, 64),  # /questions/by_licence y /questions/search: respuestas grandes
+    "exams": (16, 128),  # Generación y corrección de exámenes
+    "write": (4, 16),  # POST /questions/ e importaciones
+    "images": (8, 64),  # /images: redimensionar una variante nueva usa CPU
+    "default": (32, 128),
+    "db": (DB_CONNECTIONS, 256),  # Global, compartido por las clases de DB_CLASSES
+}
+# Clases que además ocupan un hueco del presupuesto "db" (las que consultan la base de datos)
+DB_CLASSES = frozenset({"bank", "exams", "write", "default"})
+
+# Reglas (método o None para cualquiera, prefijo de la ruta, clase) en orden de prioridad;
+# clase None = sin límite
+ROUTE_CLASSES = (
+    (None, "/metrics", None),
+    (None, "/admin", None),
+    ("GET", "/questions/by_licence", "bank"),
+    ("GET", "/questions/search", "bank"),
+    ("GET", "/questions/types", "cached"),
+    ("GET", "/questions/cache", "cached"),
+    ("GET", "/versions", "cached"),
+    ("GET", "/licences", "cached"),
+    ("GET", "/snapshots", "cached"),
+    ("GET", "/images", "images"),
+    ("POST", "/questions", "write"),
+    (None, "/exams", "exams"),
+)
+
+
+def parse_limits(value: str) -> Dict[str, tuple]:
+    """Convierte "bank=8:64,write=2:8" en {"bank": (8, 64), "write": (2, 8)}."""
+    limits = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        name, _, budget = item.partition("=")
+        concurrency, _, queue = budget.partition(":")
+        limits[name.strip()] = (int(concurrency), int(queue or 0))
+    return limits
+
+
+class AdmissionClass:
+    """Presupuesto de una clase de rutas: un semáforo con cola FIFO acotada."""
+
+    def __init__(self, name: str, limit: int, queue_size: int):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.active = 0
+        self._waiters = deque()
+        self.admitted = 0
+        self.queued_total = 0
+        self.max_queued = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.waited = 0  # Admitidas después de esperar en la cola
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    async def acquire(self, timeout: float) -> bool:
+        """Ocupa un hueco; False si la cola está llena o se agotó la espera."""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return True
+        if len(self._waiters) >= self.queue_size:
+            self.rejected_queue_full += 1
+            return False
+
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        self._waiters.append(waiter)
+        self.queued_total += 1
+        self.max_queued = max(self.max_queued, len(self._waiters))
+        start = loop.time()
+        try:
+            # El hueco lo cede `release` directamente: `active` no cambia al pasar de uno a otro
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except asyncio.TimeoutError:
+            if waiter.done():  # Se concedió justo al agotarse la espera
+                self.release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            self.rejected_timeout += 1
+            return False
+        except asyncio.CancelledError:  # El cliente se fue mientras esperaba
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            raise
+        waited = loop.time() - start
+        self.waited += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+        self.admitted += 1
+        return True
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(True)
+                return
+        self.active -= 1
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "queue_size": self.queue_size,
+            "active": self.active,
+            "queued": len(self._waiters),
+            "max_queued": self.max_queued,
+            "admitted": self.admitted,
+            "queued_total": self.queued_total,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+            "wait_avg_ms": (self.wait_total / self.waited * 1000) if self.waited else 0.0,
+            "wait_max_ms": self.wait_max * 1000,
+        }
+
+
+class AdmissionController:
+    def __init__(self, limits: Dict[str, tuple], queue_timeout: float = ADMISSION_QUEUE_TIMEOUT):
+        self.queue_timeout = queue_timeout
+        self.classes = {name: AdmissionClass(name, *budget) for name, budget in limits.items()}
+
+    def classify(self, method: str, path: str) -> Optional[AdmissionClass]:
+        if path == "/":
+            return None
+        for rule_method, prefix, name in ROUTE_CLASSES:
+            if (rule_method is None or rule_method == method) and path.startswith(prefix):
+                return self.classes[name] if name is not None else None
+        return self.classes["default"]
+
+    def budgets(self, method: str, path: str) -> Tuple[AdmissionClass, ...]:
+        """Presupuestos que ocupa la petición, en el orden en que se piden (vacío: sin límite)."""
+        admission_class = self.classify(method, path)
+        if admission_class is None:
+            return ()
+        if admission_class.name in DB_CLASSES and "db" in self.classes:
+            return admission_class, self.classes["db"]
+        return (admission_class,)
+
+    async def acquire(self, budgets: Tuple[AdmissionClass, ...]) -> bool:
+        """Ocupa un hueco de cada presupuesto; entre todos esperan como mucho `queue_timeout`."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.queue_timeout
+        acquired = []
+        try:
+            for budget in budgets:
+                if not await budget.acquire(max(0.0, deadline - loop.time())):
+                    break
+                acquired.append(budget)
+            else:
+                return True
+        except asyncio.CancelledError:
+            self.release(acquired)
+            raise
+        self.release(acquired)
+        return False
+
+    def release(self, budgets):
+        for budget in reversed(budgets):
+            budget.release()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": ADMISSION_CONTROL,
+            "queue_timeout_s": self.queue_timeout,
+            "classes": {name: admission_class.stats() for name, admission_class in self.classes.items()},
+        }
+
+
+admission_controller = AdmissionController({
+    **DEFAULT_LIMITS, **parse_limits(os.getenv("ADMISSION_LIMITS", ""))
+})
+
+_REJECTED_BODY = json.dumps(
+    {"detail": "Servidor saturado, inténtelo de nuevo en unos segundos."}, ensure_ascii=False
+).encode("utf-8")
+
+
+class AdmissionMiddleware:
+    """Middleware ASGI que aplica el control de admisión (ver el docstring del módulo)."""
+
+    def __init__(self, app, controller: AdmissionController = admission_controller):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        budgets = self.controller.budgets(scope["method"], scope["path"]) if scope["type"] == "http" else ()
+        if not budgets:
+            await self.app(scope, receive, send)
+            return
+
+        if not await self.controller.acquire(budgets):
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(_REJECTED_BODY)).encode()),
+                    (b"retry-after", str(ADMISSION_RETRY_AFTER).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": _REJECTED_BODY})
+            return
+        try:
+            # El hueco se mantiene hasta enviar la respuesta completa (también en streaming)
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(budgets)
@@ -0,0 +1,78 @@
+"""question counters
+
+Revision ID: 5b8e2d4c9f13
+Revises: d93b5a7f1e60
+Create Date: 2026-10-17 14:05:31.662018
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b8e2d4c9f13'
+down_revision: Union[str, None] = 'd93b5a7f1e60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _renumber_duplicates():
+    """
+    Las creaciones simultáneas con el cálculo anterior (último num + 1) pudieron repetir
+    números. Se conserva el número de la pregunta más antigua de cada grupo y las demás
+    pasan al final del banco de su licencia, en orden de id.
+    """
+    bind = op.get_bind()
+    duplicates = bind.execute(sa.text("""
+        SELECT q.id, q.licence_type_id
+        FROM questions q
+        JOIN (
+            SELECT licence_type_id, num, MIN(id) AS keep_id
+            FROM questions
+            WHERE num IS NOT NULL
+            GROUP BY licence_type_id, num
+            HAVING COUNT(*) > 1
+        ) d ON d.licence_type_id = q.licence_type_id AND d.num = q.num AND q.id <> d.keep_id
+        ORDER BY q.licence_type_id, q.id
+    """)).all()
+    last_nums = dict(bind.execute(sa.text(
+        "SELECT licence_type_id, MAX(num) FROM questions GROUP BY licence_type_id"
+    )).all())
+    for question_id, licence_type_id in duplicates:
+        last_nums[licence_type_id] += 1
+        bind.execute(
+            sa.text("UPDATE questions SET num = :num WHERE id = :id"),
+            {"num": last_nums[licence_type_id], "id": question_id},
+        )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('question_counters',
+    sa.Column('licence_type_id', sa.Integer(), nullable=False),
+    sa.Column('last_num', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['licence_type_id'], ['licence_types.id'], ),
+    sa.PrimaryKeyConstraint('licence_type_id')
+    )
+    _renumber_duplicates()
+    op.execute("""
+        INSERT INTO question_counters (licence_type_id, last_num)
+        SELECT licence_type_id, COALESCE(MAX(num), 0)
+        FROM questions
+        WHERE licence_type_id IS NOT NULL
+        GROUP BY licence_type_id
+    """)
+    # La restricción única sustituye al índice compuesto (crea su propio índice)
+    op.drop_index('ix_questions_licence_type_id_num', table_name='questions')
+    with op.batch_alter_table('questions') as batch_op:
+        batch_op.create_unique_constraint('uq_questions_licence_type_id_num', ['licence_type_id', 'num'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('questions') as batch_op:
+        batch_op.drop_constraint('uq_questions_licence_type_id_num', type_='unique')
+    op.create_index('ix_questions_licence_type_id_num', 'questions', ['licence_type_id', 'num'], unique=False)
+    op.drop_table('question_counters')
@@ -0,0 +1,41 @@
+"""hot query indexes
+
+Revision ID: 7c2e91d4a5b3
+Revises: 39b7cb620195
+Create Date: 2026-10-17 10:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2e91d4a5b3'
+down_revision: Union[str, None] = '39b7cb620195'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Índices que siguen los patrones de acceso de los routers
+    op.create_index('ix_questions_licence_type_id_num', 'questions', ['licence_type_id', 'num'], unique=False)
+    op.create_index(op.f('ix_choices_question_id'), 'choices', ['question_id'], unique=False)
+    op.create_index(op.f('ix_licence_types_version_id'), 'licence_types', ['version_id'], unique=False)
+    # Índices B-tree sobre texto libre y sobre num solo: no los usa ninguna consulta
+    # y encarecen las escrituras (num queda cubierto por el índice compuesto)
+    op.drop_index(op.f('ix_questions_text'), table_name='questions')
+    op.drop_index(op.f('ix_questions_num'), table_name='questions')
+    op.drop_index(op.f('ix_choices_text'), table_name='choices')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(op.f('ix_choices_text'), 'choices', ['text'], unique=False)
+    op.create_index(op.f('ix_questions_num'), 'questions', ['num'], unique=False)
+    op.create_index(op.f('ix_questions_text'), 'questions', ['text'], unique=False)
+    op.drop_index(op.f('ix_licence_types_version_id'), table_name='licence_types')
+    op.drop_index(op.f('ix_choices_question_id'), table_name='choices')
+    op.drop_index('ix_questions_licence_type_id_num', table_name='questions')
@@ -0,0 +1,30 @@
+"""bank generation
+
+Revision ID: 8f4d2b6a1c57
+Revises: e6f1a9c3b7d2
+Create Date: 2026-10-17 18:41:13.208734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8f4d2b6a1c57'
+down_revision: Union[str, None] = 'e6f1a9c3b7d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('question_counters') as batch_op:
+        batch_op.add_column(sa.Column('generation', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('question_counters') as batch_op:
+        batch_op.drop_column('generation')
@@ -0,0 +1,60 @@
+"""attempts
+
+Revision ID: a41f6c0e8d27
+Revises: 7c2e91d4a5b3
+Create Date: 2026-10-17 11:04:09.527731
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a41f6c0e8d27'
+down_revision: Union[str, None] = '7c2e91d4a5b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('attempts',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=True),
+    sa.Column('correct', sa.Integer(), nullable=True),
+    sa.Column('score', sa.Float(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('licence_type_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['licence_type_id'], ['licence_types.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_attempts_id'), 'attempts', ['id'], unique=False)
+    op.create_index(op.f('ix_attempts_licence_type_id'), 'attempts', ['licence_type_id'], unique=False)
+    op.create_table('attempt_answers',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('is_correct', sa.Boolean(), nullable=True),
+    sa.Column('time_ms', sa.Integer(), nullable=True),
+    sa.Column('attempt_id', sa.Integer(), nullable=True),
+    sa.Column('question_id', sa.Integer(), nullable=True),
+    sa.Column('choice_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['attempt_id'], ['attempts.id'], ),
+    sa.ForeignKeyConstraint(['choice_id'], ['choices.id'], ),
+    sa.ForeignKeyConstraint(['question_id'], ['questions.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_attempt_answers_attempt_id'), 'attempt_answers', ['attempt_id'], unique=False)
+    op.create_index(op.f('ix_attempt_answers_id'), 'attempt_answers', ['id'], unique=False)
+    op.create_index(op.f('ix_attempt_answers_question_id'), 'attempt_answers', ['question_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_attempt_answers_question_id'), table_name='attempt_answers')
+    op.drop_index(op.f('ix_attempt_answers_id'), table_name='attempt_answers')
+    op.drop_index(op.f('ix_attempt_answers_attempt_id'), table_name='attempt_answers')
+    op.drop_table('attempt_answers')
+    op.drop_index(op.f('ix_attempts_licence_type_id'), table_name='attempts')
+    op.drop_index(op.f('ix_attempts_id'), table_name='attempts')
+    op.drop_table('attempts')
@@ -0,0 +1,48 @@
+"""question stats
+
+Revision ID: d93b5a7f1e60
+Revises: a41f6c0e8d27
+Create Date: 2026-10-17 11:48:52.104385
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd93b5a7f1e60'
+down_revision: Union[str, None] = 'a41f6c0e8d27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('question_stats',
+    sa.Column('question_id', sa.Integer(), nullable=False),
+    sa.Column('answers', sa.Integer(), nullable=False),
+    sa.Column('mistakes', sa.Integer(), nullable=False),
+    sa.Column('time_total_ms', sa.BigInteger(), nullable=False),
+    sa.Column('timed_answers', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['question_id'], ['questions.id'], ),
+    sa.PrimaryKeyConstraint('question_id')
+    )
+    # Carga inicial a partir de los intentos ya guardados (única vez que se recorren)
+    op.execute("""
+        INSERT INTO question_stats (question_id, answers, mistakes, time_total_ms, timed_answers)
+        SELECT question_id,
+               COUNT(*),
+               SUM(CASE WHEN is_correct THEN 0 ELSE 1 END),
+               COALESCE(SUM(time_ms), 0),
+               COUNT(time_ms)
+        FROM attempt_answers
+        WHERE question_id IS NOT NULL
+        GROUP BY question_id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('question_stats')
@@ -0,0 +1,52 @@
+"""question search
+
+Revision ID: e6f1a9c3b7d2
+Revises: 5b8e2d4c9f13
+Create Date: 2026-10-17 15:22:08.417395
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6f1a9c3b7d2'
+down_revision: Union[str, None] = '5b8e2d4c9f13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Solo Postgres tiene búsqueda de texto completo; en SQLite search.py usa un índice en memoria
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+    # unaccent() no es IMMUTABLE (depende del search_path) y no puede usarse en un índice:
+    # se envuelve fijando el diccionario
+    op.execute("""
+        CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text AS
+        $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    """)
+    # Las expresiones deben coincidir exactamente con question_tsvector() y choice_tsvector()
+    # de search.py, que preseleccionan con estos índices las candidatas de cada búsqueda
+    op.execute("""
+        CREATE INDEX ix_questions_text_fts ON questions
+        USING gin (to_tsvector('spanish'::regconfig, f_unaccent(COALESCE(text, ''))))
+    """)
+    op.execute("""
+        CREATE INDEX ix_choices_text_fts ON choices
+        USING gin (to_tsvector('spanish'::regconfig, f_unaccent(COALESCE(text, ''))))
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("DROP INDEX IF EXISTS ix_choices_text_fts")
+    op.execute("DROP INDEX IF EXISTS ix_questions_text_fts")
+    op.execute("DROP FUNCTION IF EXISTS f_unaccent(text)")
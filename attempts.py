@@ -0,0 +1,172 @@
+# attempts.py
+"""
+Registro de intentos de examen en segundo plano.
+
+Las correcciones se encolan en memoria y un worker las guarda por lotes (un INSERT
+múltiple de intentos, otro de respuestas y un upsert de `question_stats`) cuando se junta ATTEMPT_BATCH_SIZE intentos
+o pasa ATTEMPT_FLUSH_INTERVAL segundos. Si la cola está llena, quien encola espera como
+mucho ATTEMPT_ENQUEUE_TIMEOUT segundos; pasado ese tiempo el intento se descarta (la
+corrección se devuelve igualmente) para no degradar las peticiones. Si un lote falla, sus
+intentos se reintentan uno a uno para que un intento inválido no haga perder los demás.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import List, Optional
+from dotenv import load_dotenv
+from sqlalchemy import insert
+import asyncio
+import logging
+import os
+
+from question_stats import apply_attempt_batch
+import models
+
+load_dotenv()
+
+ATTEMPT_BATCH_SIZE = int(os.getenv("ATTEMPT_BATCH_SIZE", "200"))
+ATTEMPT_FLUSH_INTERVAL = float(os.getenv("ATTEMPT_FLUSH_INTERVAL", "2"))
+ATTEMPT_QUEUE_SIZE = int(os.getenv("ATTEMPT_QUEUE_SIZE", "10000"))
+ATTEMPT_ENQUEUE_TIMEOUT = float(os.getenv("ATTEMPT_ENQUEUE_TIMEOUT", "0.5"))
+
+logger = logging.getLogger("attempts")
+
+_STOP = object()  # Marca de fin para el worker
+
+
+@dataclass
+class PendingAttempt:
+    licence_type_id: int
+    total: int
+    correct: int
+    score: float
+    answers: List[dict]  # question_id, choice_id, is_correct, time_ms
+    created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
+
+
+class AttemptRecorder:
+    def __init__(
+        self,
+        batch_size: int = ATTEMPT_BATCH_SIZE,
+        flush_interval: float = ATTEMPT_FLUSH_INTERVAL,
+        max_queue: int = ATTEMPT_QUEUE_SIZE,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.recorded = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    def start(self):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._stopping = False
+            self._worker = asyncio.create_task(self._run())
+
+    async def record(self, attempt: PendingAttempt, timeout: float = ATTEMPT_ENQUEUE_TIMEOUT) -> bool:
+        """Encola un intento. Devuelve False si se descartó (cola llena o apagándose)."""
+        if self._stopping:
+            self.dropped += 1
+            return False
+        self.start()
+        try:
+            await asyncio.wait_for(self._queue.put(attempt), timeout)
+        except asyncio.TimeoutError:
+            self.dropped += 1
+            logger.warning("Cola de intentos llena (%d); se descarta un intento", self._queue.qsize())
+            return False
+        return True
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+            if stop:
+                return
+
+    async def _write(self, batch: List[PendingAttempt]):
+        """Guarda el lote en una sola transacción (intentos, respuestas y question_stats)."""
+        from database import AsyncSessionLocal
+
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                insert(models.Attempt).returning(models.Attempt.id, sort_by_parameter_order=True),
+                [
+                    {
+                        "licence_type_id": attempt.licence_type_id,
+                        "total": attempt.total,
+                        "correct": attempt.correct,
+                        "score": attempt.score,
+                        "created_at": attempt.created_at,
+                    }
+                    for attempt in batch
+                ],
+            )
+            answer_rows = [
+                {**answer, "attempt_id": attempt_id}
+                for attempt_id, attempt in zip(result.scalars().all(), batch)
+                for answer in attempt.answers
+            ]
+            if answer_rows:
+                await db.execute(insert(models.AttemptAnswer), answer_rows)
+            # Los contadores de dificultad se actualizan en la misma transacción
+            await apply_attempt_batch(db, batch)
+            await db.commit()
+
+    async def _flush(self, batch: List[PendingAttempt]):
+        try:
+            await self._write(batch)
+        except Exception as e:
+            if len(batch) == 1:
+                self.failed += 1
+                logger.error("No se pudo guardar un intento: %s", e)
+                return
+            # Un intento inválido no debe hacer perder el lote entero: se reintenta uno a uno
+            logger.warning("Falló el lote de %d intentos (%s); se guardan uno a uno", len(batch), e)
+            for attempt in batch:
+                await self._flush([attempt])
+            return
+        self.recorded += len(batch)
+        self.batches += 1
+
+    async def stop(self):
+        """Deja de aceptar intentos y guarda todo lo que quede en la cola."""
+        self._stopping = True
+        if self._worker is None or self._worker.done():
+            return
+        await self._queue.put(_STOP)
+        await self._worker
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "recorded": self.recorded,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "batches": self.batches,
+        }
+
+
+attempt_recorder = AttemptRecorder()
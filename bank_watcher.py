@@ -0,0 +1,91 @@
+# bank_watcher.py
+"""
+Invalidación entre procesos de las cachés del banco de preguntas.
+
+Cada escritura en el banco incrementa la generación de su licencia en la misma transacción
+(question_counters.generation, ver question_numbering.py). Quien escribe invalida al momento
+las cachés de su propio proceso; los cambios hechos por otros procesos (otros workers con
+la caché en memoria o `python -m importer` por línea de comandos) los detecta este vigilante,
+que consulta las generaciones cada BANK_WATCH_SECONDS e invalida las licencias que cambiaron.
+Con la caché del banco se invalidan también los índices de exámenes y de búsqueda y las
+claves de respuesta, que se reconstruyen cuando cambia su revisión.
+"""
+from typing import Dict, Optional
+from dotenv import load_dotenv
+import asyncio
+import logging
+import os
+import time
+
+from cache import question_bank_cache
+from question_numbering import bank_generations
+from snapshots import snapshot_store
+
+load_dotenv()
+
+logger = logging.getLogger("bank_watcher")
+
+# Cada cuánto (segundos) se comprueban las generaciones; 0 desactiva la comprobación periódica
+BANK_WATCH_SECONDS = float(os.getenv("BANK_WATCH_SECONDS", "5"))
+
+
+class BankWatcher:
+    """Compara periódicamente las generaciones del banco con las vistas por este proceso."""
+
+    def __init__(self, interval: float = BANK_WATCH_SECONDS):
+        self.interval = interval
+        self._generations: Optional[Dict[int, int]] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.checked_at: Optional[float] = None
+        self.invalidations = 0
+        self.failures = 0
+
+    async def check(self):
+        """Lee las generaciones del primario e invalida las licencias que cambiaron desde la última lectura."""
+        from database import AsyncSessionLocal
+
+        # Siempre del primario: una réplica retrasada no mostraría todavía el cambio
+        async with AsyncSessionLocal() as db:
+            generations = await bank_generations(db)
+        if self._generations is not None:
+            for licence_id, generation in generations.items():
+                if generation != self._generations.get(licence_id, 0):
+                    question_bank_cache.invalidate(licence_id)
+                    snapshot_store.discard(licence_id)
+                    self.invalidations += 1
+        self._generations = generations
+        self.checked_at = time.time()
+
+    def start(self):
+        if self.interval > 0 and (self._worker is None or self._worker.done()):
+            self._worker = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                await self.check()
+            except Exception as e:
+                self.failures += 1
+                logger.error("No se pudieron comprobar las generaciones del banco: %s", e)
+            await asyncio.sleep(self.interval)
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    def stats(self) -> dict:
+        return {
+            "interval_seconds": self.interval,
+            "checked_at": self.checked_at,
+            "licences": len(self._generations or {}),
+            "invalidations": self.invalidations,
+            "failures": self.failures,
+        }
+
+
+bank_watcher = BankWatcher()
@@ -0,0 +1,117 @@
+# benchmarks/bench_async.py
+"""
+Compara el patrón anterior (sesión síncrona dentro de un handler `async def`) con la
+sesión asíncrona de database.py, bajo peticiones concurrentes.
+
+Cada consulta añade una latencia artificial en la base de datos (pg_sleep en Postgres,
+una función sleep_ms registrada en SQLite) para simular un round-trip lento.
+
+Uso:
+    python -m benchmarks.bench_async --requests 200 --concurrency 20 --delay-ms 20
+    DATABASE_URL=postgresql://... python -m benchmarks.bench_async
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "ant_bench.db"))
+
+from fastapi import Depends, FastAPI
+from sqlalchemy import event, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+import httpx
+
+from benchmarks.seed import seed
+from database import URL_DATABASE, async_engine, engine, get_async_db, get_db
+import models
+
+
+def install_sleep_function():
+    """Registra sleep_ms(ms) en cada conexión SQLite (síncrona y asíncrona)."""
+    def register(dbapi_connection, connection_record):
+        dbapi_connection.create_function("sleep_ms", 1, lambda ms: time.sleep(ms / 1000) or 0)
+
+    for sync_engine in (engine, async_engine.sync_engine):
+        if sync_engine.dialect.name == "sqlite":
+            event.listen(sync_engine, "connect", register)
+
+
+def latency_clause(delay_ms: int):
+    if engine.dialect.name == "postgresql":
+        return text(f"pg_sleep({delay_ms / 1000})")
+    return text(f"sleep_ms({delay_ms})")
+
+
+def build_app(delay_ms: int) -> FastAPI:
+    app = FastAPI()
+    licence_query = select(models.LicenceType.id, latency_clause(delay_ms)).where(models.LicenceType.id == 1)
+
+    @app.get("/blocking")
+    async def blocking(db: Session = Depends(get_db)):
+        # Patrón anterior: la consulta bloquea el event loop mientras espera a la BD
+        return {"rows": len(db.execute(licence_query).all())}
+
+    @app.get("/async")
+    async def non_blocking(db: AsyncSession = Depends(get_async_db)):
+        result = await db.execute(licence_query)
+        return {"rows": len(result.all())}
+
+    return app
+
+
+async def run(app: FastAPI, path: str, requests: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def one():
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(path)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        await one()  # Calentamiento: abre la primera conexión del pool
+        latencies.clear()
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "path": path,
+        "requests": requests,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la capa de base de datos síncrona vs asíncrona.")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--delay-ms", type=int, default=20)
+    parser.add_argument("--no-seed", action="store_true", help="Usa la base de datos existente sin reiniciarla")
+    args = parser.parse_args()
+
+    if not args.no_seed:
+        seed(URL_DATABASE, questions=10)
+    install_sleep_function()
+    app = build_app(args.delay_ms)
+
+    results = [
+        asyncio.run(run(app, path, args.requests, args.concurrency))
+        for path in ("/blocking", "/async")
+    ]
+    print(json.dumps({"database": engine.dialect.name, "delay_ms": args.delay_ms, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
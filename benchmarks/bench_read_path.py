@@ -0,0 +1,132 @@
+# benchmarks/bench_read_path.py
+"""
+Compara las dos lecturas del banco completo de una licencia (GET /questions/by_licence/{id}
+sin caché):
+
+- orm: objetos del ORM con joinedload y validación/serialización con Pydantic
+  (`render_question_bank_orm`, la lectura anterior).
+- core: una consulta de Core con las opciones agregadas en JSON por la base de datos
+  (`render_question_bank`).
+
+Para cada formato informa del tiempo de CPU y de reloj por petición (mediana y p95) y del
+pico de memoria asignada por petición (tracemalloc, en pasadas aparte porque lo ralentiza).
+Antes de medir comprueba que ambas lecturas devuelven el mismo JSON.
+
+Uso:
+    python -m benchmarks.bench_read_path --questions 2000 --iterations 30
+    DATABASE_URL=postgresql://... python -m benchmarks.bench_read_path --no-seed
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "ant_read_path.db"))
+
+from benchmarks.seed import seed
+from database import URL_DATABASE, AsyncSessionLocal, async_engine
+from question_bank import render_question_bank, render_question_bank_orm
+
+PATHS = {"orm": render_question_bank_orm, "core": render_question_bank}
+VARIANTS = {
+    "full": ("full", None),
+    "full_fields": ("full", ("id", "text", "choices")),
+    "compact": ("compact", None),
+}
+
+
+def _normalized(body: bytes):
+    # La lectura del ORM no fija el orden de preguntas ni opciones
+    data = json.loads(body)
+    questions = data["questions"] if isinstance(data, dict) else data
+    questions.sort(key=lambda question: question["id"])
+    for question in questions:
+        if "choices" in question:
+            question["choices"].sort(key=lambda choice: choice["id"])
+    return data
+
+
+async def check_equal(licence_id: int):
+    async with AsyncSessionLocal() as db:
+        for name, (fmt, fields) in VARIANTS.items():
+            orm = await render_question_bank_orm(db, licence_id, fmt, fields)
+            core = await render_question_bank(db, licence_id, fmt, fields)
+            if _normalized(orm) != _normalized(core):
+                raise AssertionError(f"Las lecturas orm y core no coinciden en el formato {name}")
+
+
+async def measure(render, licence_id: int, fmt: str, fields, iterations: int, memory_iterations: int) -> dict:
+    cpu, wall, peaks = [], [], []
+    size = 0
+    async with AsyncSessionLocal() as db:
+        await render(db, licence_id, fmt, fields)  # Calentamiento (conexión y compilación de la consulta)
+        for _ in range(iterations):
+            cpu_start, wall_start = time.process_time(), time.perf_counter()
+            size = len(await render(db, licence_id, fmt, fields))
+            cpu.append((time.process_time() - cpu_start) * 1000)
+            wall.append((time.perf_counter() - wall_start) * 1000)
+            db.expunge_all()  # Cada petición real empieza con una sesión vacía
+
+        for _ in range(memory_iterations):
+            tracemalloc.start()
+            await render(db, licence_id, fmt, fields)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            db.expunge_all()
+
+    def summary(samples):
+        ordered = sorted(samples)
+        return {
+            "median": round(statistics.median(ordered), 3),
+            "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+        }
+
+    return {
+        "cpu_ms": summary(cpu),
+        "wall_ms": summary(wall),
+        "peak_memory_kb": round(statistics.median(peaks) / 1024, 1) if peaks else None,
+        "bytes": size,
+    }
+
+
+async def main_async(args) -> dict:
+    await check_equal(args.licence)
+    results = {}
+    for name, (fmt, fields) in VARIANTS.items():
+        results[name] = {
+            path: await measure(render, args.licence, fmt, fields, args.iterations, args.memory_iterations)
+            for path, render in PATHS.items()
+        }
+        orm, core = results[name]["orm"], results[name]["core"]
+        results[name]["speedup_cpu"] = round(orm["cpu_ms"]["median"] / (core["cpu_ms"]["median"] or 1e-9), 2)
+        if orm["peak_memory_kb"] and core["peak_memory_kb"]:
+            results[name]["memory_ratio"] = round(orm["peak_memory_kb"] / core["peak_memory_kb"], 2)
+    await async_engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la lectura del banco de preguntas: ORM frente a Core.")
+    parser.add_argument("--questions", type=int, default=2000, help="Preguntas por licencia al sembrar")
+    parser.add_argument("--licence", type=int, default=1)
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--memory-iterations", type=int, default=3)
+    parser.add_argument("--no-seed", action="store_true", help="Usa la base de datos existente sin reiniciarla")
+    args = parser.parse_args()
+
+    if not args.no_seed:
+        seed(URL_DATABASE, licences=2, questions=args.questions)
+    results = asyncio.run(main_async(args))
+    print(json.dumps({
+        "database": async_engine.dialect.name,
+        "questions": None if args.no_seed else args.questions,
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
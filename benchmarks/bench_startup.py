@@ -0,0 +1,111 @@
+# benchmarks/bench_startup.py
+"""
+Mide el arranque en frío de un worker: el tiempo desde que se lanza uvicorn hasta que
+responde la primera petición, y la latencia de esa primera petición a los endpoints de
+datos de referencia.
+
+Compara el arranque con create_all (DB_CREATE_ALL=1, el comportamiento anterior en
+cada arranque) y sin él (producción: el esquema lo gestiona Alembic).
+
+Uso:
+    python -m benchmarks.bench_startup --runs 5
+    DATABASE_URL=postgresql://... python -m benchmarks.bench_startup --no-seed
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "ant_bench.db"))
+
+import httpx
+
+from benchmarks.seed import seed
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIRST_REQUESTS = ("/versions/", "/questions/types/", "/licences/by_version/1")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def launch_server(extra_env: dict, timeout: float = 30.0):
+    """
+    Lanza `uvicorn main:app` en un puerto libre y espera a que responda GET /.
+    Devuelve (proceso, URL base, segundos hasta la primera respuesta).
+    """
+    port = free_port()
+    env = {
+        **os.environ,
+        "RAILWAY_ENVIRONMENT": "production",  # Sin redirección a HTTPS
+        **extra_env,
+    }
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    with httpx.Client(base_url=base_url) as client:
+        while True:
+            if time.perf_counter() - start > timeout or process.poll() is not None:
+                process.terminate()
+                raise RuntimeError("El servidor no respondió a tiempo")
+            try:
+                client.get("/").raise_for_status()
+                break
+            except httpx.TransportError:
+                time.sleep(0.005)
+    return process, base_url, time.perf_counter() - start
+
+
+def measure_once(create_all: bool) -> dict:
+    process, base_url, ready = launch_server({"DB_CREATE_ALL": "1" if create_all else "0"})
+    try:
+        first = {}
+        with httpx.Client(base_url=base_url) as client:
+            for path in FIRST_REQUESTS:
+                request_start = time.perf_counter()
+                client.get(path).raise_for_status()
+                first[path] = (time.perf_counter() - request_start) * 1000
+    finally:
+        process.terminate()
+        process.wait()
+    return {"ready_ms": ready * 1000, "first_request_ms": first}
+
+
+def summarize(samples: list) -> dict:
+    return {
+        "ready_ms_median": round(statistics.median(s["ready_ms"] for s in samples), 1),
+        "first_request_ms_median": {
+            path: round(statistics.median(s["first_request_ms"][path] for s in samples), 2)
+            for path in FIRST_REQUESTS
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del tiempo hasta la primera petición.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--no-seed", action="store_true", help="Usa la base de datos existente sin reiniciarla")
+    args = parser.parse_args()
+
+    if not args.no_seed:
+        seed(os.environ["DATABASE_URL"], questions=10)
+
+    results = {}
+    for label, create_all in (("create_all", True), ("warm_start", False)):
+        results[label] = summarize([measure_once(create_all) for _ in range(args.runs)])
+    print(json.dumps({"runs": args.runs, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
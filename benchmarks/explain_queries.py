@@ -0,0 +1,127 @@
+# benchmarks/explain_queries.py
+"""
+Ejecuta EXPLAIN sobre las consultas de los routers contra una base de datos sembrada
+y marca las que recorren una tabla completa (Seq Scan en Postgres, SCAN en SQLite).
+
+En Postgres se desactiva enable_seqscan: si aun así el plan usa Seq Scan, es que no hay
+ningún índice que sirva para esa consulta (con tablas pequeñas el planificador preferiría
+un Seq Scan aunque el índice exista).
+
+Uso:
+    python -m benchmarks.explain_queries [--no-seed]
+    DATABASE_URL=postgresql://... python -m benchmarks.explain_queries
+
+La búsqueda de texto completo solo se comprueba en Postgres con el esquema de las
+migraciones (los índices GIN no están en models.py): sembrar la base migrada y usar --no-seed.
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "ant_explain.db"))
+
+from sqlalchemy import inspect, select, text
+from sqlalchemy.orm import joinedload
+
+from benchmarks.seed import seed
+from database import URL_DATABASE, engine
+from question_bank import page_queries, question_records_query
+from question_index import answer_key_query, licence_index_query
+from question_numbering import increment_statement
+from question_stats import difficulty_query
+from search import query_terms, query_tree, search_statement
+import models
+
+
+def router_queries(connection):
+    """
+    (nombre, consulta, requiere_índice). Las consultas que leen una tabla de referencia
+    completa (sin filtro) pueden recorrerla entera sin problema. Las del banco se construyen
+    con las mismas funciones que usa la aplicación.
+    """
+    dialect_name = engine.dialect.name
+    queries = [
+        ("versions.get_all_versions", select(models.Version), False),
+        ("questions.get_all_question_types", select(models.QuestionType), False),
+        ("licences.get_licences_by_version_id", (
+            select(models.LicenceType)
+            .options(joinedload(models.LicenceType.version), joinedload(models.LicenceType.type))
+            .where(models.LicenceType.version_id == 1)
+        ), True),
+        ("licences.get_single_licence", (
+            select(models.LicenceType)
+            .options(joinedload(models.LicenceType.version), joinedload(models.LicenceType.type))
+            .where(models.LicenceType.id == 1)
+        ), True),
+        ("question_bank.load_question_records", question_records_query(1, dialect_name), True),
+        ("question_bank.page_queries (numeradas, con cursor)", page_queries(1, (100, 100))[0].limit(100), True),
+        ("question_bank.page_queries (sin número, con cursor)", page_queries(1, (None, 100))[0].limit(100), True),
+        ("question_index.get_licence_index", licence_index_query(1), True),
+        ("question_index.get_answer_key", answer_key_query(1), True),
+        ("exams.generate_exam", (
+            select(models.Question)
+            .options(joinedload(models.Question.choices), joinedload(models.Question.question_type))
+            .where(models.Question.id.in_([1, 2, 3]))
+        ), True),
+        ("question_numbering.allocate_nums", increment_statement(1, 50), True),
+        ("question_stats.get_licence_difficulty", difficulty_query(1), True),
+    ]
+    indexes = {index["name"] for index in inspect(connection).get_indexes("questions")}
+    if dialect_name == "postgresql" and "ix_questions_text_fts" not in indexes:
+        # create_all no crea f_unaccent ni los índices GIN: los crea la migración de búsqueda
+        print("Búsqueda omitida: faltan los índices GIN (alembic upgrade head y --no-seed)")
+    elif dialect_name == "postgresql":
+        # "pregunta" está en todas las preguntas, "17" en pocas y la frase solo en las opciones
+        for query in ("pregunta 17", '"opción 3" pregunta 17'):
+            terms, match_any = query_terms(connection.scalar(query_tree(query)))
+            statement, rank = search_statement(query, 1, None, terms, match_any)
+            queries.append((f"search._search_postgres ({query})", statement.order_by(rank.desc()).limit(20), True))
+    return queries
+
+
+def explain(connection, statement) -> list:
+    sql = str(statement.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+    if engine.dialect.name == "sqlite":
+        return [row[-1] for row in connection.execute(text("EXPLAIN QUERY PLAN " + sql))]
+    return [row[0] for row in connection.execute(text("EXPLAIN " + sql))]
+
+
+def is_full_scan(plan_line: str) -> bool:
+    if engine.dialect.name == "sqlite":
+        # "SCAN questions" es un recorrido completo; "SCAN ... USING (COVERING) INDEX" no
+        return plan_line.startswith("SCAN ") and "INDEX" not in plan_line
+    return "Seq Scan" in plan_line
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN de las consultas de los routers.")
+    parser.add_argument("--no-seed", action="store_true", help="Usa la base de datos existente sin reiniciarla")
+    parser.add_argument("--questions", type=int, default=2000)
+    args = parser.parse_args()
+
+    if not args.no_seed:
+        seed(URL_DATABASE, licences=4, questions=args.questions)
+
+    flagged = 0
+    with engine.connect() as connection:
+        if engine.dialect.name == "postgresql":
+            connection.execute(text("ANALYZE"))
+            connection.execute(text("SET enable_seqscan = off"))
+        for name, statement, needs_index in router_queries(connection):
+            plan = explain(connection, statement)
+            scans = [line for line in plan if is_full_scan(line)]
+            status = "OK"
+            if scans:
+                status = "SEQ SCAN" if needs_index else "seq scan (esperado)"
+                flagged += int(needs_index)
+            print(f"[{status}] {name}")
+            for line in plan:
+                print(f"    {line}")
+
+    print(f"\n{flagged} consulta(s) con recorridos completos inesperados")
+    sys.exit(1 if flagged else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+# benchmarks/run.py
+"""
+Prueba de carga de la aplicación real contra un banco de preguntas sintético.
+
+Siembra la base de datos con benchmarks/seed.py, lanza peticiones concurrentes a cada
+ruta de routers/ y mide latencia (p50/p95/p99), throughput y consultas SQL por petición
+(cabecera X-Query-Count, METRICS_DEBUG_HEADERS=1). No necesita red:
+
+- asgi: la aplicación en el mismo proceso, con httpx.ASGITransport (sin HTTP real).
+- uvicorn: un servidor uvicorn en un puerto local, con HTTP real.
+
+El resultado se escribe en JSON; con --baseline se compara con una ejecución anterior
+(por ejemplo, la del commit previo).
+
+Uso:
+    python -m benchmarks.run --questions 500 --requests 300 --concurrency 20
+    python -m benchmarks.run --mode asgi --output bench.json --baseline bench-main.json
+    DATABASE_URL=postgresql://... python -m benchmarks.run --no-seed
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "ant_bench.db"))
+# Variables que la aplicación lee al importarse: deben fijarse antes de importar main
+APP_ENV = {
+    "RAILWAY_ENVIRONMENT": "production",  # Sin redirección a HTTPS
+    "METRICS_DEBUG_HEADERS": "1",
+    "DB_CREATE_ALL": "0",
+    "IMAGE_UPLOADER": "local",
+    "UPLOAD_DIR": os.path.join(tempfile.gettempdir(), "ant_bench_media"),
+    "SNAPSHOT_DIR": os.path.join(tempfile.gettempdir(), "ant_bench_snapshots"),
+}
+os.environ.update(APP_ENV)
+
+import httpx
+from PIL import Image
+
+from benchmarks.bench_startup import REPO_ROOT, launch_server
+from benchmarks.seed import seed
+from images import IMAGE_VARIANT_WIDTHS, variant_url
+
+
+def scenarios(ctx: dict, include_writes: bool) -> list:
+    """
+    (nombre, método, ruta de la plantilla, función que construye los argumentos de httpx).
+    La ruta de la plantilla es la de FastAPI, para comprobar que se cubren todas.
+    """
+    licence_id, version_id = ctx["licence_id"], ctx["version_id"]
+    items = [
+        ("versions", "GET", "/versions/", lambda i: {"url": "/versions/"}),
+        ("licences_by_version", "GET", "/licences/by_version/{version_id}",
+         lambda i: {"url": f"/licences/by_version/{version_id}"}),
+        ("licence", "GET", "/licences/{licence_id}", lambda i: {"url": f"/licences/{licence_id}"}),
+        ("question_types", "GET", "/questions/types/", lambda i: {"url": "/questions/types/"}),
+        ("questions_by_licence", "GET", "/questions/by_licence/{licence_id}",
+         lambda i: {"url": f"/questions/by_licence/{licence_id}"}),
+        ("questions_by_licence_compact", "GET", "/questions/by_licence/{licence_id}",
+         lambda i: {"url": f"/questions/by_licence/{licence_id}?format=compact"}),
+        ("questions_by_licence_page", "GET", "/questions/by_licence/{licence_id}",
+         lambda i: {"url": f"/questions/by_licence/{licence_id}?limit=50&after={(i * 50) % ctx['questions']}"}),
+        ("questions_by_licence_stream", "GET", "/questions/by_licence/{licence_id}",
+         lambda i: {"url": f"/questions/by_licence/{licence_id}?stream=true"}),
+        ("question_search", "GET", "/questions/search",
+         lambda i: {"url": f"/questions/search?q=señales+{i % ctx['questions'] + 1}&version_id={version_id}"}),
+        ("question_cache_stats", "GET", "/questions/cache/stats", lambda i: {"url": "/questions/cache/stats"}),
+        ("question_stats", "GET", "/questions/stats/by_licence/{licence_id}",
+         lambda i: {"url": f"/questions/stats/by_licence/{licence_id}"}),
+        ("exam_generate", "GET", "/exams/generate",
+         lambda i: {"url": f"/exams/generate?licence_id={licence_id}&n=20&seed={i}"}),
+        ("exam_generate_adaptive", "POST", "/exams/generate/adaptive",
+         lambda i: {"url": "/exams/generate/adaptive", "json": {
+             "licence_id": licence_id, "n": 20, "seed": i,
+             "type_mistake_rates": {"1": 0.6},
+             "missed_question_ids": [answer["question_id"] for answer in ctx["answers"][:5]],
+         }}),
+        ("exam_grade", "POST", "/exams/grade",
+         lambda i: {"url": "/exams/grade?record=false", "json": {"licence_id": licence_id, "answers": ctx["answers"]}}),
+        ("exam_grade_record", "POST", "/exams/grade",
+         lambda i: {"url": "/exams/grade", "json": {"licence_id": licence_id, "answers": ctx["answers"]}}),
+        ("snapshot_manifest", "GET", "/snapshots/", lambda i: {"url": "/snapshots/"}),
+        ("snapshot_file", "GET", "/snapshots/{filename}",
+         lambda i: {"url": f"/snapshots/{ctx['snapshot_file']}", "headers": {"Accept-Encoding": "gzip"}}),
+        ("admin_db_pool", "GET", "/admin/db-pool", lambda i: {"url": "/admin/db-pool"}),
+        ("admin_uploads", "GET", "/admin/uploads", lambda i: {"url": "/admin/uploads"}),
+        ("admin_attempts", "GET", "/admin/attempts", lambda i: {"url": "/admin/attempts"}),
+        ("admin_reference", "GET", "/admin/reference", lambda i: {"url": "/admin/reference"}),
+        ("admin_admission", "GET", "/admin/admission", lambda i: {"url": "/admin/admission"}),
+        ("admin_db_replicas", "GET", "/admin/db-replicas", lambda i: {"url": "/admin/db-replicas"}),
+        ("admin_images", "GET", "/admin/images", lambda i: {"url": "/admin/images"}),
+        ("admin_bank_watcher", "GET", "/admin/bank-watcher", lambda i: {"url": "/admin/bank-watcher"}),
+        ("image_variant", "GET", "/images/{width}",
+         lambda i: {"url": ctx["image_variant"], "headers": {"Accept": "image/webp,*/*"}}),
+    ]
+    if include_writes:
+        # Escriben en la base de datos e invalidan las cachés de la licencia
+        items += [
+            ("create_question", "POST", "/questions/", lambda i: {"url": "/questions/", "data": {
+                "text": f"Pregunta de carga {i}",
+                "licence_type_id": licence_id,
+                "question_type_id": 1,
+                "choices_json": json.dumps([{"text": "Sí", "is_correct": True}, {"text": "No"}]),
+            }}),
+            ("import_questions", "POST", "/questions/import", lambda i: {
+                "url": "/questions/import?dry_run=true",  # El formato sale de la extensión del archivo
+                "files": {"file": ("bench.jsonl", json.dumps({
+                    "text": f"Importada {i}", "licence_type_id": licence_id, "question_type_id": 1,
+                    "choices": [{"text": "Sí", "is_correct": True}, {"text": "No"}],
+                }).encode(), "application/json")},
+            }),
+            ("admin_snapshots_build", "POST", "/admin/snapshots/build", lambda i: {"url": "/admin/snapshots/build"}),
+            ("admin_reference_refresh", "POST", "/admin/reference/refresh",
+             lambda i: {"url": "/admin/reference/refresh"}),
+            ("admin_db_replicas_check", "POST", "/admin/db-replicas/check",
+             lambda i: {"url": "/admin/db-replicas/check"}),
+            ("admin_bank_watcher_check", "POST", "/admin/bank-watcher/check",
+             lambda i: {"url": "/admin/bank-watcher/check"}),
+        ]
+    return items
+
+
+def router_routes(app) -> set:
+    """(método, ruta) de todos los endpoints definidos en routers/."""
+    routes = set()
+    for route in app.routes:
+        endpoint = getattr(route, "endpoint", None)
+        if endpoint is not None and endpoint.__module__.startswith("routers."):
+            for method in route.methods:
+                routes.add((method, route.path))
+    return routes
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def run_scenario(client: httpx.AsyncClient, method: str, build, requests: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, queries = [], []
+    errors = 0
+
+    async def one(i: int):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.request(method, **build(i))
+            await response.aread()
+            latencies.append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            errors += 1
+        if "x-query-count" in response.headers:
+            queries.append(int(response.headers["x-query-count"]))
+
+    await one(-1)  # Calentamiento: cachés, índices en memoria y primera conexión del pool
+    latencies.clear()
+    queries.clear()
+    errors = 0
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "queries_per_request": round(sum(queries) / len(queries), 2) if queries else None,
+    }
+
+
+async def prepare_context(client: httpx.AsyncClient, questions: int) -> dict:
+    """
+    Datos que necesitan los escenarios: ids existentes, respuestas de un examen, un snapshot
+    y una imagen local para /images.
+    """
+    versions = (await client.get("/versions/")).json()
+    version_id = versions[0]["id"]
+    licence_id = (await client.get(f"/licences/by_version/{version_id}")).json()[0]["id"]
+    exam = (await client.get(f"/exams/generate?licence_id={licence_id}&n=20&seed=1")).json()
+    answers = [
+        {"question_id": question["id"], "choice_id": question["choices"][0]["id"], "time_ms": 5000}
+        for question in exam["questions"]
+    ]
+    manifest = (await client.post("/admin/snapshots/build")).json()
+    snapshot_file = manifest["licences"][str(licence_id)]["file"]
+    os.makedirs(APP_ENV["UPLOAD_DIR"], exist_ok=True)
+    Image.new("RGB", (1600, 900), (30, 90, 160)).save(os.path.join(APP_ENV["UPLOAD_DIR"], "bench.jpg"), "JPEG")
+    return {
+        "version_id": version_id,
+        "licence_id": licence_id,
+        "questions": questions,
+        "answers": answers,
+        "snapshot_file": snapshot_file,
+        "image_variant": variant_url("/media/bench.jpg", IMAGE_VARIANT_WIDTHS[0]),
+    }
+
+
+async def run_all(client: httpx.AsyncClient, args, covered: list) -> dict:
+    ctx = await prepare_context(client, args.questions)
+    results = {}
+    for name, method, route, build in scenarios(ctx, args.writes):
+        if args.only and name not in args.only:
+            continue
+        result = await run_scenario(client, method, build, args.requests, args.concurrency)
+        results[name] = {"method": method, "route": route, **result}
+        covered.append((method, route))
+        print(f"  {name}: p95={result['p95_ms']}ms rps={result['throughput_rps']} "
+              f"queries={result['queries_per_request']} errors={result['errors']}", file=sys.stderr)
+    return results
+
+
+async def run_asgi(args, covered: list) -> dict:
+    import main as app_module
+
+    app = app_module.app
+    # ASGITransport no ejecuta el lifespan: se ejecuta aquí para tener el mismo arranque
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            results = await run_all(client, args, covered)
+    from database import async_engine
+    await async_engine.dispose()
+    return results
+
+
+def run_uvicorn(args, covered: list) -> dict:
+    process, base_url, _ = launch_server(APP_ENV)
+    try:
+        async def go():
+            limits = httpx.Limits(max_connections=args.concurrency)
+            async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+                return await run_all(client, args, covered)
+        return asyncio.run(go())
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results: dict, baseline: dict) -> list:
+    """Diferencias de p95 y throughput respecto a una ejecución anterior (en %)."""
+    lines = []
+    for mode, scenarios_results in results["results"].items():
+        previous_mode = baseline.get("results", {}).get(mode, {})
+        for name, current in scenarios_results.items():
+            previous = previous_mode.get(name)
+            if previous is None:
+                continue
+            p95_delta = (current["p95_ms"] - previous["p95_ms"]) / previous["p95_ms"] * 100 if previous["p95_ms"] else 0.0
+            rps_delta = ((current["throughput_rps"] - previous["throughput_rps"]) / previous["throughput_rps"] * 100
+                         if previous["throughput_rps"] else 0.0)
+            lines.append(f"{mode}/{name}: p95 {previous['p95_ms']} -> {current['p95_ms']} ms ({p95_delta:+.1f}%), "
+                         f"rps {previous['throughput_rps']} -> {current['throughput_rps']} ({rps_delta:+.1f}%)")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de todas las rutas de routers/.")
+    parser.add_argument("--mode", choices=["asgi", "uvicorn", "both"], default="both")
+    parser.add_argument("--requests", type=int, default=200, help="Peticiones por escenario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--versions", type=int, default=1)
+    parser.add_argument("--licences", type=int, default=4)
+    parser.add_argument("--question-types", type=int, default=5)
+    parser.add_argument("--questions", type=int, default=500, help="Preguntas por licencia")
+    parser.add_argument("--choices", type=int, default=4)
+    parser.add_argument("--writes", action="store_true", help="Incluye también las rutas que escriben")
+    parser.add_argument("--only", nargs="*", help="Ejecuta solo estos escenarios")
+    parser.add_argument("--no-seed", action="store_true", help="Usa la base de datos existente sin reiniciarla")
+    parser.add_argument("--output", help="Archivo donde guardar el JSON (por defecto, stdout)")
+    parser.add_argument("--baseline", help="JSON de una ejecución anterior con el que comparar")
+    args = parser.parse_args()
+
+    url = os.environ["DATABASE_URL"]
+    counts = None
+    if not args.no_seed:
+        counts = seed(url, args.versions, args.licences, args.question_types, args.questions, args.choices)
+
+    from main import app
+    from database import engine
+
+    covered = []
+    results = {}
+    if args.mode in ("asgi", "both"):
+        print("asgi:", file=sys.stderr)
+        results["asgi"] = asyncio.run(run_asgi(args, covered))
+    if args.mode in ("uvicorn", "both"):
+        print("uvicorn:", file=sys.stderr)
+        results["uvicorn"] = run_uvicorn(args, covered)
+
+    output = {
+        "meta": {
+            "commit": git_commit(),
+            "database": engine.dialect.name,
+            "python": platform.python_version(),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "seed": counts,
+        },
+        "results": results,
+        "uncovered_routes": sorted(f"{method} {route}" for method, route in router_routes(app) - set(covered)),
+    }
+    text = json.dumps(output, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            for line in compare(output, json.load(f)):
+                print(line, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
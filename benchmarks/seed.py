@@ -0,0 +1,100 @@
+# benchmarks/seed.py
+"""
+Crea un banco de preguntas sintético con el esquema de models.py.
+
+Uso:
+    DATABASE_URL=sqlite:///bench.db python -m benchmarks.seed --questions 500
+"""
+from sqlalchemy import create_engine, insert
+import argparse
+import os
+import random
+
+import models
+
+
+def seed(
+    url: str,
+    versions: int = 1,
+    licences: int = 4,
+    question_types: int = 5,
+    questions: int = 500,
+    choices: int = 4,
+    reset: bool = True,
+    rng_seed: int = 42,
+) -> dict:
+    """
+    Crea las tablas (borrándolas antes si `reset`) e inserta `questions` preguntas con
+    `choices` opciones cada una en cada licencia. Devuelve los conteos insertados.
+    """
+    rng = random.Random(rng_seed)
+    engine = create_engine(url)
+    if reset:
+        models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+
+    with engine.begin() as conn:
+        conn.execute(insert(models.Type), [{"id": 1, "name": "Profesionales"}, {"id": 2, "name": "No profesionales"}])
+        conn.execute(insert(models.QuestionType), [
+            {"id": t, "name": f"Tipo {t}"} for t in range(1, question_types + 1)
+        ])
+        conn.execute(insert(models.Version), [
+            {"id": v, "year": 2020 + v, "enable": True} for v in range(1, versions + 1)
+        ])
+
+        licence_rows = []
+        for v in range(1, versions + 1):
+            for l in range(1, licences + 1):
+                licence_rows.append({
+                    "id": (v - 1) * licences + l,
+                    "name": f"Licencia {l} ({2020 + v})",
+                    "description": "Licencia sintética para pruebas de carga",
+                    "order": l,
+                    "enable": True,
+                    "type_id": 1 + l % 2,
+                    "version_id": v,
+                })
+        conn.execute(insert(models.LicenceType), licence_rows)
+
+        question_rows = []
+        choice_rows = []
+        question_id = 0
+        for licence in licence_rows:
+            for num in range(1, questions + 1):
+                question_id += 1
+                question_rows.append({
+                    "id": question_id,
+                    "text": f"¿Pregunta {num} de la licencia {licence['id']} sobre señales de tránsito?",
+                    "num": num,
+                    "licence_type_id": licence["id"],
+                    "question_type_id": rng.randint(1, question_types),
+                })
+                correct = rng.randrange(choices)
+                for c in range(choices):
+                    choice_rows.append({
+                        "text": f"Opción {c + 1} de la pregunta {question_id}",
+                        "is_correct": c == correct,
+                        "question_id": question_id,
+                    })
+        conn.execute(insert(models.Question), question_rows)
+        conn.execute(insert(models.Choice), choice_rows)
+
+    engine.dispose()
+    return {
+        "versions": versions,
+        "licences": len(licence_rows),
+        "questions": len(question_rows),
+        "choices": len(choice_rows),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crea un banco de preguntas sintético.")
+    parser.add_argument("--url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--versions", type=int, default=1)
+    parser.add_argument("--licences", type=int, default=4)
+    parser.add_argument("--question-types", type=int, default=5)
+    parser.add_argument("--questions", type=int, default=500)
+    parser.add_argument("--choices", type=int, default=4)
+    args = parser.parse_args()
+    print(seed(args.url, args.versions, args.licences, args.question_types, args.questions, args.choices))
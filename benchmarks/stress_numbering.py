@@ -0,0 +1,121 @@
+# benchmarks/stress_numbering.py
+"""
+Prueba de concurrencia de la numeración de preguntas.
+
+Varias tareas crean preguntas a la vez en la misma licencia con dos estrategias:
+
+- legacy: SELECT del último num + 1 y después INSERT (el cálculo anterior de create_question).
+  Dos transacciones pueden leer el mismo último número; la restricción única rechaza la
+  segunda (en SQLite suele fallar antes, por bloqueo).
+- counter: `allocate_nums` (UPDATE ... RETURNING sobre question_counters).
+
+Para cada estrategia se informa de las preguntas creadas, los conflictos, el throughput y
+si quedaron números repetidos o huecos en la licencia. En SQLite toda la base de datos se
+bloquea para escribir: con muchas tareas algunas agotan la espera (lock_errors) con
+cualquiera de las dos estrategias; en Postgres solo se bloquea el contador de la licencia.
+
+Uso:
+    python -m benchmarks.stress_numbering --tasks 20 --per-task 25
+    DATABASE_URL=postgresql://... python -m benchmarks.stress_numbering
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "ant_stress.db"))
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from benchmarks.seed import seed
+from database import URL_DATABASE, AsyncSessionLocal, async_engine
+from question_numbering import allocate_nums
+import models
+
+
+async def legacy_num(db, licence_id: int) -> int:
+    last_num = await db.scalar(
+        select(models.Question.num)
+        .where(models.Question.licence_type_id == licence_id)
+        .order_by(models.Question.num.desc())
+        .limit(1)
+    )
+    return (last_num + 1) if last_num is not None else 1
+
+
+async def create_questions(strategy: str, licence_id: int, count: int, stats: dict):
+    for i in range(count):
+        try:
+            async with AsyncSessionLocal() as db:
+                if strategy == "legacy":
+                    num = await legacy_num(db, licence_id)
+                else:
+                    num = await allocate_nums(db, licence_id)
+                await asyncio.sleep(0)  # Cede el turno entre leer el número e insertar, como una petición real
+                await db.execute(insert(models.Question).values(
+                    text=f"Pregunta concurrente {i}", num=num, licence_type_id=licence_id, question_type_id=1,
+                ))
+                await db.commit()
+            stats["created"] += 1
+        except IntegrityError:
+            stats["duplicate_num_conflicts"] += 1
+        except OperationalError:
+            stats["lock_errors"] += 1
+
+
+async def check_licence(licence_id: int) -> dict:
+    async with AsyncSessionLocal() as db:
+        nums = (await db.execute(
+            select(models.Question.num).where(models.Question.licence_type_id == licence_id)
+        )).scalars().all()
+        count, max_num = (await db.execute(
+            select(func.count(), func.max(models.Question.num)).where(models.Question.licence_type_id == licence_id)
+        )).one()
+    return {
+        "questions": count,
+        "duplicated_nums": len(nums) - len(set(nums)),
+        "gaps": (max_num or 0) - len(set(nums)),
+    }
+
+
+async def run(strategy: str, licence_id: int, tasks: int, per_task: int) -> dict:
+    stats = {"created": 0, "duplicate_num_conflicts": 0, "lock_errors": 0}
+    start = time.perf_counter()
+    await asyncio.gather(*(create_questions(strategy, licence_id, per_task, stats) for _ in range(tasks)))
+    elapsed = time.perf_counter() - start
+    return {
+        "strategy": strategy,
+        "attempted": tasks * per_task,
+        **stats,
+        "elapsed_s": round(elapsed, 3),
+        "inserts_per_s": round(stats["created"] / elapsed, 1),
+        "final": await check_licence(licence_id),
+    }
+
+
+async def main_async(args) -> list:
+    # Cada estrategia trabaja sobre una licencia distinta, vacía
+    results = [
+        await run("legacy", 1, args.tasks, args.per_task),
+        await run("counter", 2, args.tasks, args.per_task),
+    ]
+    await async_engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de concurrencia de la numeración de preguntas.")
+    parser.add_argument("--tasks", type=int, default=20, help="Creaciones simultáneas")
+    parser.add_argument("--per-task", type=int, default=25, help="Preguntas que crea cada tarea")
+    args = parser.parse_args()
+
+    seed(URL_DATABASE, licences=2, questions=0)
+    results = asyncio.run(main_async(args))
+    print(json.dumps({"database": async_engine.dialect.name, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
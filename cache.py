@@ -0,0 +1,128 @@
+# cache.py
+from collections import OrderedDict
+from dotenv import load_dotenv
+import glob
+import hashlib
+import tempfile
+import threading
+import time
+import os
+import uuid
+
+load_dotenv()
+
+# Número máximo de bancos de preguntas serializados que se guardan en memoria
+QUESTION_CACHE_SIZE = int(os.getenv("QUESTION_CACHE_SIZE", "64"))
+# "memory": caché propia de cada worker (LRUCache); "shared": archivos mapeados en memoria
+# compartidos por todos los workers del host (ver shared_cache.py)
+QUESTION_CACHE_BACKEND = os.getenv("QUESTION_CACHE_BACKEND", "memory")
+QUESTION_CACHE_DIR = os.getenv(
+    "QUESTION_CACHE_DIR",
+    os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), "ant_question_cache"),
+)
+QUESTION_CACHE_SLOTS = int(os.getenv("QUESTION_CACHE_SLOTS", "4096"))
+
+
+def _code_version() -> str:
+    """Hash del código de la aplicación: cambia en cada despliegue que lo modifica."""
+    root = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha1()
+    for path in sorted(glob.glob(os.path.join(root, "*.py")) + glob.glob(os.path.join(root, "routers", "*.py"))):
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+# Versión de la forma de los valores guardados en la caché compartida, que sobrevive a los
+# despliegues: por defecto el hash del código (un valor fijo la conserva entre despliegues)
+QUESTION_CACHE_VERSION = os.getenv("QUESTION_CACHE_VERSION") or (
+    _code_version() if QUESTION_CACHE_BACKEND == "shared" else ""
+)
+
+
+class LRUCache:
+    """
+    Caché en memoria con tamaño acotado y desalojo LRU (el menos usado recientemente).
+    Cada entrada guarda la revisión con la que se generó; si la revisión actual
+    de la clave es distinta, la entrada se considera obsoleta (cuenta como miss).
+    Una clave puede tener varias variantes (p. ej. distintos formatos de la misma
+    respuesta) que comparten revisión y se invalidan juntas.
+    `changed_at` dice cuándo se invalidó la clave por última vez: los rellenos recientes
+    se leen del primario (ver database.fill_session).
+    """
+
+    def __init__(self, maxsize: int = 128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._revisions = {}
+        self._changed_at = {}
+        self._lock = threading.Lock()
+        # Las revisiones viven en este proceso: el ETag lleva un id de este arranque
+        self.etag_scope = uuid.uuid4().hex[:8]
+
+    def revision(self, key) -> int:
+        """Devuelve la revisión actual de una clave (0 si nunca se ha invalidado)."""
+        return self._revisions.get(key, 0)
+
+    def changed_at(self, key) -> float:
+        """Momento (time.time()) de la última invalidación de la clave, o 0 si nunca."""
+        return self._changed_at.get(key, 0.0)
+
+    def get(self, key, variant=None):
+        with self._lock:
+            entry = self._data.get((key, variant))
+            if entry is None or entry[0] != self._revisions.get(key, 0):
+                self.misses += 1
+                return None
+            self._data.move_to_end((key, variant))
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, revision: int, variant=None):
+        """
+        Guarda un valor generado con la revisión `revision`. Si mientras tanto
+        la clave fue invalidada, el valor ya es viejo y no se guarda.
+        """
+        with self._lock:
+            if revision != self._revisions.get(key, 0):
+                return
+            self._data[(key, variant)] = (revision, value)
+            self._data.move_to_end((key, variant))
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        """Incrementa la revisión de la clave y descarta sus valores guardados."""
+        with self._lock:
+            self._revisions[key] = self._revisions.get(key, 0) + 1
+            self._changed_at[key] = time.time()
+            for entry_key in [entry_key for entry_key in self._data if entry_key[0] == key]:
+                del self._data[entry_key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "backend": "memory",
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+            }
+
+
+# Caché del banco de preguntas por licencia (clave: licence_id, variante: formato y campos,
+# valor: JSON en bytes, o memoryview con la caché compartida)
+if QUESTION_CACHE_BACKEND == "shared":
+    from shared_cache import SharedMemoryCache
+
+    question_bank_cache = SharedMemoryCache(
+        QUESTION_CACHE_DIR, slots=QUESTION_CACHE_SLOTS, version=QUESTION_CACHE_VERSION
+    )
+elif QUESTION_CACHE_BACKEND == "memory":
+    question_bank_cache = LRUCache(maxsize=QUESTION_CACHE_SIZE)
+else:
+    raise ValueError(f"QUESTION_CACHE_BACKEND desconocido: {QUESTION_CACHE_BACKEND} (memory o shared)")
@@ -0,0 +1,31 @@
+# fast_json.py
+"""
+Serialización JSON con orjson cuando está instalado.
+
+`dumps` devuelve bytes listos para enviar, `loads` acepta str o bytes y `JSONResponse`
+es la clase de respuesta por defecto de la aplicación. Sin orjson se usa el módulo json de la biblioteca estándar con
+separadores compactos, así que el resultado es el mismo salvo en velocidad.
+"""
+import json
+
+from fastapi.responses import JSONResponse as StdJSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional
+    orjson = None
+
+if orjson is not None:
+    from fastapi.responses import ORJSONResponse as JSONResponse
+
+    def dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+
+    loads = orjson.loads
+else:
+    JSONResponse = StdJSONResponse
+
+    def dumps(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    loads = json.loads
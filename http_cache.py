@@ -0,0 +1,66 @@
+# http_cache.py
+"""
+Validadores baratos (ETag) y Cache-Control para los endpoints de lectura.
+
+El ETag se calcula a partir de contadores de revisión, no del contenido, así que se puede
+responder 304 antes de cargar nada de la base de datos. Los datos de referencia
+(reference_data.py) usan en cambio el hash de su JSON, calculado al cargarlos.
+"""
+from typing import Optional
+from fastapi import Request, Response
+from dotenv import load_dotenv
+import os
+import uuid
+
+load_dotenv()
+
+# Cabecera Cache-Control de las respuestas de lectura (navegadores y CDN)
+CACHE_CONTROL = os.getenv("CACHE_CONTROL", "public, max-age=60")
+
+# Los contadores de revisión viven en memoria: el ETag incluye un identificador del
+# proceso para que nunca coincida con uno emitido antes de un reinicio
+BOOT_ID = uuid.uuid4().hex[:8]
+
+
+def make_etag(*parts, scope: str = BOOT_ID) -> str:
+    """
+    ETag débil a partir de las partes dadas (tipo de recurso, id, revisión...). `scope`
+    identifica de dónde salen las revisiones: por defecto este proceso; con contadores
+    compartidos entre workers, su propio id (ver cache.py) para que el ETag coincida en todos.
+    """
+    return 'W/"{}"'.format("-".join(str(part) for part in (scope, *parts)))
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # La comparación de If-None-Match es débil: se ignora el prefijo W/
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag.removeprefix("W/") in candidates
+
+
+def cache_headers(etag: str, cache_control: str = CACHE_CONTROL) -> dict:
+    return {"ETag": etag, "Cache-Control": cache_control}
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """Devuelve una respuesta 304 si el cliente ya tiene la versión `etag`, si no None."""
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=cache_headers(etag))
+    return None
+
+
+def content_etag(digest: str) -> str:
+    """ETag fuerte a partir del hash del contenido (igual en todos los workers)."""
+    return f'"{digest}"'
+
+
+def json_response(request: Request, body: bytes, etag: str, cache_control: str = CACHE_CONTROL) -> Response:
+    """JSON ya serializado con su ETag, o 304 si el cliente ya tiene esa versión."""
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    return Response(content=body, media_type="application/json", headers=cache_headers(etag, cache_control))
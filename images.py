@@ -0,0 +1,320 @@
+# images.py
+"""
+Versiones reducidas de las imágenes de preguntas, opciones y licencias.
+
+Las columnas `image` guardan la URL de la imagen original (Cloudinary o, con
+IMAGE_UPLOADER=local, /media/...). GET /images/{ancho}?src=<url> devuelve esa imagen
+reducida al ancho pedido en WebP (si el cliente lo acepta) o JPEG:
+
+- Solo se admiten los anchos de IMAGE_VARIANT_WIDTHS y orígenes conocidos: las imágenes
+  subidas en local (se leen de UPLOAD_DIR) y los hosts de IMAGE_SOURCE_HOSTS. En Cloudinary
+  solo las de nuestra cuenta (ruta /<CLOUDINARY_CLOUD_NAME>/...).
+- Cada variante se genera una vez (al subir la imagen o en la primera petición) y se
+  guarda en disco en IMAGE_CACHE_DIR, con un tamaño máximo IMAGE_CACHE_MAX_BYTES y
+  desalojo LRU por fecha de último uso (mtime).
+- El nombre del archivo incluye el hash de su contenido, que sirve de ETag fuerte.
+
+Los esquemas de respuesta incluyen `image_variants` (ancho -> URL) con `image_variants()`.
+"""
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+from urllib.parse import quote, urlsplit
+from dotenv import load_dotenv
+import asyncio
+import hashlib
+import io
+import logging
+import os
+import tempfile
+import threading
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from uploads import UPLOAD_BASE_URL, UPLOAD_DIR
+
+load_dotenv()
+
+# Anchos disponibles, separados por comas (vacío: sin variantes en las respuestas)
+IMAGE_VARIANT_WIDTHS = tuple(
+    sorted(int(width) for width in os.getenv("IMAGE_VARIANT_WIDTHS", "320,640").split(",") if width.strip())
+)
+IMAGE_FORMATS = {"webp": ("WEBP", "image/webp"), "jpeg": ("JPEG", "image/jpeg")}
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "80"))
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "ant_image_cache"))
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# Hosts desde los que se aceptan imágenes remotas (evita usar el proxy contra cualquier URL)
+IMAGE_SOURCE_HOSTS = frozenset(
+    host.strip() for host in os.getenv("IMAGE_SOURCE_HOSTS", "res.cloudinary.com").split(",") if host.strip()
+)
+# En el host compartido de Cloudinary solo se aceptan las imágenes de nuestra cuenta
+CLOUDINARY_HOST = "res.cloudinary.com"
+CLOUDINARY_CLOUD_NAME = os.getenv("CLOUDINARY_CLOUD_NAME")
+IMAGE_SOURCE_MAX_BYTES = int(os.getenv("IMAGE_SOURCE_MAX_BYTES", str(10 * 1024 * 1024)))
+IMAGE_SOURCE_TIMEOUT = float(os.getenv("IMAGE_SOURCE_TIMEOUT", "10"))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2")) # Hilos para descargar y redimensionar
+IMAGE_CACHE_CONTROL = os.getenv("IMAGE_CACHE_CONTROL", "public, max-age=86400")
+IMAGE_PROXY_PATH = "/images"
+
+logger = logging.getLogger("images")
+
+
+class ImageSourceError(Exception):
+    """El origen no está permitido (`allowed=False`) o no se pudo leer."""
+
+    def __init__(self, message: str, allowed: bool = True):
+        super().__init__(message)
+        self.allowed = allowed
+
+
+def variant_url(image: str, width: int) -> str:
+    return f"{IMAGE_PROXY_PATH}/{width}?src={quote(image, safe='')}"
+
+
+def image_variants(image: Optional[str]) -> Optional[Dict[str, str]]:
+    """URLs de las versiones reducidas de `image` por ancho, o None si no hay imagen."""
+    if not image or not IMAGE_VARIANT_WIDTHS:
+        return None
+    return {str(width): variant_url(image, width) for width in IMAGE_VARIANT_WIDTHS}
+
+
+def load_source(src: str) -> bytes:
+    """Lee la imagen original: de UPLOAD_DIR si es una subida local, si no del host remoto."""
+    local_prefix = UPLOAD_BASE_URL.rstrip("/") + "/"
+    if src.startswith(local_prefix):
+        name = src[len(local_prefix):]
+        if not name or "/" in name or "\\" in name or name.startswith("."):
+            raise ImageSourceError(f"Imagen local inválida: {src}", allowed=False)
+        try:
+            with open(os.path.join(UPLOAD_DIR, name), "rb") as f:
+                return f.read(IMAGE_SOURCE_MAX_BYTES + 1)
+        except FileNotFoundError:
+            raise ImageSourceError(f"Imagen no encontrada: {src}")
+
+    parts = urlsplit(src)
+    if parts.scheme not in ("http", "https") or parts.hostname not in IMAGE_SOURCE_HOSTS:
+        raise ImageSourceError(f"Origen de imagen no permitido: {src}", allowed=False)
+    if parts.hostname == CLOUDINARY_HOST and not (
+        CLOUDINARY_CLOUD_NAME and parts.path.startswith(f"/{CLOUDINARY_CLOUD_NAME}/")
+    ):
+        raise ImageSourceError(f"Imagen de otra cuenta de Cloudinary: {src}", allowed=False)
+    import httpx
+
+    try:
+        with httpx.stream("GET", src, timeout=IMAGE_SOURCE_TIMEOUT) as response:
+            response.raise_for_status()
+            data = bytearray()
+            for chunk in response.iter_bytes():
+                data += chunk
+                if len(data) > IMAGE_SOURCE_MAX_BYTES:
+                    break
+            return bytes(data)
+    except httpx.HTTPError as e:
+        raise ImageSourceError(f"No se pudo descargar {src}: {e}")
+
+
+def render_variant(data: bytes, width: int, fmt: str) -> bytes:
+    """
+    Reduce la imagen al ancho dado (nunca la amplía) y la codifica en `fmt`. Las imágenes
+    que no se pueden decodificar (truncadas, bombas de descompresión) dan ValueError.
+    """
+    if len(data) > IMAGE_SOURCE_MAX_BYTES:
+        raise ValueError("Imagen demasiado grande")
+    try:
+        return _render(data, width, fmt)
+    except UnidentifiedImageError:
+        raise
+    except (Image.DecompressionBombError, OSError) as e:
+        raise ValueError(f"Imagen dañada o demasiado grande: {e}") from e
+
+
+def _render(data: bytes, width: int, fmt: str) -> bytes:
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.width > width:
+            image.thumbnail((width, image.height * width // image.width or 1), Image.Resampling.LANCZOS)
+        if fmt == "jpeg" and image.mode != "RGB":
+            # JPEG no admite transparencia: se aplana sobre fondo blanco
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        elif fmt == "webp" and image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "A" in image.getbands() or "transparency" in image.info else "RGB")
+        output = io.BytesIO()
+        image.save(output, IMAGE_FORMATS[fmt][0], quality=IMAGE_QUALITY)
+        return output.getvalue()
+
+
+class ImageCache:
+    """
+    Variantes en disco con tamaño acotado y desalojo LRU. El índice en memoria se carga
+    del directorio la primera vez, así que la caché sobrevive a los reinicios. Con varios
+    workers cada uno lleva su propio índice: el límite de tamaño es aproximado.
+    """
+
+    def __init__(self, directory: str = IMAGE_CACHE_DIR, max_bytes: int = IMAGE_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self.evicted = 0
+        self.total_bytes = 0
+        self._index: Optional[OrderedDict] = None  # clave -> (archivo, tamaño, digest)
+        self._lock = threading.Lock()
+
+    def _load_index(self) -> OrderedDict:
+        if self._index is None:
+            os.makedirs(self.directory, exist_ok=True)
+            entries = []
+            for entry in os.scandir(self.directory):
+                parts = entry.name.split(".")
+                if len(parts) == 3 and entry.is_file():
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, parts[0], entry.name, stat.st_size, parts[1]))
+            self._index = OrderedDict()
+            for _, key, filename, size, digest in sorted(entries):
+                self._index[key] = (filename, size, digest)
+                self.total_bytes += size
+        return self._index
+
+    def get(self, key: str) -> Optional[Tuple[str, str]]:
+        """(ruta, digest) de la variante, o None si no está."""
+        with self._lock:
+            entry = self._load_index().get(key)
+            if entry is not None:
+                path = os.path.join(self.directory, entry[0])
+                try:
+                    os.utime(path)  # El mtime es el último uso: ordena el LRU tras un reinicio
+                except FileNotFoundError:  # Borrada por otro worker
+                    del self._index[key]
+                    self.total_bytes -= entry[1]
+                    entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._index.move_to_end(key)
+            self.hits += 1
+            return path, entry[2]
+
+    def discard(self, key: str):
+        """Olvida una variante cuyo archivo ya no existe (la borró otro worker)."""
+        with self._lock:
+            entry = self._load_index().pop(key, None)
+            if entry is not None:
+                self.total_bytes -= entry[1]
+
+    def put(self, key: str, data: bytes, fmt: str) -> Tuple[str, str]:
+        digest = hashlib.sha256(data).hexdigest()[:16]
+        filename = f"{key}.{digest}.{fmt}"
+        path = os.path.join(self.directory, filename)
+        with self._lock:
+            index = self._load_index()
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            previous = index.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= previous[1]
+            index[key] = (filename, len(data), digest)
+            self.total_bytes += len(data)
+            self.generated += 1
+            while self.total_bytes > self.max_bytes and len(index) > 1:
+                _, (old_filename, old_size, _) = index.popitem(last=False)
+                self.total_bytes -= old_size
+                self.evicted += 1
+                try:
+                    os.remove(os.path.join(self.directory, old_filename))
+                except FileNotFoundError:
+                    pass
+        return path, digest
+
+    def stats(self) -> dict:
+        with self._lock:
+            index = self._load_index()
+            return {
+                "directory": self.directory,
+                "entries": len(index),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "generated": self.generated,
+                "evicted": self.evicted,
+            }
+
+
+def variant_key(src: str, width: int, fmt: str) -> str:
+    return hashlib.sha256(f"{src}|{width}|{fmt}".encode()).hexdigest()[:32]
+
+
+class ImageVariants:
+    """Genera variantes en un pool de hilos; peticiones simultáneas de la misma comparten el trabajo."""
+
+    def __init__(self, cache: ImageCache, workers: int = IMAGE_WORKERS):
+        self.cache = cache
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-variant")
+        self._pending: Dict[str, asyncio.Future] = {}
+        self.failures = 0
+
+    def _generate(self, key: str, src: str, width: int, fmt: str, data: Optional[bytes]) -> Tuple[str, str]:
+        if data is None:
+            data = load_source(src)
+        return self.cache.put(key, render_variant(data, width, fmt), fmt)
+
+    async def get(self, src: str, width: int, fmt: str, data: Optional[bytes] = None) -> Tuple[str, str]:
+        """(ruta, digest) de la variante, generándola si no está en caché."""
+        key = variant_key(src, width, fmt)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        pending = self._pending.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, self._generate, key, src, width, fmt, data)
+        self._pending[key] = future
+        try:
+            return await asyncio.shield(future)
+        except Exception:
+            self.failures += 1
+            raise
+        finally:
+            self._pending.pop(key, None)
+
+    async def read(self, src: str, width: int, fmt: str, path: str, digest: str) -> Tuple[bytes, str]:
+        """
+        (bytes, digest) de la variante en `path`. Si otro worker la desalojó después de
+        `get`, se genera de nuevo. Las variantes son pequeñas: se leen enteras.
+        """
+        try:
+            with open(path, "rb") as f:
+                return f.read(), digest
+        except FileNotFoundError:
+            self.cache.discard(variant_key(src, width, fmt))
+        path, digest = await self.get(src, width, fmt)
+        with open(path, "rb") as f:
+            return f.read(), digest
+
+    async def pregenerate(self, src: str, data: bytes):
+        """Genera todas las variantes de una imagen recién subida (con sus bytes, sin descargarla)."""
+        for width in IMAGE_VARIANT_WIDTHS:
+            for fmt in IMAGE_FORMATS:
+                try:
+                    await self.get(src, width, fmt, data)
+                except Exception as e:
+                    logger.warning("No se pudo generar la variante %dpx %s de %s: %s", width, fmt, src, e)
+                    return
+
+    def stats(self) -> dict:
+        return {
+            "widths": list(IMAGE_VARIANT_WIDTHS),
+            "pending": len(self._pending),
+            "failures": self.failures,
+            **self.cache.stats(),
+        }
+
+
+image_store = ImageVariants(ImageCache())
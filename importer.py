@@ -0,0 +1,203 @@
+# importer.py
+"""
+Importación masiva de preguntas desde JSONL o CSV.
+
+Cada línea/fila describe una pregunta con sus opciones:
+    JSONL: {"licence_type_id": 1, "question_type_id": 2, "text": "...", "image": null,
+            "choices": [{"text": "...", "is_correct": true}, ...]}
+    CSV:   columnas licence_type_id, question_type_id, text, image y choices
+           (esta última con la lista de opciones en JSON)
+
+El archivo se procesa en streaming: las licencias y tipos de pregunta se validan una sola
+vez, los números de pregunta se reservan por bloques en los contadores de cada licencia
+(question_numbering.py) y las preguntas y opciones se insertan por lotes (executemany) dentro de una sola transacción. Las filas inválidas se
+saltan y se reportan con su número de línea.
+
+Uso (CLI):
+    python -m importer preguntas.jsonl [--format csv] [--dry-run]
+
+La importación incrementa la generación del banco de cada licencia en su transacción; los
+servidores en marcha lo detectan en unos segundos (bank_watcher.py, BANK_WATCH_SECONDS) o
+al momento con POST /admin/bank-watcher/check.
+"""
+from typing import Callable, Dict, IO, Iterator, Optional, Tuple
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import os
+
+from cache import question_bank_cache
+from question_numbering import allocate_nums
+from snapshots import snapshot_store
+import models
+import schemas
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+
+logger = logging.getLogger("importer")
+
+
+def detect_format(filename: Optional[str]) -> str:
+    return "csv" if (filename or "").lower().endswith(".csv") else "jsonl"
+
+
+def iter_rows(stream: IO[str], file_format: str) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """
+    Recorre el archivo fila a fila sin cargarlo entero en memoria.
+    Devuelve tuplas (línea, datos, error); si la fila no se pudo leer, datos es None.
+    """
+    if file_format == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            line = reader.line_num
+            try:
+                row["choices"] = json.loads(row.get("choices") or "[]")
+            except json.JSONDecodeError as e:
+                yield line, None, f"Columna 'choices' con JSON inválido: {e}"
+                continue
+            if not row.get("image"):
+                row["image"] = None
+            yield line, row, None
+        return
+
+    for line, raw in enumerate(stream, start=1):
+        if not raw.strip():
+            continue
+        try:
+            yield line, json.loads(raw), None
+        except json.JSONDecodeError as e:
+            yield line, None, f"JSON inválido: {e}"
+
+
+async def import_questions(
+    db: AsyncSession,
+    stream: IO[str],
+    file_format: str = "jsonl",
+    dry_run: bool = False,
+    batch_size: int = IMPORT_BATCH_SIZE,
+    on_progress: Optional[Callable[[schemas.ImportReport], None]] = None,
+) -> schemas.ImportReport:
+    """
+    Importa las preguntas del archivo en una sola transacción y devuelve el reporte.
+    Con `dry_run` se valida e inserta todo pero se hace rollback al final.
+    """
+    report = schemas.ImportReport(dry_run=dry_run)
+
+    # Las búsquedas se hacen una sola vez para todo el archivo
+    licence_ids = set((await db.execute(select(models.LicenceType.id))).scalars().all())
+    question_type_ids = set((await db.execute(select(models.QuestionType.id))).scalars().all())
+
+    pending = []  # Filas válidas a la espera de insertarse: (pregunta, opciones)
+    touched_licences = set()
+
+    async def flush():
+        if not pending:
+            return
+        # Los números se reservan por bloques, uno por licencia del lote, con los contadores
+        counts: Dict[int, int] = {}
+        for question, _ in pending:
+            counts[question["licence_type_id"]] = counts.get(question["licence_type_id"], 0) + 1
+        next_nums = {licence_id: await allocate_nums(db, licence_id, count)
+                     for licence_id, count in sorted(counts.items())}
+        for question, _ in pending:
+            question["num"] = next_nums[question["licence_type_id"]]
+            next_nums[question["licence_type_id"]] += 1
+
+        result = await db.execute(
+            insert(models.Question).returning(models.Question.id, sort_by_parameter_order=True),
+            [question for question, _ in pending],
+        )
+        choice_rows = []
+        for question_id, (_, choices) in zip(result.scalars().all(), pending):
+            choice_rows.extend({**choice, "question_id": question_id} for choice in choices)
+        await db.execute(insert(models.Choice), choice_rows)
+
+        report.inserted += len(pending)
+        report.choices_inserted += len(choice_rows)
+        pending.clear()
+        logger.info("Importación: %d filas procesadas, %d preguntas insertadas, %d errores",
+                    report.processed, report.inserted, len(report.errors))
+        if on_progress:
+            on_progress(report)
+
+    try:
+        for line, data, error in iter_rows(stream, file_format):
+            report.processed += 1
+            if error is None:
+                try:
+                    question = schemas.QuestionImport(**data)
+                    if question.licence_type_id not in licence_ids:
+                        error = f"Licencia con ID {question.licence_type_id} no encontrada."
+                    elif question.question_type_id not in question_type_ids:
+                        error = f"Tipo de pregunta con ID {question.question_type_id} no encontrado."
+                    elif not question.choices:
+                        error = "Debe proporcionar al menos una opción de respuesta."
+                    elif not any(choice.is_correct for choice in question.choices):
+                        error = "Debe haber al menos una opción de respuesta marcada como correcta."
+                except (ValidationError, TypeError) as e:
+                    error = f"Formato de pregunta inválido: {e}"
+            if error is not None:
+                report.errors.append(schemas.ImportRowError(line=line, error=error))
+                continue
+
+            touched_licences.add(question.licence_type_id)
+            pending.append((
+                {
+                    "text": question.text,
+                    "image": question.image,
+                    "licence_type_id": question.licence_type_id,
+                    "question_type_id": question.question_type_id,
+                },
+                [choice.model_dump() for choice in question.choices],
+            ))
+            if len(pending) >= batch_size:
+                await flush()
+        await flush()
+
+        if dry_run:
+            await db.rollback()
+        else:
+            await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+
+    if not dry_run:
+        # Los bancos de las licencias importadas cambiaron
+        for licence_id in touched_licences:
+            question_bank_cache.invalidate(licence_id)
+            snapshot_store.discard(licence_id)
+    return report
+
+
+async def _import_cli(path: str, file_format: Optional[str], dry_run: bool):
+    from database import AsyncSessionLocal, async_engine
+
+    def print_progress(report: schemas.ImportReport):
+        print(f"{report.processed} filas procesadas, {report.inserted} preguntas insertadas, {len(report.errors)} errores")
+
+    with open(path, encoding="utf-8-sig", newline="") as stream:
+        async with AsyncSessionLocal() as db:
+            report = await import_questions(
+                db, stream, file_format or detect_format(path), dry_run=dry_run, on_progress=print_progress
+            )
+    await async_engine.dispose()
+
+    for row_error in report.errors:
+        print(f"Línea {row_error.line}: {row_error.error}")
+    print(report.model_dump_json(exclude={"errors"}))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importación masiva de preguntas (JSONL o CSV).")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default=None)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(_import_cli(args.path, args.format, args.dry_run))
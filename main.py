@@ -1,27 +1,57 @@
-from fastapi import FastAPI, Depends
-import models
-from database import engine, get_db
-from sqlalchemy.orm import Session
-from typing import Annotated
-import os
-from fastapi.middleware.cors import CORSMiddleware
+from fastapi import FastAPI
+from fastapi.staticfiles import StaticFiles
+from fastapi.responses import PlainTextResponse
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
-import cloudinary
-from routers import versions, licences, questions
+import os
+import models
+from database import ReplicaFallbackMiddleware, async_engine, env_flag, replica_router
+from routers import versions, licences, questions, exams, admin, snapshots, images
+from uploads import IMAGE_UPLOADER, UPLOAD_BASE_URL, UPLOAD_DIR, upload_pipeline
+from metrics import MetricsMiddleware, render_metrics
+from admission import ADMISSION_CONTROL, AdmissionMiddleware
+from attempts import attempt_recorder
+from reference_data import reference_registry
+from bank_watcher import bank_watcher
+import question_numbering
+import question_stats
+from fast_json import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.middleware.httpsredirect import HTTPSRedirectMiddleware
 
-app = FastAPI()
+load_dotenv()
+
+IS_PRODUCTION = os.getenv("RAILWAY_ENVIRONMENT") == "production"
+# En producción el esquema lo gestiona Alembic; create_all solo sirve en desarrollo
+DB_CREATE_ALL = env_flag("DB_CREATE_ALL", not IS_PRODUCTION)
+# Orígenes permitidos separados por comas (ej. https://luis-gomez-91.github.io,http://localhost:8000)
+CORS_ALLOW_ORIGINS = [origin.strip() for origin in os.getenv("CORS_ALLOW_ORIGINS", "*").split(",") if origin.strip()]
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Motores sin soporte: se avisa al arrancar en lugar de fallar en la primera escritura
+    question_numbering.check_dialect(async_engine.dialect.name)
+    question_stats.check_dialect(async_engine.dialect.name)
+    if DB_CREATE_ALL:
+        async with async_engine.begin() as conn:
+            await conn.run_sync(models.Base.metadata.create_all)
+    # Versiones, tipos y licencias en memoria (se recargan en segundo plano)
+    await reference_registry.start()
+    attempt_recorder.start()
+    replica_router.start() # Comprobación periódica de las réplicas de lectura (si hay)
+    bank_watcher.start() # Cambios del banco hechos por otros procesos (workers, importaciones por CLI)
+    yield
+    # Al apagar: guardar los intentos encolados y esperar a que terminen las subidas de imágenes
+    await reference_registry.stop()
+    await replica_router.stop()
+    await bank_watcher.stop()
+    await attempt_recorder.stop()
+    await upload_pipeline.drain()
 
-origins = [
-    "https://luis-gomez-91.github.io",        # GitHub Pages sin www
-    "https://www.luis-gomez-91.github.io",    # GitHub Pages con www (por si acaso)
-    "http://localhost:8000",                  # Para desarrollo local
-    "http://127.0.0.1:8000",
-]
+app = FastAPI(lifespan=lifespan, default_response_class=JSONResponse) # orjson si está instalado
 
-if os.getenv("RAILWAY_ENVIRONMENT") != "production":
+if not IS_PRODUCTION:
     app.add_middleware(HTTPSRedirectMiddleware)
 
 app.add_middleware(
@@ -29,37 +59,43 @@ app.add_middleware(
     allowed_hosts=["*"]
 )
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# Dentro del control de admisión: la repetición en el primario usa el mismo hueco
+if replica_router.replicas:
+    app.add_middleware(ReplicaFallbackMiddleware)
 
-load_dotenv()
-cloudinary.config(
-    cloud_name=os.getenv('CLOUDINARY_CLOUD_NAME'),
-    api_key=os.getenv('CLOUDINARY_API_KEY'),
-    api_secret=os.getenv('CLOUDINARY_API_SECRET'),
-    secure=True
-)
+# Dentro de CORS para que los 503 por saturación lleven las cabeceras CORS
+if ADMISSION_CONTROL:
+    app.add_middleware(AdmissionMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # Permitir todas las URLs o especifica una lista
+    allow_origins=CORS_ALLOW_ORIGINS,
     allow_credentials=True,
-    allow_methods=["*"],  # Permitir todos los métodos HTTP
-    allow_headers=["*"],  # Permitir todos los encabezados
+    allow_methods=["*"],
+    allow_headers=["*"],
 )
 
-models.Base.metadata.create_all(bind=engine)
-db_dependency = Annotated[Session, Depends(get_db)]
+# Se añade al final para que sea el middleware más externo y mida la petición completa
+app.add_middleware(MetricsMiddleware)
 
 @app.get("/")
 def root():
     return {'status': 'success', 'message': 'Bienvenido a ANT Simulator - by Luis Gómez'}
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics():
+    # Formato de texto de Prometheus
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 app.include_router(versions.router)
 app.include_router(licences.router)
-app.include_router(questions.router)
\ No newline at end of file
+app.include_router(questions.router)
+app.include_router(exams.router)
+app.include_router(admin.router)
+app.include_router(snapshots.router)
+app.include_router(images.router)
+
+# Con el uploader local (desarrollo/pruebas) las imágenes se sirven desde disco
+if IMAGE_UPLOADER == "local":
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    app.mount(UPLOAD_BASE_URL, StaticFiles(directory=UPLOAD_DIR), name="media")
\ No newline at end of file
@@ -0,0 +1,211 @@
+# metrics.py
+"""
+Métricas de la aplicación en formato de texto de Prometheus.
+
+- Latencia por ruta (histograma), tamaño de las respuestas y número de peticiones.
+- Número de sentencias SQL y tiempo en la base de datos por petición, medidos con los
+  eventos del motor de SQLAlchemy.
+
+Con METRICS_DEBUG_HEADERS=1 cada respuesta lleva además las cabeceras X-Query-Count y
+Server-Timing, para detectar problemas N+1 directamente desde el navegador.
+"""
+from contextvars import ContextVar
+from typing import Dict, Optional, Sequence, Tuple
+from sqlalchemy import event
+import threading
+import time
+
+from admission import admission_controller
+from cache import question_bank_cache
+from database import async_engine, engine, env_flag, get_pool_status
+
+METRICS_DEBUG_HEADERS = env_flag("METRICS_DEBUG_HEADERS", False)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    """Histograma acumulativo con etiquetas, al estilo de Prometheus."""
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float]):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple, list] = {}  # etiquetas -> [conteos por bucket..., suma, total]
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple, value: float):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self, label_names: Sequence[str]) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                base = ",".join(f'{name}="{value}"' for name, value in zip(label_names, labels))
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{base},le="+Inf"}} {series[-1]}')
+                lines.append(f"{self.name}_sum{{{base}}} {series[-2]}")
+                lines.append(f"{self.name}_count{{{base}}} {series[-1]}")
+        return lines
+
+
+REQUEST_LABELS = ("method", "route", "status")
+request_latency = Histogram("http_request_duration_seconds", "Latencia de las peticiones por ruta.", LATENCY_BUCKETS)
+response_size = Histogram("http_response_size_bytes", "Tamaño del cuerpo de las respuestas por ruta.", SIZE_BUCKETS)
+request_queries = Histogram("db_queries_per_request", "Sentencias SQL ejecutadas por petición.", QUERY_COUNT_BUCKETS)
+request_db_time = Histogram("db_time_per_request_seconds", "Tiempo en la base de datos por petición.", LATENCY_BUCKETS)
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_time")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+
+
+# Estadísticas de la petición en curso (None fuera de una petición)
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+_sql_totals = {"statements": 0, "seconds": 0.0}
+_sql_lock = threading.Lock()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    with _sql_lock:
+        _sql_totals["statements"] += 1
+        _sql_totals["seconds"] += elapsed
+    stats = current_request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_time += elapsed
+
+
+def _handle_error(exception_context):
+    # La sentencia falló: after_cursor_execute no se ejecuta, se descarta su marca de tiempo
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_start"):
+        connection.info["query_start"].pop()
+
+
+for _engine in (engine, async_engine.sync_engine):
+    event.listen(_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(_engine, "handle_error", _handle_error)
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que mide cada petición HTTP. La ruta se etiqueta con su plantilla
+    (/questions/by_licence/{licence_id}), no con la URL concreta.
+    """
+
+    def __init__(self, app, debug_headers: bool = METRICS_DEBUG_HEADERS):
+        self.app = app
+        self.debug_headers = debug_headers
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        start = time.perf_counter()
+        status_code = 500
+        body_size = 0
+
+        async def send_wrapper(message):
+            nonlocal status_code, body_size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.debug_headers:
+                    elapsed_ms = (time.perf_counter() - start) * 1000
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-query-count", str(stats.queries).encode()))
+                    headers.append((b"server-timing", (
+                        f'db;dur={stats.db_time * 1000:.2f};desc="{stats.queries} queries", '
+                        f"app;dur={elapsed_ms:.2f}"
+                    ).encode()))
+                    message = {**message, "headers": headers}
+            elif message["type"] == "http.response.body":
+                body_size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request.reset(token)
+            route = scope.get("route")
+            labels = (scope["method"], getattr(route, "path", "unmatched"), str(status_code))
+            request_latency.observe(labels, time.perf_counter() - start)
+            response_size.observe(labels, body_size)
+            request_queries.observe(labels, stats.queries)
+            request_db_time.observe(labels, stats.db_time)
+
+
+def render_metrics() -> str:
+    """Todas las métricas en formato de texto de Prometheus."""
+    lines = []
+    for histogram in (request_latency, response_size, request_queries, request_db_time):
+        lines.extend(histogram.render(REQUEST_LABELS))
+
+    with _sql_lock:
+        lines += [
+            "# HELP db_statements_total Sentencias SQL ejecutadas.",
+            "# TYPE db_statements_total counter",
+            f"db_statements_total {_sql_totals['statements']}",
+            "# HELP db_statement_seconds_total Tiempo total ejecutando SQL.",
+            "# TYPE db_statement_seconds_total counter",
+            f"db_statement_seconds_total {_sql_totals['seconds']}",
+        ]
+
+    cache_stats = question_bank_cache.stats()
+    lines += [
+        "# TYPE question_cache_hits_total counter",
+        f"question_cache_hits_total {cache_stats['hits']}",
+        "# TYPE question_cache_misses_total counter",
+        f"question_cache_misses_total {cache_stats['misses']}",
+        "# TYPE question_cache_entries gauge",
+        f"question_cache_entries {cache_stats['size']}",
+    ]
+
+    admission = admission_controller.stats()["classes"]
+    for name, metric_type, key in (
+        ("admission_active_requests", "gauge", "active"),
+        ("admission_queue_depth", "gauge", "queued"),
+        ("admission_admitted_total", "counter", "admitted"),
+    ):
+        lines.append(f"# TYPE {name} {metric_type}")
+        lines += [f'{name}{{class="{cls}"}} {stats[key]}' for cls, stats in admission.items()]
+    lines.append("# TYPE admission_rejected_total counter")
+    for cls, stats in admission.items():
+        lines.append(f'admission_rejected_total{{class="{cls}",reason="queue_full"}} {stats["rejected_queue_full"]}')
+        lines.append(f'admission_rejected_total{{class="{cls}",reason="timeout"}} {stats["rejected_timeout"]}')
+
+    pool = get_pool_status()
+    for key in ("checked_out", "overflow"):
+        if key in pool:
+            lines += [f"# TYPE db_pool_{key} gauge", f"db_pool_{key} {pool[key]}"]
+    lines += [
+        "# TYPE db_pool_wait_max_seconds gauge",
+        f"db_pool_wait_max_seconds {pool['wait_max_ms'] / 1000}",
+        "# TYPE db_pool_timeouts_total counter",
+        f"db_pool_timeouts_total {pool['timeouts']}",
+    ]
+    return "\n".join(lines) + "\n"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Boolean
+from sqlalchemy import Column, BigInteger, Integer, String, ForeignKey, Boolean, Float, DateTime, UniqueConstraint
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -32,7 +32,7 @@ class LicenceType(Base):
     type_id = Column(Integer, ForeignKey("types.id"))
     type = relationship("Type", back_populates="licences")  # corregido
 
-    version_id = Column(Integer, ForeignKey("versions.id"))
+    version_id = Column(Integer, ForeignKey("versions.id"), index=True)  # /licences/by_version/{id}
     version = relationship("Version", back_populates="licences")  # corregido
 
 class QuestionType(Base):  # Tipos de preguntas
@@ -44,11 +44,16 @@ class QuestionType(Base):  # Tipos de preguntas
 
 class Question(Base):
     __tablename__ = "questions"
+    __table_args__ = (
+        # Un número por pregunta dentro de cada licencia; su índice sirve también para
+        # recorrer el banco de una licencia ordenado por número (listado y exámenes)
+        UniqueConstraint("licence_type_id", "num", name="uq_questions_licence_type_id_num"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    text = Column(String, index=True)
+    text = Column(String)
     image = Column(String)
-    num = Column(Integer, index=True)
+    num = Column(Integer)
 
     licence_type_id = Column(Integer, ForeignKey("licence_types.id"))
     licence_type = relationship("LicenceType", back_populates="questions")
@@ -62,10 +67,52 @@ class Choice(Base):
     __tablename__ = "choices"
 
     id = Column(Integer, primary_key=True, index=True)
-    text = Column(String, index=True)
+    text = Column(String)
     image = Column(String)
     is_correct = Column(Boolean, default=False)
 
-    question_id = Column(Integer, ForeignKey("questions.id"))
+    question_id = Column(Integer, ForeignKey("questions.id"), index=True)  # Opciones de cada pregunta
     question = relationship("Question", back_populates="choices")
 
+class Attempt(Base):  # Intentos de examen simulado (para analítica)
+    __tablename__ = "attempts"
+
+    id = Column(Integer, primary_key=True, index=True)
+    total = Column(Integer)
+    correct = Column(Integer)
+    score = Column(Float)
+    created_at = Column(DateTime)
+
+    licence_type_id = Column(Integer, ForeignKey("licence_types.id"), index=True)
+    licence_type = relationship("LicenceType")
+
+    answers = relationship("AttemptAnswer", back_populates="attempt")
+
+class AttemptAnswer(Base):
+    __tablename__ = "attempt_answers"
+
+    id = Column(Integer, primary_key=True, index=True)
+    is_correct = Column(Boolean, default=False)
+    time_ms = Column(Integer)  # Tiempo que tardó en responder, si el cliente lo envía
+
+    attempt_id = Column(Integer, ForeignKey("attempts.id"), index=True)
+    attempt = relationship("Attempt", back_populates="answers")
+
+    question_id = Column(Integer, ForeignKey("questions.id"), index=True)
+    choice_id = Column(Integer, ForeignKey("choices.id"))  # None = sin responder
+
+class QuestionStats(Base):  # Acumulados por pregunta, actualizados por lotes al guardar intentos
+    __tablename__ = "question_stats"
+
+    question_id = Column(Integer, ForeignKey("questions.id"), primary_key=True)
+    answers = Column(Integer, nullable=False, default=0)
+    mistakes = Column(Integer, nullable=False, default=0)
+    time_total_ms = Column(BigInteger, nullable=False, default=0)  # Suma de milisegundos: supera 2^31 enseguida
+    timed_answers = Column(Integer, nullable=False, default=0)  # Respuestas que incluían time_ms
+
+class QuestionCounter(Base):  # Último número de pregunta asignado en cada licencia
+    __tablename__ = "question_counters"
+
+    licence_type_id = Column(Integer, ForeignKey("licence_types.id"), primary_key=True)
+    last_num = Column(Integer, nullable=False, default=0)
+    generation = Column(Integer, nullable=False, default=0)  # Se incrementa con cada cambio del banco
@@ -0,0 +1,387 @@
+# question_bank.py
+from operator import itemgetter
+from pydantic import TypeAdapter
+from sqlalchemy import String, and_, case, func, literal_column, select, tuple_, type_coerce
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from fast_json import dumps, loads
+from images import image_variants
+import models
+import schemas
+
+# Serializador reutilizable para la lista de preguntas (evita reconstruirlo en cada petición)
+question_list_adapter = TypeAdapter(List[schemas.Question])
+question_adapter = TypeAdapter(schemas.Question)
+
+# Preguntas que se leen del cursor en cada tanda al transmitir en NDJSON
+STREAM_CHUNK_SIZE = 500
+
+FORMATS = ("full", "compact")
+# Campos de cada pregunta que se pueden pedir con ?fields= (en el formato compacto
+# no existen licence_type_id ni question_type)
+QUESTION_FIELDS = (
+    "id", "text", "image", "num", "licence_type_id", "question_type_id", "question_type", "choices", "image_variants"
+)
+COMPACT_QUESTION_FIELDS = ("id", "text", "image", "num", "question_type_id", "choices", "image_variants")
+
+# Orden del banco en todas las lecturas (completa, paginada y en streaming): las preguntas
+# sin número al final en cualquier motor (SQLite las pondría primero) y `id` como desempate
+BANK_ORDER = (models.Question.num.asc().nulls_last(), models.Question.id)
+
+# Cursor de la paginación: (num, id) de la última pregunta recibida
+Cursor = Tuple[Optional[int], Optional[int]]
+
+
+def parse_fields(fields: Optional[str], fmt: str = "full") -> Optional[Tuple[str, ...]]:
+    """
+    Convierte `?fields=id,text,choices` en una tupla ordenada de campos válidos para el
+    formato, o None si no se pidió selección. Lanza ValueError con campos desconocidos.
+    """
+    if not fields:
+        return None
+    allowed = COMPACT_QUESTION_FIELDS if fmt == "compact" else QUESTION_FIELDS
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = sorted(requested - set(allowed))
+    if unknown:
+        raise ValueError(f"Campos desconocidos: {', '.join(unknown)}. Disponibles: {', '.join(allowed)}.")
+    return tuple(field for field in allowed if field in requested)
+
+
+def parse_cursor(value: Optional[str]) -> Optional[Cursor]:
+    """
+    Convierte el cursor `num:id` (num vacío si la pregunta no tiene número) en (num, id).
+    Un `num` solo, como los cursores anteriores, sigue después de ese número.
+    Lanza ValueError si el formato no es válido.
+    """
+    if value is None:
+        return None
+    num, separator, question_id = value.partition(":")
+    try:
+        cursor = (int(num) if num else None, int(question_id) if separator else None)
+    except ValueError:
+        cursor = (None, None)
+    if cursor == (None, None):
+        raise ValueError(f"Cursor inválido: {value!r}. Formato: num:id")
+    return cursor
+
+
+def format_cursor(question) -> str:
+    """Cursor `num:id` para seguir después de `question`."""
+    return f"{'' if question.num is None else question.num}:{question.id}"
+
+
+def _after_cursor(cursor: Cursor):
+    """Condición de las preguntas numeradas que van después del cursor en BANK_ORDER."""
+    Q = models.Question
+    num, question_id = cursor
+    if question_id is None:
+        return Q.num > num
+    # Comparación de filas: el índice de (licence_type_id, num) empieza en `num` y no recorre
+    # las preguntas anteriores (con un OR el motor solo podría buscar por licence_type_id)
+    return tuple_(Q.num, Q.id) > tuple_(num, question_id)
+
+
+async def _load_questions(db: AsyncSession, licence_id: int):
+    result = await db.execute(
+        select(models.Question)
+        .options(
+            joinedload(models.Question.choices)
+        )  # Carga anticipada de las opciones
+        .options(joinedload(models.Question.question_type))
+        .where(models.Question.licence_type_id == licence_id)
+    )
+    return result.unique().scalars().all()
+
+
+def page_queries(licence_id: int, after: Optional[Cursor] = None):
+    """
+    Consultas paginadas por clave (keyset) en BANK_ORDER, en dos tramos que se leen seguidos:
+    las preguntas numeradas por (num, id) y después las que no tienen número por id. `after`
+    es el cursor (num, id) de la última pregunta recibida, así que ni los `num` nulos ni los
+    repetidos se saltan ni se repiten. Cada tramo busca directamente en el índice de
+    (licence_type_id, num) y su coste no crece con la página, a diferencia de OFFSET. Las
+    opciones se cargan con selectinload (una consulta por tanda) porque joinedload de una
+    colección no admite LIMIT ni yield_per.
+    """
+    Q = models.Question
+    num, question_id = after if after is not None else (None, None)
+    numbered = Q.num.isnot(None) if num is None else _after_cursor(after)
+    unnumbered = Q.num.is_(None)
+    if num is None and question_id is not None:
+        unnumbered = and_(unnumbered, Q.id > question_id)
+    phases = [(unnumbered, (Q.id,))]
+    if after is None or num is not None:
+        phases.insert(0, (numbered, (Q.num, Q.id)))
+
+    return [
+        select(Q)
+        .options(selectinload(Q.choices), joinedload(Q.question_type))
+        .where(Q.licence_type_id == licence_id, condition)
+        .order_by(*order)
+        for condition, order in phases
+    ]
+
+
+async def load_page(db: AsyncSession, licence_id: int, after: Optional[Cursor], limit: int):
+    questions = []
+    for query in page_queries(licence_id, after):
+        questions.extend((await db.execute(query.limit(limit - len(questions)))).scalars().all())
+        if len(questions) >= limit:
+            break
+    return questions
+
+
+def _choice_dict(choice: models.Choice, with_question_id: bool) -> dict:
+    data = {"text": choice.text, "image": choice.image, "is_correct": choice.is_correct, "id": choice.id}
+    if with_question_id:
+        data["question_id"] = choice.question_id
+    data["image_variants"] = image_variants(choice.image)
+    return data
+
+
+def _full_question_dict(question: models.Question, fields: Tuple[str, ...]) -> dict:
+    data = {}
+    for field in fields:
+        if field == "choices":
+            data["choices"] = [_choice_dict(choice, True) for choice in question.choices]
+        elif field == "question_type":
+            question_type = question.question_type
+            data["question_type"] = {"name": question_type.name, "id": question_type.id}
+        elif field == "image_variants":
+            data["image_variants"] = image_variants(question.image)
+        else:
+            data[field] = getattr(question, field)
+    return data
+
+
+def _compact_question_dict(question: models.Question, fields: Tuple[str, ...]) -> dict:
+    data = {}
+    for field in fields:
+        if field == "choices":
+            data["choices"] = [_choice_dict(choice, False) for choice in question.choices]
+        elif field == "image_variants":
+            data["image_variants"] = image_variants(question.image)
+        else:
+            data[field] = getattr(question, field)
+    return data
+
+
+def _compact_bank(licence_id: int, questions, fields: Tuple[str, ...]) -> dict:
+    """
+    Formato compacto: los tipos de pregunta van una sola vez en `question_types`
+    (id -> nombre) y cada pregunta solo lleva su `question_type_id`. Se omiten las claves
+    foráneas redundantes (licence_type_id en cada pregunta y question_id en cada opción).
+    """
+    bank = {"licence_id": licence_id}
+    if "question_type_id" in fields:
+        question_types = {question.question_type.id: question.question_type.name
+                          for question in questions if question.question_type is not None}
+        bank["question_types"] = {str(type_id): name for type_id, name in sorted(question_types.items())}
+    bank["questions"] = [_compact_question_dict(question, fields) for question in questions]
+    return bank
+
+
+def render_questions(
+    licence_id: int, questions, fmt: str = "full", fields: Optional[Tuple[str, ...]] = None
+) -> bytes:
+    """Serializa una lista de preguntas ya cargadas en el formato pedido."""
+    if fmt == "compact":
+        return dumps(_compact_bank(licence_id, questions, fields or COMPACT_QUESTION_FIELDS))
+    if fields is not None:
+        return dumps([_full_question_dict(question, fields) for question in questions])
+    return question_list_adapter.dump_json(
+        question_list_adapter.validate_python(questions, from_attributes=True)
+    )
+
+
+def _question_line(question: models.Question, fmt: str, fields: Optional[Tuple[str, ...]]) -> bytes:
+    if fmt == "compact":
+        return dumps(_compact_question_dict(question, fields or COMPACT_QUESTION_FIELDS))
+    if fields is not None:
+        return dumps(_full_question_dict(question, fields))
+    return question_adapter.dump_json(question_adapter.validate_python(question, from_attributes=True))
+
+
+async def stream_questions(
+    licence_id: int,
+    fmt: str = "full",
+    fields: Optional[Tuple[str, ...]] = None,
+    after: Optional[Cursor] = None,
+    chunk_size: int = STREAM_CHUNK_SIZE,
+) -> AsyncIterator[bytes]:
+    """
+    Genera el banco de la licencia en NDJSON (una pregunta por línea) leyendo con un cursor
+    del servidor en tandas de `chunk_size`: la memoria usada no depende del tamaño del banco.
+    Abre su propia sesión porque la de la petición se cierra antes de enviar el cuerpo.
+    En el formato compacto cada línea lleva `question_type_id` (los nombres están en /questions/types/).
+    """
+    from database import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as db:
+        for query in page_queries(licence_id, after):
+            result = await db.stream_scalars(query.execution_options(yield_per=chunk_size))
+            async for partition in result.partitions():
+                # El identity map guarda referencias débiles: las preguntas ya enviadas se liberan
+                yield b"".join(_question_line(question, fmt, fields) + b"\n" for question in partition)
+
+
+# --- Lectura rápida del banco completo: Core y JSON agregado en la base de datos ---
+
+_CHOICE_KEYS = ("text", "image", "is_correct", "id", "question_id")
+
+
+def _json_object(function, values):
+    # Las claves van literales (no como parámetros): asyncpg no sabría de qué tipo son
+    args = []
+    for key, value in zip(_CHOICE_KEYS, values):
+        args.extend((literal_column(f"'{key}'"), value))
+    return function(*args)
+
+
+def _choices_aggregate(dialect_name: str):
+    """
+    Expresión que agrega las opciones de cada pregunta en un array JSON (texto) con las
+    mismas claves que `schemas.Choice`, o None si el motor no sabe hacerlo.
+    """
+    C = models.Choice
+    if dialect_name == "postgresql":
+        choice = _json_object(func.json_build_object, (C.text, C.image, C.is_correct, C.id, C.question_id))
+        aggregate = func.json_agg(aggregate_order_by(choice, C.id)).filter(C.id.isnot(None))
+        return type_coerce(func.coalesce(aggregate, literal_column("'[]'::json")), String)
+    if dialect_name == "sqlite":
+        # SQLite guarda los booleanos como 0/1: se convierten a true/false de JSON
+        is_correct = func.json(case((C.is_correct, literal_column("'true'")), else_=literal_column("'false'")))
+        choice = _json_object(func.json_object, (C.text, C.image, is_correct, C.id, C.question_id))
+        return func.json_group_array(choice).filter(C.id.isnot(None))
+    return None
+
+
+def _question_record(row, choices: List[dict]) -> dict:
+    # Mismo orden de claves que schemas.Question
+    return {
+        "text": row.text,
+        "image": row.image,
+        "num": row.num,
+        "licence_type_id": row.licence_type_id,
+        "question_type_id": row.question_type_id,
+        "id": row.id,
+        "choices": choices,
+        "question_type": {"name": row.question_type_name, "id": row.question_type_id},
+        "image_variants": image_variants(row.image),
+    }
+
+
+def _question_columns():
+    Q = models.Question
+    return (Q.id, Q.text, Q.image, Q.num, Q.licence_type_id, Q.question_type_id,
+            models.QuestionType.name.label("question_type_name"))
+
+
+def question_records_query(licence_id: int, dialect_name: str):
+    """
+    Preguntas de la licencia con su tipo en BANK_ORDER y, si el motor sabe agregarlas,
+    sus opciones en la columna `choices` (JSON).
+    """
+    Q = models.Question
+    aggregate = _choices_aggregate(dialect_name)
+    query = (
+        select(*_question_columns())
+        .join(models.QuestionType, models.QuestionType.id == Q.question_type_id)
+        .where(Q.licence_type_id == licence_id)
+        .order_by(*BANK_ORDER)
+    )
+    if aggregate is None:
+        return query
+    return (
+        query.add_columns(aggregate.label("choices"))
+        .outerjoin(models.Choice, models.Choice.question_id == Q.id)
+        .group_by(Q.id, models.QuestionType.id)
+    )
+
+
+async def load_question_records(db: AsyncSession, licence_id: int) -> List[dict]:
+    """
+    Preguntas de la licencia, con sus opciones y su tipo, como diccionarios con la forma de
+    `schemas.Question`, ordenadas por num. En Postgres y SQLite es una sola consulta que
+    devuelve las opciones ya agregadas en JSON (json_agg / json_group_array): no se crean
+    objetos del ORM ni se validan con Pydantic. Con otros motores, dos consultas de tuplas.
+    """
+    Q, C = models.Question, models.Choice
+    dialect_name = db.get_bind().dialect.name
+
+    if _choices_aggregate(dialect_name) is not None:
+        rows = (await db.execute(question_records_query(licence_id, dialect_name))).all()
+        records = []
+        for row in rows:
+            choices = loads(row.choices) if isinstance(row.choices, (str, bytes)) else row.choices
+            if dialect_name != "postgresql":
+                # json_group_array no garantiza el orden de las opciones
+                choices.sort(key=itemgetter("id"))
+            for choice in choices:
+                choice["image_variants"] = image_variants(choice["image"])
+            records.append(_question_record(row, choices))
+        return records
+
+    rows = (await db.execute(question_records_query(licence_id, dialect_name))).all()
+    choices_by_question: Dict[int, List[dict]] = {row.id: [] for row in rows}
+    choice_rows = await db.execute(
+        select(C.text, C.image, C.is_correct, C.id, C.question_id)
+        .join(Q, Q.id == C.question_id)
+        .where(Q.licence_type_id == licence_id)
+        .order_by(C.id)
+    )
+    for choice in choice_rows:
+        choices_by_question[choice.question_id].append(
+            {**dict(zip(_CHOICE_KEYS, choice)), "image_variants": image_variants(choice.image)}
+        )
+    return [_question_record(row, choices_by_question[row.id]) for row in rows]
+
+
+def _compact_record(record: dict, fields: Tuple[str, ...]) -> dict:
+    return {
+        field: (
+            [{key: choice[key] for key in ("text", "image", "is_correct", "id", "image_variants")}
+             for choice in record["choices"]]
+            if field == "choices" else record[field]
+        )
+        for field in fields
+    }
+
+
+def render_records(
+    licence_id: int, records: List[dict], fmt: str = "full", fields: Optional[Tuple[str, ...]] = None
+) -> bytes:
+    """Como `render_questions`, pero a partir de los diccionarios de `load_question_records`."""
+    if fmt == "compact":
+        fields = fields or COMPACT_QUESTION_FIELDS
+        bank = {"licence_id": licence_id}
+        if "question_type_id" in fields:
+            question_types = {record["question_type_id"]: record["question_type"]["name"] for record in records}
+            bank["question_types"] = {str(type_id): name for type_id, name in sorted(question_types.items())}
+        bank["questions"] = [_compact_record(record, fields) for record in records]
+        return dumps(bank)
+    if fields is not None:
+        return dumps([{field: record[field] for field in fields} for record in records])
+    return dumps(records)
+
+
+async def render_question_bank(
+    db: AsyncSession, licence_id: int, fmt: str = "full", fields: Optional[Tuple[str, ...]] = None
+) -> bytes:
+    """
+    Carga las preguntas (con opciones y tipo) de una licencia y las devuelve serializadas
+    como JSON. Sin formato ni campos, con el mismo formato que `List[schemas.Question]`;
+    con `fmt="compact"` o una selección de campos ver `parse_fields`. Usa la lectura con
+    Core de `load_question_records`. No comprueba que la licencia exista.
+    """
+    return render_records(licence_id, await load_question_records(db, licence_id), fmt, fields)
+
+
+async def render_question_bank_orm(
+    db: AsyncSession, licence_id: int, fmt: str = "full", fields: Optional[Tuple[str, ...]] = None
+) -> bytes:
+    """Lectura anterior con objetos del ORM y validación de Pydantic (referencia para benchmarks)."""
+    return render_questions(licence_id, await _load_questions(db, licence_id), fmt, fields)
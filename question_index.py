@@ -0,0 +1,238 @@
+# question_index.py
+from array import array
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Sequence
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+import random
+import threading
+
+from cache import question_bank_cache
+from database import fill_session
+import models
+
+
+class AliasTable:
+    """
+    Tabla de alias de Vose: tras construirla en O(k), cada extracción de un índice
+    con probabilidad proporcional a su peso cuesta O(1).
+    """
+
+    def __init__(self, weights: Sequence[float]):
+        k = len(weights)
+        total = sum(weights)
+        prob = [w * k / total for w in weights]
+        alias = [0] * k
+        small = [i for i, p in enumerate(prob) if p < 1.0]
+        large = [i for i, p in enumerate(prob) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            alias[s] = l
+            prob[l] -= 1.0 - prob[s]
+            (small if prob[l] < 1.0 else large).append(l)
+        for i in small + large:
+            prob[i] = 1.0
+        self.prob = prob
+        self.alias = alias
+
+    def draw(self, rng: random.Random) -> int:
+        i = rng.randrange(len(self.prob))
+        return i if rng.random() < self.prob[i] else self.alias[i]
+
+
+@dataclass(frozen=True)
+class LicenceQuestionIndex:
+    """
+    Índice precalculado de IDs de preguntas de una licencia.
+    Los IDs se guardan ordenados por `num` para que el muestreo con semilla sea reproducible.
+    """
+    licence_id: int
+    revision: int
+    question_ids: array
+    ids_by_type: Dict[int, array]
+    type_of: Dict[int, int]  # question_id -> question_type_id
+
+    def sample(self, n: int, seed: int, stratified: bool = False) -> List[int]:
+        """
+        Devuelve `n` IDs de preguntas elegidos al azar con la semilla dada.
+        Con `stratified=True` se respeta la proporción de cada tipo de pregunta del banco.
+        """
+        rng = random.Random(seed)
+        n = min(n, len(self.question_ids))
+        if not stratified:
+            return rng.sample(self.question_ids, n)
+
+        # Reparto proporcional por tipo (método del mayor resto), en orden de tipo estable
+        total = len(self.question_ids)
+        type_ids = sorted(self.ids_by_type)
+        quotas = {t: n * len(self.ids_by_type[t]) / total for t in type_ids}
+        counts = {t: int(quotas[t]) for t in type_ids}
+        remaining = n - sum(counts.values())
+        for t in sorted(type_ids, key=lambda t: (counts[t] - quotas[t], t))[:remaining]:
+            counts[t] += 1
+
+        selected = []
+        for t in type_ids:
+            selected.extend(rng.sample(self.ids_by_type[t], counts[t]))
+        rng.shuffle(selected)
+        return selected
+
+    def sample_adaptive(
+        self,
+        n: int,
+        seed: int,
+        type_mistake_rates: Dict[int, float],
+        missed_question_ids: Iterable[int] = (),
+        type_bias: float = 3.0,
+        missed_boost: float = 4.0,
+    ) -> List[int]:
+        """
+        Muestreo ponderado hacia los puntos débiles del alumno, sin repetir preguntas.
+        Cada tipo pesa (preguntas restantes) * (1 + type_bias * tasa de error del tipo), y
+        dentro de un tipo cada pregunta fallada antes pesa `missed_boost` frente a 1 del resto.
+        El tipo se elige con una tabla de alias (O(1)) que solo se reconstruye cuando un tipo
+        se agota, así que el coste no depende del tamaño del banco.
+        """
+        rng = random.Random(seed)
+        n = min(n, len(self.question_ids))
+
+        missed_by_type: Dict[int, List[int]] = {}
+        for question_id in sorted(set(missed_question_ids)):
+            question_type_id = self.type_of.get(question_id)
+            if question_type_id is not None:
+                missed_by_type.setdefault(question_type_id, []).append(question_id)
+        missed_all = {question_id for ids in missed_by_type.values() for question_id in ids}
+        remaining = {t: len(ids) for t, ids in self.ids_by_type.items()}
+
+        def build_table():
+            types = [t for t in sorted(self.ids_by_type) if remaining[t] > 0]
+            weights = [
+                (remaining[t] + (missed_boost - 1) * len(missed_by_type.get(t, ())))
+                * (1 + type_bias * min(max(type_mistake_rates.get(t, 0.0), 0.0), 1.0))
+                for t in types
+            ]
+            return types, AliasTable(weights)
+
+        types, table = build_table()
+        selected: List[int] = []
+        chosen = set()
+        while len(selected) < n:
+            t = types[table.draw(rng)]
+            if remaining[t] == 0:
+                types, table = build_table()
+                continue
+
+            missed = missed_by_type.get(t, [])
+            rest_count = remaining[t] - len(missed)
+            if missed and rng.random() * (missed_boost * len(missed) + rest_count) < missed_boost * len(missed):
+                # Pregunta fallada antes: se saca de su lista (intercambio con la última, O(1))
+                i = rng.randrange(len(missed))
+                missed[i], missed[-1] = missed[-1], missed[i]
+                question_id = missed.pop()
+            else:
+                # Resto del tipo: elección uniforme con rechazo de las ya elegidas o falladas
+                ids = self.ids_by_type[t]
+                while True:
+                    question_id = ids[rng.randrange(len(ids))]
+                    if question_id not in chosen and question_id not in missed_all:
+                        break
+
+            chosen.add(question_id)
+            selected.append(question_id)
+            remaining[t] -= 1
+        return selected
+
+
+_indexes: Dict[int, LicenceQuestionIndex] = {}
+_lock = threading.Lock()
+
+
+def licence_index_query(licence_id: int):
+    return (
+        select(models.Question.id, models.Question.question_type_id)
+        .where(models.Question.licence_type_id == licence_id)
+        .order_by(models.Question.num, models.Question.id)
+    )
+
+
+async def get_licence_index(db: AsyncSession, licence_id: int) -> LicenceQuestionIndex:
+    """
+    Devuelve el índice de la licencia, construyéndolo solo si no existe o si el banco
+    cambió (la revisión la incrementa `create_question` a través de la caché).
+    """
+    revision = question_bank_cache.revision(licence_id)
+    index = _indexes.get(licence_id)
+    if index is not None and index.revision == revision:
+        return index
+
+    async with fill_session(db, question_bank_cache.changed_at(licence_id)) as fill_db:
+        rows = (await fill_db.execute(licence_index_query(licence_id))).all()
+
+    question_ids = array("i")
+    ids_by_type: Dict[int, array] = {}
+    type_of: Dict[int, int] = {}
+    for question_id, question_type_id in rows:
+        question_ids.append(question_id)
+        # Las preguntas sin tipo se agrupan bajo 0 para poder ordenar los tipos
+        ids_by_type.setdefault(question_type_id or 0, array("i")).append(question_id)
+        type_of[question_id] = question_type_id or 0
+
+    index = LicenceQuestionIndex(licence_id, revision, question_ids, ids_by_type, type_of)
+    with _lock:
+        _indexes[licence_id] = index
+    return index
+
+
+@dataclass(frozen=True)
+class AnswerKey:
+    """
+    Clave de respuestas de una licencia: question_id -> IDs de las opciones correctas
+    (`correct`) y de todas sus opciones (`choices`, para validar lo que envía el cliente).
+    """
+    licence_id: int
+    revision: int
+    correct: Dict[int, FrozenSet[int]]
+    choices: Dict[int, FrozenSet[int]]
+
+
+_answer_keys: Dict[int, AnswerKey] = {}
+
+
+def answer_key_query(licence_id: int):
+    return (
+        select(models.Question.id, models.Choice.id, models.Choice.is_correct)
+        .outerjoin(models.Choice, models.Choice.question_id == models.Question.id)
+        .where(models.Question.licence_type_id == licence_id)
+    )
+
+
+async def get_answer_key(db: AsyncSession, licence_id: int) -> AnswerKey:
+    """
+    Devuelve la clave de respuestas de la licencia. Se carga la primera vez que se
+    corrige un examen de la licencia y se vuelve a cargar solo si su banco cambió.
+    """
+    revision = question_bank_cache.revision(licence_id)
+    answer_key = _answer_keys.get(licence_id)
+    if answer_key is not None and answer_key.revision == revision:
+        return answer_key
+
+    async with fill_session(db, question_bank_cache.changed_at(licence_id)) as fill_db:
+        rows = (await fill_db.execute(answer_key_query(licence_id))).all()
+    correct: Dict[int, set] = {}
+    choices: Dict[int, set] = {}
+    for question_id, choice_id, is_correct in rows:
+        correct.setdefault(question_id, set())
+        question_choices = choices.setdefault(question_id, set())
+        if choice_id is not None:
+            question_choices.add(choice_id)
+            if is_correct:
+                correct[question_id].add(choice_id)
+
+    answer_key = AnswerKey(
+        licence_id, revision,
+        {q: frozenset(c) for q, c in correct.items()},
+        {q: frozenset(c) for q, c in choices.items()},
+    )
+    with _lock:
+        _answer_keys[licence_id] = answer_key
+    return answer_key
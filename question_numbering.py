@@ -0,0 +1,90 @@
+# question_numbering.py
+"""
+Numeración de preguntas por licencia sin carreras.
+
+Cada licencia tiene una fila en `question_counters` con el último número asignado. Reservar
+números es un único `UPDATE ... RETURNING` que incrementa el contador: la fila queda
+bloqueada hasta el commit, así que dos creaciones simultáneas nunca obtienen el mismo
+número (y la restricción única de (licence_type_id, num) lo garantiza en cualquier caso).
+Si la transacción se revierte, el contador vuelve atrás con ella.
+
+La misma fila guarda la generación del banco de la licencia, que se incrementa en la
+transacción de cada escritura (preguntas nuevas, importaciones, imágenes subidas). Los
+snapshots la guardan al generarse y dejan de servirse cuando ya no coincide.
+"""
+from typing import Dict
+from sqlalchemy import func, literal, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+
+
+# Motores con INSERT ... ON CONFLICT, necesario para crear la fila del contador sin carreras
+_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def check_dialect(dialect_name: str):
+    """Falla al arrancar (y no en la primera pregunta creada) si el motor no tiene contadores."""
+    if dialect_name not in _INSERTS:
+        raise RuntimeError(
+            f"Los contadores de preguntas no admiten el motor {dialect_name!r}: "
+            f"DATABASE_URL debe ser {' o '.join(sorted(_INSERTS))}"
+        )
+
+
+def _insert_for(dialect_name: str):
+    check_dialect(dialect_name)
+    return _INSERTS[dialect_name]
+
+
+def increment_statement(licence_id: int, count: int = 1):
+    """UPDATE ... RETURNING que reserva `count` números y marca el cambio del banco."""
+    return (
+        update(models.QuestionCounter)
+        .where(models.QuestionCounter.licence_type_id == licence_id)
+        .values(
+            last_num=models.QuestionCounter.last_num + count,
+            generation=models.QuestionCounter.generation + 1,
+        )
+        .returning(models.QuestionCounter.last_num)
+    )
+
+
+async def allocate_nums(db: AsyncSession, licence_id: int, count: int = 1) -> int:
+    """
+    Reserva `count` números consecutivos para preguntas de la licencia y devuelve el primero.
+    Debe llamarse dentro de la transacción que inserta las preguntas.
+    """
+    increment = increment_statement(licence_id, count)
+    last_num = await db.scalar(increment)
+    if last_num is None:
+        # Primera pregunta de la licencia desde que existen los contadores: se crea la fila a
+        # partir del número más alto actual. Si otra transacción la crea a la vez, no se hace nada.
+        insert = _insert_for(db.get_bind().dialect.name)
+        await db.execute(
+            insert(models.QuestionCounter)
+            .from_select(
+                ["licence_type_id", "last_num"],
+                select(literal(licence_id), func.coalesce(func.max(models.Question.num), 0))
+                .where(models.Question.licence_type_id == licence_id),
+            )
+            .on_conflict_do_nothing(index_elements=[models.QuestionCounter.licence_type_id])
+        )
+        last_num = await db.scalar(increment)
+    return last_num - count + 1
+
+
+async def bump_generation(db: AsyncSession, licence_id: int):
+    """Marca un cambio en el banco de la licencia que no reserva números (p. ej. una imagen)."""
+    await db.execute(
+        update(models.QuestionCounter)
+        .where(models.QuestionCounter.licence_type_id == licence_id)
+        .values(generation=models.QuestionCounter.generation + 1)
+    )
+
+
+async def bank_generations(db: AsyncSession) -> Dict[int, int]:
+    """Generación actual del banco de cada licencia (las que no tienen fila están en 0)."""
+    rows = await db.execute(select(models.QuestionCounter.licence_type_id, models.QuestionCounter.generation))
+    return dict(rows.all())
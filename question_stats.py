@@ -0,0 +1,124 @@
+# question_stats.py
+"""
+Estadísticas de dificultad por pregunta, mantenidas de forma incremental.
+
+Cada lote de intentos que guarda `attempt_recorder` se agrega en memoria por pregunta y
+se suma a los contadores de `question_stats` con un único upsert, en la misma transacción
+que los intentos. Leer las estadísticas de una licencia nunca recorre los intentos.
+"""
+from typing import Dict, List
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects import postgresql, sqlite
+
+import models
+import schemas
+
+
+# Motores con INSERT ... ON CONFLICT DO UPDATE, con el que se suman los lotes
+_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def check_dialect(dialect_name: str):
+    """Falla al arrancar (y no al guardar el primer lote de intentos) si el motor no tiene upsert."""
+    if dialect_name not in _INSERTS:
+        raise RuntimeError(
+            f"Las estadísticas de preguntas no admiten el motor {dialect_name!r}: "
+            f"DATABASE_URL debe ser {' o '.join(sorted(_INSERTS))}"
+        )
+
+
+def _insert_for(dialect_name: str):
+    check_dialect(dialect_name)
+    return _INSERTS[dialect_name]
+
+
+async def apply_attempt_batch(db: AsyncSession, batch) -> int:
+    """
+    Suma a `question_stats` las respuestas de un lote de intentos (`PendingAttempt`).
+    Devuelve el número de preguntas actualizadas.
+    """
+    deltas: Dict[int, List[int]] = {}  # question_id -> [answers, mistakes, time_total_ms, timed_answers]
+    for attempt in batch:
+        for answer in attempt.answers:
+            delta = deltas.setdefault(answer["question_id"], [0, 0, 0, 0])
+            delta[0] += 1
+            delta[1] += 0 if answer["is_correct"] else 1
+            if answer.get("time_ms") is not None:
+                delta[2] += answer["time_ms"]
+                delta[3] += 1
+    if not deltas:
+        return 0
+
+    insert = _insert_for(db.get_bind().dialect.name)
+    stmt = insert(models.QuestionStats)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.QuestionStats.question_id],
+        set_={
+            "answers": models.QuestionStats.answers + stmt.excluded.answers,
+            "mistakes": models.QuestionStats.mistakes + stmt.excluded.mistakes,
+            "time_total_ms": models.QuestionStats.time_total_ms + stmt.excluded.time_total_ms,
+            "timed_answers": models.QuestionStats.timed_answers + stmt.excluded.timed_answers,
+        },
+    )
+    # Orden fijo por question_id para que dos workers no se bloqueen mutuamente
+    await db.execute(stmt, [
+        {
+            "question_id": question_id,
+            "answers": answers,
+            "mistakes": mistakes,
+            "time_total_ms": time_total_ms,
+            "timed_answers": timed_answers,
+        }
+        for question_id, (answers, mistakes, time_total_ms, timed_answers) in sorted(deltas.items())
+    ])
+    return len(deltas)
+
+
+def _rates(answers: int, mistakes: int, time_total_ms: int, timed_answers: int) -> dict:
+    return {
+        "answers": answers,
+        "mistakes": mistakes,
+        "mistake_rate": round(mistakes / answers, 4) if answers else None,
+        "mean_time_ms": round(time_total_ms / timed_answers, 1) if timed_answers else None,
+    }
+
+
+def difficulty_query(licence_id: int):
+    """Preguntas de la licencia con sus contadores (nulos si aún no tienen respuestas)."""
+    stats = models.QuestionStats
+    return (
+        select(
+            models.Question.id, models.Question.num, models.Question.question_type_id, models.QuestionType.name,
+            stats.answers, stats.mistakes, stats.time_total_ms, stats.timed_answers,
+        )
+        .outerjoin(stats, stats.question_id == models.Question.id)
+        .outerjoin(models.QuestionType, models.QuestionType.id == models.Question.question_type_id)
+        .where(models.Question.licence_type_id == licence_id)
+        .order_by(models.Question.num, models.Question.id)
+    )
+
+
+async def get_licence_difficulty(db: AsyncSession, licence_id: int) -> schemas.LicenceDifficulty:
+    """
+    Estadísticas de cada pregunta de la licencia y de cada tipo de pregunta. Es una sola
+    consulta sobre las preguntas de la licencia (O(preguntas)); los tipos se agregan en memoria.
+    """
+    result = await db.execute(difficulty_query(licence_id))
+
+    questions = []
+    by_type: Dict[int, list] = {}  # question_type_id -> [nombre, answers, mistakes, time_total_ms, timed_answers]
+    for question_id, num, question_type_id, type_name, *counters in result.all():
+        counters = [value or 0 for value in counters]
+        questions.append(schemas.QuestionDifficulty(
+            question_id=question_id, num=num, question_type_id=question_type_id, **_rates(*counters)
+        ))
+        totals = by_type.setdefault(question_type_id, [type_name, 0, 0, 0, 0])
+        for i, value in enumerate(counters, start=1):
+            totals[i] += value
+
+    question_types = [
+        schemas.QuestionTypeDifficulty(question_type_id=question_type_id, name=totals[0], **_rates(*totals[1:]))
+        for question_type_id, totals in sorted(by_type.items(), key=lambda item: (item[0] is None, item[0] or 0))
+    ]
+    return schemas.LicenceDifficulty(licence_id=licence_id, questions=questions, question_types=question_types)
@@ -0,0 +1,164 @@
+# reference_data.py
+"""
+Datos de referencia en memoria: versiones, tipos de licencia, tipos de pregunta y
+licencias, ya serializados a JSON.
+
+Se cargan al arrancar (lifespan) y se recargan cada REFERENCE_REFRESH_SECONDS en segundo
+plano, así que /versions/, /questions/types/ y /licences/... no consultan la base de
+datos. Cada recarga construye un `ReferenceData` nuevo e inmutable y lo sustituye de una
+vez: las peticiones nunca ven una mezcla de datos viejos y nuevos.
+"""
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import List, Mapping, Optional
+from dotenv import load_dotenv
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+import asyncio
+import hashlib
+import logging
+import os
+import time
+
+import models
+import schemas
+
+load_dotenv()
+
+REFERENCE_REFRESH_SECONDS = float(os.getenv("REFERENCE_REFRESH_SECONDS", "300"))
+
+logger = logging.getLogger("reference_data")
+
+version_list_adapter = TypeAdapter(List[schemas.Version])
+question_type_list_adapter = TypeAdapter(List[schemas.QuestionType])
+licence_list_adapter = TypeAdapter(List[schemas.LicenceType])
+licence_adapter = TypeAdapter(schemas.LicenceType)
+
+
+@dataclass(frozen=True)
+class JSONDocument:
+    body: bytes
+    digest: str  # Hash del contenido: sirve de ETag y no cambia entre workers ni reinicios
+
+
+def _document(body: bytes) -> JSONDocument:
+    return JSONDocument(body, hashlib.sha256(body).hexdigest()[:16])
+
+
+@dataclass(frozen=True)
+class ReferenceData:
+    loaded_at: float
+    versions: JSONDocument
+    question_types: JSONDocument
+    licences_by_version: Mapping[int, JSONDocument]  # Solo versiones existentes (sin licencias: [])
+    licences: Mapping[int, JSONDocument]
+
+
+async def load_reference_data(db: AsyncSession) -> ReferenceData:
+    versions = (await db.execute(select(models.Version))).scalars().all()
+    question_types = (await db.execute(select(models.QuestionType))).scalars().all()
+    # Se cargan todas las licencias (no solo las habilitadas) para que los endpoints
+    # devuelvan lo mismo que cuando consultaban la base de datos
+    licences = (await db.execute(
+        select(models.LicenceType)
+        .options(joinedload(models.LicenceType.version), joinedload(models.LicenceType.type))
+        .order_by(models.LicenceType.id)
+    )).scalars().all()
+
+    licence_models = licence_list_adapter.validate_python(licences, from_attributes=True)
+    by_version = {version.id: [] for version in versions}
+    for licence in licence_models:
+        by_version.setdefault(licence.version_id, []).append(licence)
+
+    return ReferenceData(
+        loaded_at=time.time(),
+        versions=_document(version_list_adapter.dump_json(
+            version_list_adapter.validate_python(versions, from_attributes=True)
+        )),
+        question_types=_document(question_type_list_adapter.dump_json(
+            question_type_list_adapter.validate_python(question_types, from_attributes=True)
+        )),
+        licences_by_version=MappingProxyType({
+            version_id: _document(licence_list_adapter.dump_json(items))
+            for version_id, items in by_version.items()
+        }),
+        licences=MappingProxyType({
+            licence.id: _document(licence_adapter.dump_json(licence)) for licence in licence_models
+        }),
+    )
+
+
+class ReferenceRegistry:
+    """Guarda el `ReferenceData` vigente y lo recarga periódicamente en segundo plano."""
+
+    def __init__(self, refresh_seconds: float = REFERENCE_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._data: Optional[ReferenceData] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.loads = 0
+        self.failures = 0
+
+    async def refresh(self, db: Optional[AsyncSession] = None) -> ReferenceData:
+        from database import AsyncSessionLocal
+
+        if db is not None:
+            data = await load_reference_data(db)
+        else:
+            async with AsyncSessionLocal() as session:
+                data = await load_reference_data(session)
+        self._data = data
+        self.loads += 1
+        return data
+
+    async def get(self, db: AsyncSession) -> ReferenceData:
+        """Datos vigentes; si aún no se cargaron (arranque fallido o sin lifespan) se cargan con `db`."""
+        if self._data is not None:
+            return self._data
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._data is None:
+                await self.refresh(db)
+            return self._data
+
+    async def start(self):
+        """Carga inicial y recarga periódica. Si la base de datos no responde no impide arrancar."""
+        try:
+            await self.refresh()
+        except Exception as e:
+            self.failures += 1
+            logger.error("No se pudieron precargar los datos de referencia: %s", e)
+        if self.refresh_seconds > 0 and (self._worker is None or self._worker.done()):
+            self._worker = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            try:
+                await self.refresh()
+            except Exception as e:
+                self.failures += 1
+                logger.error("No se pudieron recargar los datos de referencia: %s", e)
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    def stats(self) -> dict:
+        return {
+            "loaded_at": self._data.loaded_at if self._data else None,
+            "refresh_seconds": self.refresh_seconds,
+            "loads": self.loads,
+            "failures": self.failures,
+        }
+
+
+reference_registry = ReferenceRegistry()
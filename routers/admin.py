@@ -0,0 +1,126 @@
+# routers/admin.py
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import get_async_db, get_pool_status, replica_router
+from snapshots import build_snapshots
+from uploads import upload_pipeline
+from attempts import attempt_recorder
+from reference_data import reference_registry
+from bank_watcher import bank_watcher
+from admission import admission_controller
+from images import image_store
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["Admin"],
+)
+
+
+@router.get("/db-pool")
+async def get_db_pool_status():
+    """
+    Devuelve el estado del pool de conexiones de este worker: conexiones en uso (checked_out),
+    overflow y tiempos de espera por una conexión. Sirve para dimensionar DB_POOL_SIZE y
+    DB_MAX_OVERFLOW según el número de workers de uvicorn.
+    """
+    return get_pool_status()
+
+
+@router.get("/admission")
+async def get_admission_status():
+    """
+    Devuelve el control de admisión de este worker por clase de ruta: presupuesto,
+    peticiones en curso y en cola, esperas y rechazos (cola llena o espera agotada).
+    """
+    return admission_controller.stats()
+
+
+@router.get("/db-replicas")
+async def get_db_replicas_status():
+    """
+    Devuelve el estado de las réplicas de lectura en este worker (sanas o no, lecturas
+    servidas y fallos) y cuántas lecturas fueron al primario.
+    """
+    return replica_router.stats()
+
+
+@router.post("/db-replicas/check")
+async def check_db_replicas():
+    """Comprueba ya todas las réplicas, sin esperar a la comprobación periódica."""
+    await replica_router.check()
+    return replica_router.stats()
+
+
+@router.post("/snapshots/build")
+async def build_question_bank_snapshots(db: AsyncSession = Depends(get_async_db)):
+    """
+    Regenera los snapshots estáticos del banco de preguntas de todas las licencias
+    (JSON + gzip/brotli con hash en el nombre) y devuelve el manifiesto.
+    """
+    return await build_snapshots(db)
+
+
+@router.get("/uploads")
+async def get_upload_pipeline_status():
+    """
+    Devuelve el estado de la cola de subida de imágenes de este worker
+    (subidas pendientes, completadas y fallidas).
+    """
+    return upload_pipeline.stats()
+
+
+@router.get("/attempts")
+async def get_attempt_recorder_status():
+    """
+    Devuelve el estado de la cola de intentos de este worker (encolados, guardados,
+    descartados por cola llena y fallidos).
+    """
+    return attempt_recorder.stats()
+
+
+@router.get("/images")
+async def get_image_cache_status():
+    """
+    Devuelve el estado de la caché de variantes de imágenes de este worker (entradas,
+    bytes en disco, aciertos, variantes generadas y desalojadas).
+    """
+    return image_store.stats()
+
+
+@router.get("/reference")
+async def get_reference_data_status():
+    """
+    Devuelve cuándo se cargaron por última vez los datos de referencia en memoria
+    (versiones, tipos y licencias) y cada cuánto se recargan.
+    """
+    return reference_registry.stats()
+
+
+@router.post("/reference/refresh")
+async def refresh_reference_data(db: AsyncSession = Depends(get_async_db)):
+    """
+    Recarga ya los datos de referencia de este worker, sin esperar a la recarga periódica
+    (por ejemplo, después de editar licencias directamente en la base de datos).
+    """
+    await reference_registry.refresh(db)
+    return reference_registry.stats()
+
+
+@router.get("/bank-watcher")
+async def get_bank_watcher_status():
+    """
+    Devuelve cuándo comprobó este worker por última vez las generaciones del banco y
+    cuántas licencias invalidó por cambios hechos en otros procesos.
+    """
+    return bank_watcher.stats()
+
+
+@router.post("/bank-watcher/check")
+async def check_bank_generations():
+    """
+    Comprueba ya las generaciones del banco e invalida las licencias que cambiaron, sin
+    esperar a la comprobación periódica (por ejemplo, justo después de una importación por CLI).
+    """
+    await bank_watcher.check()
+    return bank_watcher.stats()
@@ -0,0 +1,172 @@
+# routers/exams.py
+from collections import Counter
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from typing import List, Optional
+import random
+
+from attempts import PendingAttempt, attempt_recorder
+from database import get_read_db
+from question_index import get_answer_key, get_licence_index
+import models
+import schemas
+
+router = APIRouter(
+    prefix="/exams",
+    tags=["Exams"],
+    responses={404: {"description": "Licence not found"}},
+)
+
+
+@router.get("/generate", response_model=schemas.Exam)
+async def generate_exam(
+    licence_id: int,
+    n: int = Query(20, ge=1, le=200),
+    seed: Optional[int] = None,
+    stratified: bool = False,
+    include_answers: bool = True, # false: las opciones no incluyen is_correct (corrección en /exams/grade)
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Genera un examen simulado con `n` preguntas elegidas al azar del banco de la licencia.
+    Con la misma semilla siempre se obtiene el mismo examen; si no se envía, se genera una
+    y se devuelve en la respuesta. Con `stratified=true` se respeta la proporción de cada
+    tipo de pregunta. Solo se cargan de la base de datos las preguntas elegidas.
+    """
+    index = await _load_index(db, licence_id)
+    if seed is None:
+        seed = random.SystemRandom().randrange(2**31)
+    question_ids = index.sample(n, seed, stratified=stratified)
+    return await _build_exam(db, licence_id, seed, question_ids, include_answers)
+
+
+@router.post("/generate/adaptive", response_model=schemas.Exam)
+async def generate_adaptive_exam(
+    request: schemas.AdaptiveExamRequest,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Genera un examen orientado a los puntos débiles del alumno: los tipos de pregunta con
+    mayor tasa de error y las preguntas falladas anteriormente tienen más probabilidad de
+    salir, sin repetir preguntas. La selección se hace sobre el índice en memoria de la
+    licencia; solo se consultan las preguntas elegidas.
+    """
+    index = await _load_index(db, request.licence_id)
+    seed = request.seed
+    if seed is None:
+        seed = random.SystemRandom().randrange(2**31)
+    question_ids = index.sample_adaptive(
+        request.n, seed, request.type_mistake_rates, request.missed_question_ids
+    )
+    return await _build_exam(db, request.licence_id, seed, question_ids, request.include_answers)
+
+
+async def _load_index(db: AsyncSession, licence_id: int):
+    index = await get_licence_index(db, licence_id)
+    if not index.question_ids:
+        licence_exists = await db.scalar(select(models.LicenceType.id).where(models.LicenceType.id == licence_id))
+        if not licence_exists:
+            raise HTTPException(status_code=404, detail=f"Licencia con ID {licence_id} no encontrada.")
+    return index
+
+
+async def _build_exam(db: AsyncSession, licence_id: int, seed: int, question_ids: List[int], include_answers: bool):
+    """Carga las preguntas elegidas en una sola consulta y arma el examen en el orden del muestreo."""
+    result = await db.execute(
+        select(models.Question)
+        .options(joinedload(models.Question.choices),
+                 joinedload(models.Question.question_type))
+        .where(models.Question.id.in_(question_ids))
+    )
+    questions = result.unique().scalars().all()
+    # Se respeta el orden del muestreo, no el de la base de datos
+    by_id = {question.id: question for question in questions}
+    ordered = [by_id[question_id] for question_id in question_ids if question_id in by_id]
+
+    exam = schemas.Exam(licence_id=licence_id, seed=seed, questions=ordered)
+    if not include_answers:
+        return Response(
+            content=exam.model_dump_json(exclude={"questions": {"__all__": {"choices": {"__all__": {"is_correct"}}}}}),
+            media_type="application/json",
+        )
+    return exam
+
+
+@router.post("/grade", response_model=schemas.ExamResult)
+async def grade_exam(
+    submission: schemas.ExamSubmission,
+    record: bool = True,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Corrige un examen completo (pregunta -> opción elegida) contra la clave de respuestas
+    de la licencia, que se mantiene en memoria: corregir no consulta la base de datos
+    salvo la primera vez o después de que cambie el banco de la licencia.
+    Con `record=true` el intento se encola para guardarse por lotes en segundo plano.
+    """
+    counts = Counter(answer.question_id for answer in submission.answers)
+    duplicated = sorted(question_id for question_id, count in counts.items() if count > 1)
+    if duplicated:
+        # Cada pregunta se corrige una sola vez: repetirla inflaría total y correct
+        raise HTTPException(status_code=400, detail=f"Las preguntas {duplicated} están repetidas.")
+
+    answer_key = await get_answer_key(db, submission.licence_id)
+    unknown = [answer.question_id for answer in submission.answers if answer.question_id not in answer_key.correct]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Las preguntas {unknown} no pertenecen a la licencia {submission.licence_id}.",
+        )
+
+    foreign = [
+        answer.choice_id for answer in submission.answers
+        if answer.choice_id is not None and answer.choice_id not in answer_key.choices[answer.question_id]
+    ]
+    if foreign:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Las opciones {foreign} no pertenecen a la pregunta respondida.",
+        )
+
+    results = []
+    for answer in submission.answers:
+        correct_choice_ids = answer_key.correct[answer.question_id]
+        results.append(schemas.AnswerResult(
+            question_id=answer.question_id,
+            choice_id=answer.choice_id,
+            is_correct=answer.choice_id in correct_choice_ids,
+            correct_choice_ids=sorted(correct_choice_ids),
+        ))
+
+    total = len(results)
+    correct = sum(result.is_correct for result in results)
+    score = round(correct * 100 / total, 2) if total else 0.0
+
+    recorded = False
+    if record and total:
+        recorded = await attempt_recorder.record(PendingAttempt(
+            licence_type_id=submission.licence_id,
+            total=total,
+            correct=correct,
+            score=score,
+            answers=[
+                {
+                    "question_id": answer.question_id,
+                    "choice_id": answer.choice_id,
+                    "is_correct": result.is_correct,
+                    "time_ms": answer.time_ms,
+                }
+                for answer, result in zip(submission.answers, results)
+            ],
+        ))
+
+    return schemas.ExamResult(
+        licence_id=submission.licence_id,
+        total=total,
+        correct=correct,
+        score=score,
+        recorded=recorded,
+        results=results,
+    )
@@ -0,0 +1,52 @@
+# routers/images.py
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from PIL import UnidentifiedImageError
+from typing import Optional
+
+from http_cache import etag_matches
+from images import IMAGE_CACHE_CONTROL, IMAGE_FORMATS, IMAGE_VARIANT_WIDTHS, ImageSourceError, image_store
+
+router = APIRouter(
+    prefix="/images",
+    tags=["Images"],
+    responses={404: {"description": "Image not found"}},
+)
+
+
+@router.get("/{width}")
+async def get_image_variant(
+    width: int,
+    request: Request,
+    src: str = Query(..., max_length=2048), # URL de la imagen original (columna `image`)
+    fmt: Optional[str] = Query(None, pattern="^(webp|jpeg)$"), # Sin indicar: WebP si el cliente lo acepta
+):
+    """
+    Devuelve la imagen `src` reducida a `width` píxeles de ancho (ver IMAGE_VARIANT_WIDTHS).
+    La variante se genera la primera vez y después se sirve desde la caché en disco, con
+    un ETag fuerte (hash del contenido).
+    """
+    if width not in IMAGE_VARIANT_WIDTHS:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Ancho {width} no disponible. Disponibles: {', '.join(map(str, IMAGE_VARIANT_WIDTHS))}.",
+        )
+    negotiated = fmt is None
+    if negotiated:
+        fmt = "webp" if "image/webp" in request.headers.get("accept", "") else "jpeg"
+
+    headers = {"Cache-Control": IMAGE_CACHE_CONTROL}
+    if negotiated:
+        headers["Vary"] = "Accept"
+    try:
+        path, digest = await image_store.get(src, width, fmt)
+        if etag_matches(request, f'"{digest}"'):
+            return Response(status_code=304, headers={**headers, "ETag": f'"{digest}"'})
+        # Se lee aquí y no con FileResponse: otro worker puede desalojar el archivo entretanto
+        data, digest = await image_store.read(src, width, fmt, path, digest)
+    except ImageSourceError as e:
+        raise HTTPException(status_code=404 if e.allowed else 400, detail=str(e))
+    except (UnidentifiedImageError, ValueError) as e:
+        raise HTTPException(status_code=422, detail=f"No se pudo procesar la imagen: {e}")
+
+    headers["ETag"] = f'"{digest}"'
+    return Response(content=data, media_type=IMAGE_FORMATS[fmt][1], headers=headers)
@@ -1,11 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Form, UploadFile, File
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, HTTPException, status, Form, UploadFile, File, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from typing import List, Optional
+import io
 import json
-from database import get_db
+from database import fill_session, get_async_db, get_read_db
+from cache import question_bank_cache
+from question_bank import (
+    format_cursor, load_page, parse_cursor, parse_fields, render_question_bank, render_questions, stream_questions
+)
+from importer import detect_format, import_questions
+from question_numbering import allocate_nums
+from question_stats import get_licence_difficulty
+from search import search_questions
+from snapshots import SNAPSHOT_MAX_AGE, snapshot_response, snapshot_store
+from http_cache import cache_headers, content_etag, json_response, make_etag, not_modified
+from reference_data import reference_registry
+from uploads import ImageJob, upload_pipeline
 import models
 import schemas
-import cloudinary.uploader
 
 router = APIRouter(
     prefix="/questions",
@@ -13,44 +28,143 @@ router = APIRouter(
     responses={404: {"description": "Question not found"}},
 )
 
+# Tamaño de página cuando se pagina con `after` sin indicar `limit`
+DEFAULT_PAGE_SIZE = 100
+
 
 @router.get("/by_licence/{licence_id}", response_model=List[schemas.Question])
 async def get_questions_by_licence_id(
     licence_id: int, 
-    db: Session = Depends(get_db)
+    request: Request,
+    format: str = Query("full", pattern="^(full|compact)$"), # compact: tipos en una tabla aparte, sin claves redundantes
+    fields: Optional[str] = None, # Campos de cada pregunta separados por comas (ej. id,text,choices)
+    limit: Optional[int] = Query(None, ge=1, le=1000), # Tamaño de página
+    after: Optional[str] = Query(None, max_length=40), # Cursor `num:id` de la última pregunta de la página anterior
+    stream: bool = False, # true: NDJSON (una pregunta por línea) leído en tandas con un cursor
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Obtiene todas las preguntas con sus respuestas para un ID de licencia específico.
+    Si hay un snapshot estático vigente se sirve directamente (precomprimido, con ETag).
+    Si no, la respuesta serializada se guarda en caché hasta que se cree una pregunta
+    nueva para la licencia. El ETag depende de la revisión de la licencia, así que un
+    If-None-Match vigente recibe 304 sin tocar la base de datos.
+    Con `format=compact` y/o `fields=` se devuelve una representación más ligera, que se
+    cachea por separado (los snapshots solo existen para el formato completo).
+    Con `limit`/`after` se pagina por (num, id), con las preguntas sin número al final: la
+    respuesta trae la página y, si hay más, las cabeceras X-Next-After y Link con el cursor
+    siguiente (`num:id`). Con
+    `stream=true` el banco se envía en NDJSON sin cargarlo entero en memoria.
     """
-    licence_exists = (
-        db.query(models.LicenceType).filter(models.LicenceType.id == licence_id).first()
+    try:
+        selected_fields = parse_fields(fields, format)
+        cursor = parse_cursor(after)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    variant = None if format == "full" and selected_fields is None else (format, *(selected_fields or ()))
+
+    paged = limit is not None or after is not None
+    if variant is None and not paged and not stream:
+        snapshot = await snapshot_store.get(licence_id)
+        if snapshot is not None:
+            return snapshot_response(request, snapshot, f"public, max-age={SNAPSHOT_MAX_AGE}")
+
+    # Se toma la revisión antes de consultar: si otra petición escribe mientras
+    # tanto, el resultado no se guarda en caché.
+    revision = question_bank_cache.revision(licence_id)
+    etag_parts = variant or ()
+    if stream:
+        etag_parts = ("ndjson", after, *etag_parts)
+    elif paged:
+        limit = limit or DEFAULT_PAGE_SIZE
+        etag_parts = ("page", after, limit, *etag_parts)
+    etag = make_etag("questions", licence_id, revision, *etag_parts, scope=question_bank_cache.etag_scope)
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+
+    if not paged and not stream:
+        cached = question_bank_cache.get(licence_id, variant)
+        if cached is not None:
+            return Response(content=cached, media_type="application/json", headers=cache_headers(etag))
+
+    licence_exists = await db.scalar(
+        select(models.LicenceType.id).where(models.LicenceType.id == licence_id)
     )
     if not licence_exists:
         raise HTTPException(
             status_code=404, detail=f"Licencia con ID {licence_id} no encontrada."
         )
 
-    questions = (
-        db.query(models.Question)
-        .options(
-            joinedload(models.Question.choices)
-        )  # Carga anticipada de las opciones
-        .options(joinedload(models.Question.question_type))
-        .filter(models.Question.licence_type_id == licence_id)
-        .all()
+    if stream:
+        return StreamingResponse(
+            stream_questions(licence_id, format, selected_fields, cursor),
+            media_type="application/x-ndjson",
+            headers=cache_headers(etag),
+        )
+
+    if paged:
+        questions = await load_page(db, licence_id, cursor, limit)
+        headers = cache_headers(etag)
+        if len(questions) == limit:
+            next_after = format_cursor(questions[-1])
+            headers["X-Next-After"] = str(next_after)
+            headers["Link"] = f'<{request.url.include_query_params(after=next_after, limit=limit)}>; rel="next"'
+        body = render_questions(licence_id, questions, format, selected_fields)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    # Si el banco cambió hace poco se lee del primario: la réplica puede ir con retraso
+    async with fill_session(db, question_bank_cache.changed_at(licence_id)) as fill_db:
+        body = await render_question_bank(fill_db, licence_id, format, selected_fields)
+    question_bank_cache.set(licence_id, body, revision, variant)
+    return Response(content=body, media_type="application/json", headers=cache_headers(etag))
+
+@router.get("/search", response_model=schemas.SearchResults)
+async def search_question_bank(
+    q: str = Query(..., min_length=1, max_length=200),
+    licence_id: Optional[int] = None,
+    version_id: Optional[int] = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Busca preguntas por el texto del enunciado o de sus opciones, sin distinguir tildes ni
+    mayúsculas, ordenadas por relevancia. Todas las palabras deben aparecer; con -palabra
+    se excluyen las preguntas que la contienen. Se puede limitar a una licencia o versión.
+    """
+    return await search_questions(db, q, licence_id, version_id, limit, offset)
+
+@router.get("/cache/stats")
+async def get_question_cache_stats():
+    """
+    Devuelve los contadores de la caché del banco de preguntas (aciertos, fallos, tamaño).
+    """
+    return question_bank_cache.stats()
+
+@router.get("/stats/by_licence/{licence_id}", response_model=schemas.LicenceDifficulty)
+async def get_question_stats_by_licence_id(licence_id: int, db: AsyncSession = Depends(get_read_db)):
+    """
+    Tasa de error y tiempo medio de respuesta de cada pregunta de la licencia y de cada
+    tipo de pregunta. Se leen los contadores acumulados, no los intentos guardados.
+    """
+    licence_exists = await db.scalar(
+        select(models.LicenceType.id).where(models.LicenceType.id == licence_id)
     )
-    return questions
+    if not licence_exists:
+        raise HTTPException(
+            status_code=404, detail=f"Licencia con ID {licence_id} no encontrada."
+        )
+    return await get_licence_difficulty(db, licence_id)
 
 @router.get("/types/", response_model=List[schemas.QuestionType])
-async def get_all_question_types(db: Session = Depends(get_db)):
+async def get_all_question_types(request: Request, db: AsyncSession = Depends(get_read_db)):
     """
     Obtiene una lista de todos los tipos de pregunta disponibles (ej. 'Señales', 'Reglamentos').
+    Se sirve desde los datos de referencia en memoria (ver reference_data.py).
     """
-    question_types = db.query(models.QuestionType).all()
-    
-    # FastAPI serializará automáticamente la lista de objetos SQLAlchemy
-    # a la lista de esquemas Pydantic (List[schemas.QuestionType])
-    return question_types
+    data = await reference_registry.get(db)
+    return json_response(request, data.question_types.body, content_etag(data.question_types.digest))
 
 
 @router.post("/", response_model=schemas.Question, status_code=status.HTTP_201_CREATED)
@@ -61,38 +175,33 @@ async def create_question(
     question_type_id: int = Form(...),
     choices_json: str = Form(..., alias='choices_json'), # 'choices_json' para coincidir con el JS
     image: Optional[UploadFile] = File(None), # Imagen de la pregunta, opcional
-    db: Session = Depends(get_db)
+    # Imágenes de las opciones: cada opción las referencia poniendo en su campo 'image'
+    # el nombre del archivo subido
+    choice_images: List[UploadFile] = File([]),
+    db: AsyncSession = Depends(get_async_db)
 ):
+    """
+    Crea una pregunta con sus opciones. Las imágenes (de la pregunta y de las opciones)
+    se suben en segundo plano: la pregunta se devuelve en cuanto existe la fila y la URL
+    de cada imagen se rellena cuando termina su subida.
+    """
     try:
         # 1. Validar existencia de la licencia y tipo de pregunta
-        licence = db.query(models.LicenceType).filter(models.LicenceType.id == licence_type_id).first()
+        licence = await db.scalar(select(models.LicenceType.id).where(models.LicenceType.id == licence_type_id))
         if not licence:
             raise HTTPException(status_code=404, detail=f"Licencia con ID {licence_type_id} no encontrada.")
         
-        question_type = db.query(models.QuestionType).filter(models.QuestionType.id == question_type_id).first()
+        question_type = await db.scalar(select(models.QuestionType.id).where(models.QuestionType.id == question_type_id))
         if not question_type:
             raise HTTPException(status_code=404, detail=f"Tipo de pregunta con ID {question_type_id} no encontrado.")
 
-        # 2. Determinar el número secuencial de la pregunta (mejor gestionado por el backend)
-        # Busca el número más alto de pregunta para esta licencia y suma 1
-        last_question = db.query(models.Question)\
-                          .filter(models.Question.licence_type_id == licence_type_id)\
-                          .order_by(models.Question.num.desc())\
-                          .first()
-        new_question_num = (last_question.num + 1) if last_question else 1
-
-        # 3. Subir imagen a Cloudinary si se proporcionó
-        image_url = None
-        if image and image.filename: # Asegurarse de que hay un archivo real
-            try:
-                # Cloudinary.uploader.upload acepta el objeto UploadFile.file directamente
-                upload_result = cloudinary.uploader.upload(image.file, resource_type="image")
-                image_url = upload_result.get("secure_url")
-                if not image_url:
-                    raise HTTPException(status_code=500, detail="No se pudo obtener la URL de la imagen de Cloudinary.")
-            except Exception as e:
-                # Cloudinary podría fallar por credenciales, red, etc.
-                raise HTTPException(status_code=500, detail=f"Error al subir la imagen a Cloudinary: {e}")
+        # 2. Leer las imágenes; se suben después de confirmar la transacción
+        image_data = await image.read() if image and image.filename else None # Asegurarse de que hay un archivo real
+        choice_uploads = {upload.filename: upload for upload in choice_images if upload.filename}
+
+        # 3. Reservar el número secuencial de la pregunta con el contador de la licencia.
+        # Bloquea el contador hasta el commit: dos creaciones simultáneas no repiten número.
+        new_question_num = await allocate_nums(db, licence_type_id)
 
         # 4. Crear la instancia de la pregunta
         db_question = models.Question(
@@ -100,10 +209,10 @@ async def create_question(
             num=new_question_num, # Usamos el número calculado por el backend
             licence_type_id=licence_type_id,
             question_type_id=question_type_id,
-            image=image_url,  # Guarda la URL pública de Cloudinary
+            image=None,  # La URL pública se guarda cuando termine la subida
         )
         db.add(db_question)
-        db.flush() # Guarda la pregunta para obtener su ID antes de añadir las opciones
+        await db.flush() # Guarda la pregunta para obtener su ID antes de añadir las opciones
 
         # 5. Parsear y crear las opciones de respuesta
         choices_list = json.loads(choices_json)
@@ -112,6 +221,7 @@ async def create_question(
 
         correct_choice_found = False
         db_choices = []
+        choice_image_jobs = [] # (opción, archivo subido)
         for choice_data in choices_list:
             # Validar el esquema de cada opción usando Pydantic
             try:
@@ -122,13 +232,18 @@ async def create_question(
             if parsed_choice.is_correct:
                 correct_choice_found = True
 
+            # Si 'image' es el nombre de un archivo subido, la URL se rellena tras la subida;
+            # si no, se guarda tal cual (una URL ya existente)
+            choice_upload = choice_uploads.get(parsed_choice.image)
             db_choice = models.Choice(
                 text=parsed_choice.text,
-                image=parsed_choice.image, # Aquí podrías procesar imágenes para opciones si fuera necesario
+                image=None if choice_upload else parsed_choice.image,
                 is_correct=parsed_choice.is_correct,
                 question_id=db_question.id # Asocia la opción a la pregunta recién creada
             )
             db_choices.append(db_choice)
+            if choice_upload:
+                choice_image_jobs.append((db_choice, choice_upload))
             db.add(db_choice) # Añadir cada opción a la sesión
 
         # 6. Validar que al menos una opción sea correcta
@@ -136,17 +251,29 @@ async def create_question(
             # Si no hay ninguna opción correcta, la transacción se revertirá automáticamente con el rollback en el except
             raise HTTPException(status_code=400, detail="Debe haber al menos una opción de respuesta marcada como correcta.")
 
-        db.commit() # Confirmar la pregunta y todas sus opciones
-        db.refresh(db_question) # Recargar la pregunta para incluir sus opciones y relaciones
+        await db.commit() # Confirmar la pregunta y todas sus opciones
+        question_bank_cache.invalidate(licence_type_id) # El banco de esta licencia cambió
+        snapshot_store.discard(licence_type_id)
+
+        # 7. Encolar las subidas de imágenes (no bloquean la respuesta)
+        if image_data:
+            upload_pipeline.submit(ImageJob(models.Question, db_question.id, licence_type_id, image_data, image.filename))
+        for db_choice, choice_upload in choice_image_jobs:
+            upload_pipeline.submit(ImageJob(
+                models.Choice, db_choice.id, licence_type_id, await choice_upload.read(), choice_upload.filename
+            ))
 
         # Cargar explícitamente las relaciones para el response_model
-        # Esto es necesario porque db.refresh() solo carga lo que ya estaba en la sesión
-        # y no las relaciones anidadas por defecto.
-        db_question_loaded = db.query(models.Question)\
-                               .options(joinedload(models.Question.choices),
-                                        joinedload(models.Question.question_type))\
-                               .filter(models.Question.id == db_question.id)\
-                               .first()
+        # (con la sesión asíncrona no hay carga perezosa de relaciones).
+        # populate_existing refresca la instancia que ya está en la sesión.
+        result = await db.execute(
+            select(models.Question)
+            .options(joinedload(models.Question.choices),
+                     joinedload(models.Question.question_type))
+            .where(models.Question.id == db_question.id)
+            .execution_options(populate_existing=True)
+        )
+        db_question_loaded = result.unique().scalar_one()
         
         return db_question_loaded
     
@@ -154,10 +281,28 @@ async def create_question(
         raise HTTPException(status_code=400, detail="Formato JSON de opciones inválido.")
     except HTTPException as http_exc:
         # Re-lanza las excepciones HTTPException para que FastAPI las maneje
-        db.rollback() # Asegúrate de hacer rollback en caso de error HTTP
+        await db.rollback() # Asegúrate de hacer rollback en caso de error HTTP
         raise http_exc
     except Exception as e:
         # Cualquier otro error inesperado
-        db.rollback() # Deshacer cualquier cambio en la base de datos
+        await db.rollback() # Deshacer cualquier cambio en la base de datos
         print(f"ERROR al crear pregunta: {e}")
         raise HTTPException(status_code=500, detail=f"Error interno del servidor al crear la pregunta: {e}")
+
+
+@router.post("/import", response_model=schemas.ImportReport)
+async def import_questions_file(
+    file: UploadFile = File(...), # Archivo .jsonl o .csv con una pregunta por línea/fila
+    dry_run: bool = False,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Importa masivamente preguntas y opciones desde un archivo JSONL o CSV en una sola
+    transacción. Las filas inválidas se omiten y se devuelven en `errors` con su línea.
+    Con `dry_run=true` solo se valida (se hace rollback al final).
+    """
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    try:
+        return await import_questions(db, stream, detect_format(file.filename), dry_run=dry_run)
+    finally:
+        stream.detach() # UploadFile se encarga de cerrar el archivo subyacente
@@ -0,0 +1,31 @@
+# routers/snapshots.py
+from fastapi import APIRouter, HTTPException, Request
+
+from snapshots import IMMUTABLE_CACHE_CONTROL, snapshot_response, snapshot_store
+
+router = APIRouter(
+    prefix="/snapshots",
+    tags=["Snapshots"],
+    responses={404: {"description": "Snapshot not found"}},
+)
+
+
+@router.get("/")
+async def get_snapshot_manifest():
+    """
+    Devuelve el snapshot vigente de cada licencia (hash y nombre de archivo).
+    El cliente puede descargar luego /snapshots/{file}, que se cachea indefinidamente.
+    """
+    return await snapshot_store.manifest()
+
+
+@router.get("/{filename}")
+async def get_snapshot_file(filename: str, request: Request):
+    """
+    Sirve un snapshot por su nombre con hash. El contenido de un nombre nunca cambia,
+    así que se marca como inmutable.
+    """
+    snapshot = await snapshot_store.get_by_filename(filename)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail=f"Snapshot {filename} no encontrado.")
+    return snapshot_response(request, snapshot, IMMUTABLE_CACHE_CONTROL)
@@ -1,10 +1,11 @@
 # routers/versions.py
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
-from database import get_db # Importa tu dependencia de base de datos
-import models
+from database import get_read_db # Importa tu dependencia de base de datos
+from http_cache import content_etag, json_response
+from reference_data import reference_registry
 import schemas
 
 router = APIRouter(
@@ -14,9 +15,10 @@ router = APIRouter(
 )
 
 @router.get("/", response_model=List[schemas.Version])
-async def get_all_versions(db: Session = Depends(get_db)):
-    versions = db.query(models.Version).all()
-    return versions
+async def get_all_versions(request: Request, db: AsyncSession = Depends(get_read_db)):
+    # Se sirve desde los datos de referencia en memoria (ver reference_data.py)
+    data = await reference_registry.get(db)
+    return json_response(request, data.versions.body, content_etag(data.versions.digest))
 
 # Puedes añadir más endpoints aquí, por ejemplo:
 # @router.get("/{version_id}", response_model=schemas.Version)
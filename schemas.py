@@ -1,6 +1,17 @@
 # schemas.py
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, Field, model_validator
+from typing import Dict, List, Optional
+
+from images import image_variants
+
+
+class ImageVariantsMixin(BaseModel):
+    # Rellena `image_variants` (ancho -> URL de la versión reducida, ver images.py) a partir de `image`
+    @model_validator(mode="after")
+    def fill_image_variants(self):
+        if self.image_variants is None:
+            self.image_variants = image_variants(self.image)
+        return self
 
 # Schemas para el modelo Version
 class VersionBase(BaseModel):
@@ -41,12 +52,13 @@ class LicenceTypeBase(BaseModel):
 class LicenceTypeCreate(LicenceTypeBase):
     pass
 
-class LicenceType(LicenceTypeBase):
+class LicenceType(LicenceTypeBase, ImageVariantsMixin):
     id: int
     
     # Para incluir las relaciones anidadas en la respuesta
     version: Version # Opcional: Si quieres incluir la versión completa
     type: Type # Opcional: Si quieres incluir el tipo completo
+    image_variants: Optional[Dict[str, str]] = None
 
     class Config:
         from_attributes = True
@@ -65,30 +77,32 @@ class ChoiceBase(BaseModel):
     image: Optional[str] = None
     is_correct: bool = False
 
-class Choice(ChoiceBase):
+class Choice(ChoiceBase, ImageVariantsMixin):
     id: int
     question_id: int
+    image_variants: Optional[Dict[str, str]] = None
     class Config:
         from_attributes = True
 
 class QuestionBase(BaseModel):
     text: str
     image: Optional[str] = None
-    num: int
+    num: Optional[int] = None # Las preguntas importadas sin número van al final del banco
     licence_type_id: int
     question_type_id: int
 
-class Question(QuestionBase):
+class Question(QuestionBase, ImageVariantsMixin):
     id: int
     choices: List[Choice] = [] # Para incluir las opciones en la pregunta
     question_type: QuestionType # Para incluir el tipo de pregunta
+    image_variants: Optional[Dict[str, str]] = None
     class Config:
         from_attributes = True
 
 class QuestionCreate(BaseModel):
     # Campos que vienen directamente del formulario
     text: str
-    num: int
+    num: Optional[int] = None
     licence_type_id: int
     question_type_id: int
     
@@ -97,4 +111,100 @@ class QuestionCreate(BaseModel):
     choices_json: str = Field(..., alias='choices_json') 
 
 class ChoiceCreate(ChoiceBase):
-    pass 
\ No newline at end of file
+    pass 
+
+# Schemas para los exámenes generados en el servidor
+class Exam(BaseModel):
+    licence_id: int
+    seed: int # Semilla usada; la misma semilla siempre genera el mismo examen
+    questions: List[Question] = []
+
+class AdaptiveExamRequest(BaseModel):
+    licence_id: int
+    n: int = Field(20, ge=1, le=200)
+    seed: Optional[int] = None
+    type_mistake_rates: Dict[int, float] = {} # question_type_id -> tasa de error (0..1) del alumno
+    missed_question_ids: List[int] = [] # Preguntas que el alumno falló anteriormente
+    include_answers: bool = True
+
+# Schemas para la búsqueda de texto completo
+class SearchHit(BaseModel):
+    id: int
+    num: Optional[int] = None
+    text: Optional[str] = None
+    licence_type_id: int
+    question_type_id: Optional[int] = None
+    score: float # Relevancia: solo sirve para comparar resultados de la misma búsqueda
+
+class SearchResults(BaseModel):
+    query: str
+    total: int
+    limit: int
+    offset: int
+    results: List[SearchHit] = []
+
+# Schemas para la importación masiva de preguntas
+class QuestionImport(BaseModel):
+    text: str
+    image: Optional[str] = None
+    licence_type_id: int
+    question_type_id: int
+    choices: List[ChoiceCreate]
+
+class ImportRowError(BaseModel):
+    line: int # Línea del archivo (en CSV, contando la cabecera)
+    error: str
+
+class ImportReport(BaseModel):
+    processed: int = 0
+    inserted: int = 0
+    choices_inserted: int = 0
+    dry_run: bool = False
+    errors: List[ImportRowError] = []
+
+# Tiempo máximo aceptado por respuesta (1 hora): acota lo que se suma en question_stats
+MAX_ANSWER_TIME_MS = 3_600_000
+
+class ExamAnswer(BaseModel):
+    question_id: int
+    choice_id: Optional[int] = None # None = pregunta sin responder
+    time_ms: Optional[int] = Field(None, ge=0, le=MAX_ANSWER_TIME_MS) # Tiempo que tardó en responder (opcional)
+
+class ExamSubmission(BaseModel):
+    licence_id: int
+    answers: List[ExamAnswer]
+
+class AnswerResult(BaseModel):
+    question_id: int
+    choice_id: Optional[int] = None
+    is_correct: bool
+    correct_choice_ids: List[int] = []
+
+class ExamResult(BaseModel):
+    licence_id: int
+    total: int
+    correct: int
+    score: float # Porcentaje de aciertos (0-100)
+    recorded: bool = False # Si el intento se encoló para guardarse
+    results: List[AnswerResult] = []
+
+# Schemas para las estadísticas de dificultad
+class DifficultyStats(BaseModel):
+    answers: int = 0
+    mistakes: int = 0
+    mistake_rate: Optional[float] = None # None si todavía no hay respuestas
+    mean_time_ms: Optional[float] = None
+
+class QuestionDifficulty(DifficultyStats):
+    question_id: int
+    num: Optional[int] = None
+    question_type_id: Optional[int] = None
+
+class QuestionTypeDifficulty(DifficultyStats):
+    question_type_id: Optional[int] = None
+    name: Optional[str] = None
+
+class LicenceDifficulty(BaseModel):
+    licence_id: int
+    questions: List[QuestionDifficulty] = []
+    question_types: List[QuestionTypeDifficulty] = []
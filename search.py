@@ -0,0 +1,345 @@
+# search.py
+"""
+Búsqueda de texto completo en el banco de preguntas (enunciados y opciones).
+
+- Postgres: cada pregunta es un solo documento, `to_tsvector('spanish', f_unaccent(...))`
+  del enunciado (peso A) concatenado con el de sus opciones (peso B), así que las palabras
+  obligatorias y las excluidas valen para la pregunta entera. La consulta admite la sintaxis
+  de websearch_to_tsquery ("frase exacta", -excluir, or) y se ordena con ts_rank. Antes, los
+  índices GIN de enunciados y opciones preseleccionan las preguntas que contienen cada
+  término, y el documento solo se construye para esas candidatas.
+- Otros motores (SQLite en desarrollo y pruebas): índice invertido en memoria por licencia,
+  con ranking BM25. Se reconstruye solo cuando cambia el banco de la licencia (misma
+  revisión que la caché), como el índice de exámenes.
+
+En ambos casos la búsqueda ignora mayúsculas y tildes y todas las palabras deben aparecer
+(en el enunciado o en alguna opción); las coincidencias en el enunciado pesan el doble.
+"""
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import String, cast, func, intersect, literal, literal_column, select, union
+from sqlalchemy.dialects.postgresql import TSQUERY
+from sqlalchemy.ext.asyncio import AsyncSession
+import heapq
+import math
+import re
+import threading
+import unicodedata
+
+from cache import question_bank_cache
+from database import fill_session
+import models
+import schemas
+
+# Peso de una coincidencia en una opción respecto a una en el enunciado
+CHOICE_WEIGHT = 0.5
+
+# Palabras vacías más frecuentes en español (ya sin tildes)
+STOPWORDS = frozenset("""
+a al algo ante antes como con contra cual cuando de del desde donde durante e el ella ellas ellos
+en entre era es esa ese eso esta este esto fue ha han hasta hay la las le les lo los mas me mi muy
+ni no o os para pero por que quien se sea ser si sin sobre son su sus tambien te tiene u un una uno
+unos unas y ya
+""".split())
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def strip_accents(text: str) -> str:
+    return "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+
+
+def stem(token: str) -> str:
+    """Reducción mínima del plural español (señales -> senal, vehículos -> vehiculo)."""
+    if len(token) > 4 and token.endswith("es") and token[-3] not in "aeiou":
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s") and token[-2] in "aeiou":
+        return token[:-1]
+    return token
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    tokens = _TOKEN_RE.findall(strip_accents((text or "").lower()))
+    return [stem(token) for token in tokens if token not in STOPWORDS]
+
+
+def parse_query(query: str) -> Tuple[List[str], List[str]]:
+    """Términos obligatorios y excluidos (-palabra) de la consulta, normalizados."""
+    required, excluded = [], []
+    for word in query.split():
+        if word.startswith("-") and len(word) > 1:
+            excluded.extend(tokenize(word[1:]))
+        else:
+            required.extend(tokenize(word))
+    return required, excluded
+
+
+# --- Índice invertido en memoria (motores sin búsqueda de texto completo) ---
+
+@dataclass(frozen=True)
+class LicenceSearchIndex:
+    licence_id: int
+    revision: int
+    postings: Dict[str, Dict[int, float]]  # término -> question_id -> frecuencia ponderada
+    lengths: Dict[int, float]  # question_id -> longitud ponderada del documento
+    questions: Dict[int, Tuple[int, str, Optional[int]]]  # question_id -> (num, text, question_type_id)
+    avg_length: float
+
+    def search(self, required: List[str], excluded: List[str]) -> Dict[int, float]:
+        """Puntuación BM25 de las preguntas que contienen todos los términos requeridos."""
+        if not required:
+            return {}
+        candidates = None
+        for term in required:
+            docs = self.postings.get(term)
+            if not docs:
+                return {}
+            candidates = set(docs) if candidates is None else candidates & docs.keys()
+        for term in excluded:
+            candidates -= self.postings.get(term, {}).keys()
+
+        k1, b = 1.2, 0.75
+        total = len(self.lengths)
+        terms = [
+            (self.postings[term], math.log(1 + (total - len(self.postings[term]) + 0.5) / (len(self.postings[term]) + 0.5)))
+            for term in set(required)
+        ]
+        scale = b / (self.avg_length or 1)
+        scores = {}
+        for question_id in candidates:
+            length_norm = k1 * (1 - b + scale * self.lengths[question_id])
+            score = 0.0
+            for docs, idf in terms:
+                tf = docs[question_id]
+                score += idf * tf * (k1 + 1) / (tf + length_norm)
+            scores[question_id] = score
+        return scores
+
+
+_indexes: Dict[int, LicenceSearchIndex] = {}
+_lock = threading.Lock()
+
+
+async def get_search_index(db: AsyncSession, licence_id: int) -> LicenceSearchIndex:
+    revision = question_bank_cache.revision(licence_id)
+    index = _indexes.get(licence_id)
+    if index is not None and index.revision == revision:
+        return index
+
+    async with fill_session(db, question_bank_cache.changed_at(licence_id)) as fill_db:
+        questions = (await fill_db.execute(
+            select(models.Question.id, models.Question.num, models.Question.text, models.Question.question_type_id)
+            .where(models.Question.licence_type_id == licence_id)
+        )).all()
+        choices = (await fill_db.execute(
+            select(models.Choice.question_id, models.Choice.text)
+            .join(models.Question, models.Question.id == models.Choice.question_id)
+            .where(models.Question.licence_type_id == licence_id)
+        )).all()
+
+    weights: Dict[int, Counter] = {question_id: Counter() for question_id, _, _, _ in questions}
+    for question_id, _, text, _ in questions:
+        for token in tokenize(text):
+            weights[question_id][token] += 1.0
+    for question_id, text in choices:
+        for token in tokenize(text):
+            weights[question_id][token] += CHOICE_WEIGHT
+
+    postings: Dict[str, Dict[int, float]] = {}
+    lengths = {}
+    for question_id, counter in weights.items():
+        lengths[question_id] = sum(counter.values())
+        for term, weight in counter.items():
+            postings.setdefault(term, {})[question_id] = weight
+
+    index = LicenceSearchIndex(
+        licence_id=licence_id,
+        revision=revision,
+        postings=postings,
+        lengths=lengths,
+        questions={question_id: (num, text, question_type_id) for question_id, num, text, question_type_id in questions},
+        avg_length=(sum(lengths.values()) / len(lengths)) if lengths else 0.0,
+    )
+    with _lock:
+        _indexes[licence_id] = index
+    return index
+
+
+async def _search_in_memory(
+    db: AsyncSession, query: str, licence_ids: List[int], limit: int, offset: int
+) -> schemas.SearchResults:
+    required, excluded = parse_query(query)
+    hits = []  # (puntuación, question_id, licence_id, índice)
+    for licence_id in licence_ids:
+        index = await get_search_index(db, licence_id)
+        for question_id, score in index.search(required, excluded).items():
+            hits.append((score, question_id, licence_id, index))
+    # Solo se ordenan los resultados hasta el final de la página pedida
+    top = heapq.nsmallest(offset + limit, hits, key=lambda hit: (-hit[0], hit[1]))
+
+    results = []
+    for score, question_id, licence_id, index in top[offset:]:
+        num, text, question_type_id = index.questions[question_id]
+        results.append(schemas.SearchHit(
+            id=question_id, num=num, text=text, licence_type_id=licence_id,
+            question_type_id=question_type_id, score=round(score, 4),
+        ))
+    return schemas.SearchResults(query=query, total=len(hits), limit=limit, offset=offset, results=results)
+
+
+# --- Postgres: índices GIN de texto completo ---
+
+# La configuración se escribe literal (no como parámetro) para que la expresión coincida
+# exactamente con la de los índices y el planificador pueda usarlos
+_SPANISH = literal_column("'spanish'::regconfig")
+_EMPTY = literal_column("''")
+
+
+def question_tsvector():
+    return func.to_tsvector(_SPANISH, func.f_unaccent(func.coalesce(models.Question.text, _EMPTY)))
+
+
+def choice_tsvector():
+    return func.to_tsvector(_SPANISH, func.f_unaccent(func.coalesce(models.Choice.text, _EMPTY)))
+
+
+# Pesos de ts_rank para {D, C, B, A}: el enunciado (A) pesa el doble que las opciones (B)
+_RANK_WEIGHTS = literal_column(f"'{{0.1, 0.2, {CHOICE_WEIGHT}, 1.0}}'::float4[]")
+
+# Operandos de la salida de querytree(): 'lexema' con las comillas simples dobladas
+_QUERY_OPERAND = re.compile(r"'(?:[^']|'')*'")
+
+
+def question_document():
+    """tsvector de la pregunta entera: enunciado (peso A) || todas sus opciones (peso B)."""
+    choices_text = (
+        select(func.string_agg(models.Choice.text, literal_column("' '")))
+        .where(models.Choice.question_id == models.Question.id)
+        .scalar_subquery()
+    )
+    choices = func.to_tsvector(_SPANISH, func.f_unaccent(func.coalesce(choices_text, _EMPTY)))
+    return func.setweight(question_tsvector(), literal_column("'A'")).op("||")(
+        func.setweight(choices, literal_column("'B'"))
+    )
+
+
+def query_tree(query: str):
+    """querytree() de la consulta: la tsquery sin las partes que no pueden usar un índice."""
+    return select(func.querytree(func.websearch_to_tsquery(_SPANISH, func.f_unaccent(query))))
+
+
+def query_terms(tree: Optional[str]) -> Tuple[Optional[List[str]], bool]:
+    """
+    Lexemas obligatorios de la consulta (salida de query_tree()), para preseleccionar
+    candidatas con los índices GIN.
+
+    Devuelve (términos, basta_uno). Los términos son operandos de tsquery ya normalizados;
+    None si la consulta no tiene ninguno indexable (solo exclusiones), y basta_uno es True
+    cuando la consulta lleva `or` y cualquier término puede bastar.
+    """
+    terms = _QUERY_OPERAND.findall(tree or "")
+    return (list(dict.fromkeys(terms)) or None), "|" in (tree or "")
+
+
+def candidate_ids(terms: List[str], match_any: bool = False):
+    """
+    Ids de las preguntas que contienen cada término en el enunciado o en alguna opción.
+
+    Cada término se busca con las mismas expresiones que los índices GIN
+    (`question_tsvector()` y `choice_tsvector()`), así que son exploraciones de índice;
+    el resultado es un superconjunto de las coincidencias que luego filtra el documento.
+    """
+    per_term = [
+        union(
+            select(models.Question.id).where(question_tsvector().op("@@")(cast(literal(term, String), TSQUERY))),
+            select(models.Choice.question_id).where(choice_tsvector().op("@@")(cast(literal(term, String), TSQUERY))),
+        )
+        for term in terms
+    ]
+    combined = per_term[0] if len(per_term) == 1 else (union if match_any else intersect)(*per_term)
+    return select(combined.subquery().c.id)
+
+
+def search_statement(
+    query: str, licence_id: Optional[int], version_id: Optional[int],
+    terms: Optional[List[str]], match_any: bool = False,
+):
+    """Consulta de búsqueda y su columna `rank`; `terms` y `match_any` vienen de query_terms()."""
+    tsquery = func.websearch_to_tsquery(_SPANISH, func.f_unaccent(query))
+    # Un documento por pregunta, solo de las preguntas candidatas del ámbito pedido; `@@` se
+    # aplica a ese documento para que "a -b" mire el enunciado y todas las opciones a la vez
+    documents = select(
+        models.Question.id, models.Question.num, models.Question.text,
+        models.Question.licence_type_id, models.Question.question_type_id,
+        question_document().label("document"),
+    )
+    if terms:
+        documents = documents.where(models.Question.id.in_(candidate_ids(terms, match_any)))
+    if licence_id is not None:
+        documents = documents.where(models.Question.licence_type_id == licence_id)
+    if version_id is not None:
+        documents = documents.join(
+            models.LicenceType, models.LicenceType.id == models.Question.licence_type_id
+        ).where(models.LicenceType.version_id == version_id)
+    documents = documents.subquery()
+
+    rank = func.ts_rank(_RANK_WEIGHTS, documents.c.document, tsquery).label("rank")
+    stmt = (
+        select(
+            documents.c.id, documents.c.num, documents.c.text,
+            documents.c.licence_type_id, documents.c.question_type_id,
+            rank, func.count().over().label("total"),
+        )
+        .where(documents.c.document.op("@@")(tsquery))
+    )
+    return stmt, rank
+
+
+async def _search_postgres(
+    db: AsyncSession, query: str, licence_id: Optional[int], version_id: Optional[int], limit: int, offset: int
+) -> schemas.SearchResults:
+    terms, match_any = query_terms(await db.scalar(query_tree(query)))
+    stmt, rank = search_statement(query, licence_id, version_id, terms, match_any)
+    rows = (await db.execute(
+        stmt.order_by(rank.desc(), stmt.selected_columns.id).limit(limit).offset(offset)
+    )).all()
+
+    total = rows[0].total if rows else 0
+    if not rows and offset:
+        # Página fuera de rango: el total se obtiene sin paginar
+        total = await db.scalar(select(func.count()).select_from(stmt.subquery()))
+    return schemas.SearchResults(
+        query=query,
+        total=total,
+        limit=limit,
+        offset=offset,
+        results=[
+            schemas.SearchHit(
+                id=row.id, num=row.num, text=row.text, licence_type_id=row.licence_type_id,
+                question_type_id=row.question_type_id, score=round(float(row.rank), 4),
+            )
+            for row in rows
+        ],
+    )
+
+
+async def search_questions(
+    db: AsyncSession,
+    query: str,
+    licence_id: Optional[int] = None,
+    version_id: Optional[int] = None,
+    limit: int = 20,
+    offset: int = 0,
+) -> schemas.SearchResults:
+    """Busca preguntas por su enunciado y sus opciones, opcionalmente en una licencia o versión."""
+    if db.get_bind().dialect.name == "postgresql":
+        return await _search_postgres(db, query, licence_id, version_id, limit, offset)
+
+    licences = select(models.LicenceType.id).order_by(models.LicenceType.id)
+    if licence_id is not None:
+        licences = licences.where(models.LicenceType.id == licence_id)
+    if version_id is not None:
+        licences = licences.where(models.LicenceType.version_id == version_id)
+    licence_ids = (await db.execute(licences)).scalars().all()
+    return await _search_in_memory(db, query, licence_ids, limit, offset)
@@ -0,0 +1,214 @@
+# shared_cache.py
+"""
+Caché del banco de preguntas compartida entre workers de uvicorn (QUESTION_CACHE_BACKEND=shared).
+
+Con la caché en memoria (cache.LRUCache) cada worker genera y guarda su propia copia de
+cada banco, y una invalidación en un worker no llega a los demás. Esta caché guarda todo
+en archivos de un directorio del host (por defecto en /dev/shm, que es memoria compartida):
+
+- `generations`: un array de contadores de 64 bits mapeado en memoria (mmap), uno por
+  licencia. Es la revisión de la clave: `invalidate` lo incrementa bajo un flock y todos los
+  workers ven el cambio en la siguiente lectura. Los índices en memoria de cada worker
+  (exámenes, búsqueda, snapshots) usan esta misma revisión, así que también se invalidan.
+  `changed_at` guarda, en otro array igual, cuándo se invalidó cada licencia.
+- Un archivo por clave y variante con una cabecera (revisión) seguida del JSON. Se escribe
+  en un temporal y se renombra, así que nunca se lee a medias. Los workers lo leen con mmap
+  y devuelven un memoryview de las páginas compartidas, sin copiarlo: la memoria no crece
+  con el número de workers y un worker nuevo encuentra la caché ya llena.
+
+Una entrada cuya cabecera no coincide con el contador actual se ignora (cuenta como miss).
+Las licencias comparten contador si su id coincide módulo QUESTION_CACHE_SLOTS; eso solo
+provoca invalidaciones de más. No hay desalojo LRU: el número de entradas está acotado por
+licencias x variantes y `invalidate` borra los archivos de la clave.
+
+El nombre de cada archivo incluye `version` (ver cache.QUESTION_CACHE_VERSION): un
+despliegue con otro código no lee los JSON con la forma anterior, ni siquiera durante un
+reinicio escalonado en el que conviven las dos versiones. Los archivos de versiones
+anteriores se borran con la siguiente invalidación de su licencia.
+
+Los contadores sobreviven a los reinicios, así que el ETag no puede llevar un id del
+proceso: usa `etag_scope`, un id aleatorio guardado en el directorio (cambia si se borra
+y los contadores vuelven a 0) más la versión del código.
+
+Solo funciona en sistemas POSIX (fcntl). El directorio sobrevive a los reinicios de los
+workers pero no debe compartirse entre despliegues con bases de datos distintas.
+"""
+from typing import Dict, Optional, Tuple
+import fcntl
+import glob
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+import uuid
+
+_COUNTER = struct.Struct("<Q")
+_HEADER = struct.Struct("<Q")  # Revisión con la que se generó el valor
+_TIMESTAMP = struct.Struct("<d")  # Momento de la última invalidación (time.time())
+
+
+class SharedMemoryCache:
+    """Misma interfaz que cache.LRUCache, con los datos en archivos mapeados compartidos."""
+
+    def __init__(self, directory: str, slots: int = 4096, version: str = ""):
+        self.directory = directory
+        self.slots = slots
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Archivos ya mapeados por este worker: (clave, variante) -> (revisión, mmap, memoryview)
+        self._maps: Dict[Tuple, Tuple[int, mmap.mmap, memoryview]] = {}
+
+        os.makedirs(directory, exist_ok=True)
+        self._lock_path = os.path.join(directory, "generations.lock")
+        with self._file_lock():
+            self._generations = self._map_array("generations", _COUNTER.size)
+            self._changed_at = self._map_array("changed_at", _TIMESTAMP.size)
+            self.etag_scope = self._instance_id() + version[:8]
+
+    def _map_array(self, name: str, item_size: int) -> mmap.mmap:
+        """Mapea (creándolo a ceros si hace falta) un archivo con un valor por slot."""
+        size = self.slots * item_size
+        fd = os.open(os.path.join(self.directory, name), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            return mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+
+    def _instance_id(self) -> str:
+        """Id del directorio, creado junto con los contadores (llamar con el flock tomado)."""
+        path = os.path.join(self.directory, "instance")
+        try:
+            with open(path) as f:
+                instance_id = f.read().strip()
+            if instance_id:
+                return instance_id
+        except FileNotFoundError:
+            pass
+        instance_id = uuid.uuid4().hex[:8]
+        with open(path, "w") as f:
+            f.write(instance_id)
+        return instance_id
+
+    def _file_lock(self):
+        return _FileLock(self._lock_path)
+
+    def _offset(self, key) -> int:
+        return (int(key) % self.slots) * _COUNTER.size
+
+    def _path(self, key, variant) -> str:
+        variant_id = hashlib.sha1(f"{self.version}|{variant!r}".encode()).hexdigest()[:16]
+        return os.path.join(self.directory, f"{int(key)}-{variant_id}.bin")
+
+    def revision(self, key) -> int:
+        """Devuelve la revisión actual de una clave, compartida por todos los workers."""
+        return _COUNTER.unpack_from(self._generations, self._offset(key))[0]
+
+    def changed_at(self, key) -> float:
+        """Momento de la última invalidación de la clave en cualquier worker, o 0 si nunca."""
+        return _TIMESTAMP.unpack_from(self._changed_at, (int(key) % self.slots) * _TIMESTAMP.size)[0]
+
+    def _load(self, key, variant, revision: int) -> Optional[memoryview]:
+        try:
+            with open(self._path(key, variant), "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):  # ValueError: archivo vacío
+            return None
+        if len(mapped) < _HEADER.size or _HEADER.unpack_from(mapped)[0] != revision:
+            mapped.close()
+            return None
+        view = memoryview(mapped)[_HEADER.size:]
+        self._maps[(key, variant)] = (revision, mapped, view)
+        return view
+
+    def get(self, key, variant=None):
+        revision = self.revision(key)
+        with self._lock:
+            entry = self._maps.get((key, variant))
+            if entry is not None and entry[0] == revision:
+                value = entry[2]
+            else:
+                # Si había un mapa viejo se suelta; las respuestas en curso conservan su memoryview
+                self._maps.pop((key, variant), None)
+                value = self._load(key, variant, revision)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def set(self, key, value, revision: int, variant=None):
+        """
+        Guarda un valor generado con la revisión `revision`. Si mientras tanto la clave fue
+        invalidada no se guarda (y si la invalidación llega durante la escritura, la cabecera
+        con la revisión vieja hace que nadie lo use).
+        """
+        if revision != self.revision(key):
+            return
+        path = self._path(key, variant)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER.pack(revision))
+            f.write(value)
+        os.replace(tmp_path, path)
+
+    def invalidate(self, key):
+        """Incrementa la revisión de la clave en todos los workers y borra sus valores guardados."""
+        offset = self._offset(key)
+        with self._file_lock():
+            current = _COUNTER.unpack_from(self._generations, offset)[0]
+            _COUNTER.pack_into(self._generations, offset, current + 1)
+            _TIMESTAMP.pack_into(self._changed_at, (int(key) % self.slots) * _TIMESTAMP.size, time.time())
+        with self._lock:
+            for entry_key in [entry_key for entry_key in self._maps if entry_key[0] == key]:
+                del self._maps[entry_key]
+        for path in glob.glob(os.path.join(self.directory, f"{int(key)}-*.bin")):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> dict:
+        entries, size = 0, 0
+        for path in glob.glob(os.path.join(self.directory, "*.bin")):
+            try:
+                size += os.path.getsize(path)
+                entries += 1
+            except FileNotFoundError:  # Borrado por otro worker
+                pass
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "backend": "shared",
+                "directory": self.directory,
+                "version": self.version,
+                "size": entries,
+                "bytes": size,
+                "mapped": len(self._maps),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+            }
+
+
+class _FileLock:
+    """Bloqueo exclusivo entre procesos (flock) sobre un archivo auxiliar."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+
+    def __enter__(self):
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
@@ -0,0 +1,272 @@
+# snapshots.py
+"""
+Snapshots estáticos del banco de preguntas.
+
+Cada licencia se renderiza a un archivo JSON inmutable cuyo nombre incluye el hash de su
+contenido, junto con sus versiones precomprimidas (gzip y, si está instalado, brotli).
+Los endpoints públicos sirven esos bytes directamente desde memoria, sin consultas a la
+base de datos ni serialización con Pydantic.
+
+Uso (CLI):
+    python -m snapshots build [--dir snapshots]
+"""
+from dataclasses import dataclass
+from typing import Dict, Optional
+from dotenv import load_dotenv
+from fastapi import Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin él solo se generan las variantes gzip
+    brotli = None
+
+from cache import question_bank_cache
+from question_bank import render_question_bank
+from question_numbering import bank_generations
+import models
+
+load_dotenv()
+
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "snapshots")
+# Cada cuánto (segundos) se comprueba si otro proceso regeneró el manifiesto
+SNAPSHOT_RELOAD_SECONDS = float(os.getenv("SNAPSHOT_RELOAD_SECONDS", "5"))
+# Cache-Control de /questions/by_licence/{id}: la URL no cambia, así que la vida útil es corta
+SNAPSHOT_MAX_AGE = int(os.getenv("SNAPSHOT_MAX_AGE", "300"))
+# Los archivos con hash en el nombre nunca cambian: se pueden cachear un año
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+MANIFEST_NAME = "manifest.json"
+
+# Extensión de archivo de cada codificación
+ENCODING_SUFFIXES = {"identity": "", "gzip": ".gz", "br": ".br"}
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    licence_id: int
+    digest: str
+    filename: str
+    generation: Optional[int]  # Generación del banco en la BD cuando se generó (ver question_numbering)
+    revision: int  # Revisión local de la licencia cuando se cargó el snapshot
+    variants: Dict[str, bytes]  # codificación -> bytes ("identity", "gzip", "br")
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.digest}"'
+
+
+def _write_atomic(path: str, data: bytes):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def compress_variants(body: bytes) -> Dict[str, bytes]:
+    """Devuelve el cuerpo sin comprimir y sus versiones comprimidas disponibles."""
+    variants = {"identity": body, "gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(body, quality=11)
+    return variants
+
+
+async def build_snapshots(db: AsyncSession, directory: str = SNAPSHOT_DIR) -> dict:
+    """
+    Renderiza el banco de preguntas de cada licencia en `directory` y escribe el manifiesto.
+    Los archivos de snapshots anteriores que ya no aparecen en el manifiesto se eliminan.
+    Cada entrada guarda la generación del banco leída antes de renderizarlo: si alguien
+    escribe mientras tanto, el snapshot nace obsoleto en lugar de pasar por vigente.
+    """
+    os.makedirs(directory, exist_ok=True)
+    licence_ids = (await db.execute(select(models.LicenceType.id).order_by(models.LicenceType.id))).scalars().all()
+    generations = await bank_generations(db)
+
+    manifest = {"generated_at": int(time.time()), "licences": {}}
+    keep = {MANIFEST_NAME}
+    for licence_id in licence_ids:
+        revision = question_bank_cache.revision(licence_id)
+        body = await render_question_bank(db, licence_id)
+        if revision != question_bank_cache.revision(licence_id):
+            continue  # Se escribió en la licencia mientras se renderizaba; se sirve desde la BD
+        digest = hashlib.sha256(body).hexdigest()[:20]
+        filename = f"questions-{licence_id}-{digest}.json"
+
+        variants = compress_variants(body)
+        for encoding, data in variants.items():
+            path = os.path.join(directory, filename + ENCODING_SUFFIXES[encoding])
+            if not os.path.exists(path):  # Mismo hash = mismo contenido
+                _write_atomic(path, data)
+            keep.add(filename + ENCODING_SUFFIXES[encoding])
+
+        manifest["licences"][str(licence_id)] = {
+            "digest": digest,
+            "file": filename,
+            "generation": generations.get(licence_id, 0),
+            "encodings": sorted(variants),
+            "bytes": {encoding: len(data) for encoding, data in variants.items()},
+        }
+
+    _write_atomic(os.path.join(directory, MANIFEST_NAME), json.dumps(manifest, indent=2).encode())
+    for name in os.listdir(directory):
+        if name.startswith("questions-") and name not in keep:
+            os.remove(os.path.join(directory, name))
+
+    await snapshot_store.reload(force=True)
+    return manifest
+
+
+class SnapshotStore:
+    """
+    Snapshots cargados en memoria a partir del manifiesto en disco.
+
+    Un snapshot es vigente si la generación del banco en la base de datos sigue siendo la
+    del manifiesto (se consulta como mucho cada SNAPSHOT_RELOAD_SECONDS, así que vale para
+    todos los workers y tras un reinicio) y su licencia no se ha invalidado en este proceso
+    desde que se cargó. Las escrituras además lo descartan con `discard`.
+    """
+
+    def __init__(self, directory: str = SNAPSHOT_DIR):
+        self.directory = directory
+        self._snapshots: Dict[int, Snapshot] = {}
+        self._files: Dict[str, Snapshot] = {}
+        self._generations: Dict[int, int] = {}
+        self._manifest_mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    async def reload(self, force: bool = False):
+        """
+        Vuelve a leer las generaciones de la base de datos y, si cambió en disco, el
+        manifiesto (como mucho cada SNAPSHOT_RELOAD_SECONDS).
+        """
+        from database import AsyncSessionLocal
+
+        now = time.monotonic()
+        if not force and now - self._checked_at < SNAPSHOT_RELOAD_SECONDS:
+            return
+        self._checked_at = now
+
+        manifest_path = os.path.join(self.directory, MANIFEST_NAME)
+        try:
+            mtime = os.stat(manifest_path).st_mtime
+        except FileNotFoundError:
+            self._snapshots, self._files, self._manifest_mtime = {}, {}, None
+            return
+        # Siempre del primario: una réplica retrasada daría por vigente un snapshot viejo
+        async with AsyncSessionLocal() as db:
+            self._generations = await bank_generations(db)
+        if not force and mtime == self._manifest_mtime:
+            return
+
+        with self._lock:
+            with open(manifest_path, "rb") as f:
+                manifest = json.load(f)
+            snapshots = {}
+            for licence_id, entry in manifest["licences"].items():
+                variants = {}
+                for encoding in entry["encodings"]:
+                    path = os.path.join(self.directory, entry["file"] + ENCODING_SUFFIXES[encoding])
+                    try:
+                        with open(path, "rb") as f:
+                            variants[encoding] = f.read()
+                    except FileNotFoundError:
+                        continue
+                if "identity" in variants:
+                    snapshots[int(licence_id)] = Snapshot(
+                        int(licence_id), entry["digest"], entry["file"], entry.get("generation"),
+                        question_bank_cache.revision(int(licence_id)), variants
+                    )
+            self._snapshots = snapshots
+            self._files = {snapshot.filename: snapshot for snapshot in snapshots.values()}
+            self._manifest_mtime = mtime
+
+    def _is_current(self, snapshot: Snapshot) -> bool:
+        return (
+            snapshot.generation == self._generations.get(snapshot.licence_id, 0)
+            and snapshot.revision == question_bank_cache.revision(snapshot.licence_id)
+        )
+
+    def discard(self, licence_id: int):
+        """Deja de servir el snapshot de la licencia (tras escribir en su banco)."""
+        with self._lock:
+            self._snapshots.pop(licence_id, None)
+
+    async def get(self, licence_id: int) -> Optional[Snapshot]:
+        """Snapshot vigente de la licencia, o None si no existe o quedó obsoleto."""
+        await self.reload()
+        snapshot = self._snapshots.get(licence_id)
+        if snapshot is None or not self._is_current(snapshot):
+            return None
+        return snapshot
+
+    async def get_by_filename(self, filename: str) -> Optional[Snapshot]:
+        """Snapshot por nombre de archivo (con hash), vigente o no: su contenido nunca cambia."""
+        await self.reload()
+        return self._files.get(filename)
+
+    async def manifest(self) -> dict:
+        await self.reload()
+        return {
+            str(licence_id): {"digest": snapshot.digest, "file": snapshot.filename}
+            for licence_id, snapshot in sorted(self._snapshots.items())
+            if self._is_current(snapshot)
+        }
+
+
+snapshot_store = SnapshotStore()
+
+
+def negotiate_encoding(accept_encoding: str, snapshot: Snapshot) -> str:
+    """Elige la mejor codificación disponible según la cabecera Accept-Encoding."""
+    accepted = {
+        part.split(";")[0].strip().lower()
+        for part in (accept_encoding or "").split(",")
+        if not part.strip().endswith(";q=0")
+    }
+    for encoding in ("br", "gzip"):
+        if encoding in accepted and encoding in snapshot.variants:
+            return encoding
+    return "identity"
+
+
+def snapshot_response(request: Request, snapshot: Snapshot, cache_control: str) -> Response:
+    """
+    Respuesta con los bytes precomprimidos del snapshot y un ETag fuerte (el hash del contenido).
+    Si el cliente ya tiene esa versión (If-None-Match) se responde 304 sin cuerpo.
+    """
+    headers = {"ETag": snapshot.etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if snapshot.etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+
+    encoding = negotiate_encoding(request.headers.get("accept-encoding", ""), snapshot)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=snapshot.variants[encoding], media_type="application/json", headers=headers)
+
+
+async def _build_cli(directory: str):
+    from database import AsyncSessionLocal, async_engine
+
+    async with AsyncSessionLocal() as db:
+        manifest = await build_snapshots(db, directory)
+    await async_engine.dispose()
+    for licence_id, entry in manifest["licences"].items():
+        print(f"Licencia {licence_id}: {entry['file']} {entry['bytes']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Snapshots estáticos del banco de preguntas.")
+    parser.add_argument("command", choices=["build"])
+    parser.add_argument("--dir", default=SNAPSHOT_DIR)
+    args = parser.parse_args()
+    asyncio.run(_build_cli(args.dir))
@@ -0,0 +1,70 @@
+# tests/conftest.py
+import os
+import tempfile
+
+import pytest
+
+# Los módulos de la app leen su configuración del entorno al importarse, así que se fija
+# antes que nada: SQLite temporal salvo que DATABASE_URL apunte a otra base de datos
+_TMP = tempfile.mkdtemp(prefix="ant-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_TMP, 'test.db')}")
+os.environ.setdefault("RAILWAY_ENVIRONMENT", "production")
+os.environ.setdefault("IMAGE_UPLOADER", "local")
+for _name in ("UPLOAD_DIR", "IMAGE_CACHE_DIR", "SNAPSHOT_DIR"):
+    os.environ.setdefault(_name, os.path.join(_TMP, _name.lower()))
+
+
+@pytest.fixture(scope="session")
+def schema():
+    import models
+    from database import SessionLocal, engine
+
+    models.Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        # merge: si DATABASE_URL apunta a una base con datos, los catálogos ya existen
+        db.merge(models.Version(id=1, year=2025, enable=True))
+        db.merge(models.Type(id=1, name="Profesionales"))
+        db.merge(models.QuestionType(id=1, name="Señales"))
+        db.commit()
+
+
+@pytest.fixture
+def make_licence(schema):
+    """
+    Crea una licencia nueva con una pregunta (y dos opciones) por cada `num` de la lista y
+    devuelve su id. Cada prueba usa su propia licencia, así que las cachés del proceso
+    (banco, índices, claves de respuesta) nunca tienen datos de otra prueba.
+    """
+    import models
+    from database import SessionLocal
+
+    def make(nums=(1, 2, 3)) -> int:
+        with SessionLocal() as db:
+            licence = models.LicenceType(name="Prueba", type_id=1, version_id=1, enable=True)
+            db.add(licence)
+            db.flush()
+            for num in nums:
+                question = models.Question(
+                    text=f"Pregunta {num} sobre señales", num=num,
+                    licence_type_id=licence.id, question_type_id=1,
+                )
+                question.choices = [
+                    models.Choice(text="Correcta", is_correct=True),
+                    models.Choice(text="Incorrecta", is_correct=False),
+                ]
+                db.add(question)
+            db.commit()
+            return licence.id
+
+    return make
+
+
+@pytest.fixture(scope="session")
+def client(schema):
+    from fastapi.testclient import TestClient
+    import main
+
+    # Dentro de `with` todas las peticiones comparten el bucle de eventos (asyncpg no admite
+    # usar una conexión del pool desde otro bucle) y se ejecuta el lifespan de la app
+    with TestClient(main.app) as client:
+        yield client
@@ -0,0 +1,161 @@
+# tests/test_admission.py
+import asyncio
+
+import admission
+from admission import AdmissionClass, AdmissionController
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def _queued(admission_class: AdmissionClass, timeout: float = 5) -> asyncio.Task:
+    """Lanza un acquire que tiene que esperar y devuelve su tarea cuando ya está en la cola."""
+    task = asyncio.create_task(admission_class.acquire(timeout))
+    while not admission_class._waiters:
+        await asyncio.sleep(0)
+    return task
+
+
+def test_release_hands_slot_to_next_waiter():
+    async def scenario():
+        budget = AdmissionClass("test", limit=1, queue_size=2)
+        assert await budget.acquire(1)
+        waiter = await _queued(budget)
+
+        budget.release()
+        assert await waiter is True
+        # El hueco pasó directamente a la petición en cola: sigue ocupado
+        assert budget.active == 1
+        assert budget.stats()["queued"] == 0
+
+        budget.release()
+        assert budget.active == 0
+        stats = budget.stats()
+        assert stats["admitted"] == 2
+        assert stats["queued_total"] == 1
+        assert stats["wait_avg_ms"] >= 0
+
+    run(scenario())
+
+
+def test_queue_full_is_rejected_immediately():
+    async def scenario():
+        budget = AdmissionClass("test", limit=1, queue_size=1)
+        assert await budget.acquire(1)
+        waiter = await _queued(budget)
+        assert await budget.acquire(1) is False
+        assert budget.rejected_queue_full == 1
+        budget.release()
+        assert await waiter is True
+        budget.release()
+        assert budget.active == 0
+
+    run(scenario())
+
+
+def test_timeout_without_grant_leaves_the_queue():
+    async def scenario():
+        budget = AdmissionClass("test", limit=1, queue_size=2)
+        assert await budget.acquire(1)
+        assert await budget.acquire(0.01) is False
+        assert budget.rejected_timeout == 1
+        assert budget.stats()["queued"] == 0
+        budget.release()
+        assert budget.active == 0
+        # Las esperas que acaban en rechazo no cuentan en la media
+        assert budget.stats()["wait_avg_ms"] == 0.0
+
+    run(scenario())
+
+
+def test_timeout_racing_a_grant_passes_the_slot_on(monkeypatch):
+    async def scenario():
+        budget = AdmissionClass("test", limit=1, queue_size=2)
+        assert await budget.acquire(1)
+        late = asyncio.create_task(budget.acquire(5))
+        await asyncio.sleep(0)
+
+        async def granted_then_timeout(awaitable, timeout):
+            # El hueco llega justo cuando vence la espera
+            budget.release()
+            awaitable.cancel()
+            raise asyncio.TimeoutError
+
+        monkeypatch.setattr(admission.asyncio, "wait_for", granted_then_timeout)
+        try:
+            assert await budget.acquire(1) is False
+        finally:
+            monkeypatch.undo()
+        assert budget.rejected_timeout == 1
+
+        # `late` estaba en la cola antes: el hueco no se pierde, pasa a la siguiente
+        assert await late is True
+        assert budget.active == 1
+        budget.release()
+        assert budget.active == 0
+
+    run(scenario())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        budget = AdmissionClass("test", limit=1, queue_size=2)
+        assert await budget.acquire(1)
+        waiter = await _queued(budget)
+
+        waiter.cancel()  # El cliente se desconecta mientras espera
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert waiter.cancelled()
+        assert budget.stats()["queued"] == 0
+
+        budget.release()
+        assert budget.active == 0
+
+    run(scenario())
+
+
+def test_cancellation_after_grant_releases_the_slot():
+    async def scenario():
+        budget = AdmissionClass("test", limit=1, queue_size=2)
+        assert await budget.acquire(1)
+        waiter = await _queued(budget)
+
+        budget.release()  # Se concede el hueco...
+        waiter.cancel()  # ...pero el cliente se va antes de que la petición continúe
+        result = await asyncio.gather(waiter, return_exceptions=True)
+        if not waiter.cancelled():
+            # En Python < 3.12 wait_for da prioridad al resultado ya concedido: la petición
+            # sigue adelante con su hueco y lo devuelve al terminar
+            assert result == [True]
+            budget.release()
+        # En ningún caso se pierde el hueco
+        assert budget.active == 0
+        assert budget.stats()["queued"] == 0
+
+    run(scenario())
+
+
+def test_db_budget_is_shared_between_classes():
+    async def scenario():
+        controller = AdmissionController(
+            {"bank": (4, 4), "exams": (4, 4), "cached": (4, 4), "default": (4, 4), "db": (1, 1)},
+            queue_timeout=0.01,
+        )
+        bank = controller.budgets("GET", "/questions/by_licence/1")
+        exams = controller.budgets("GET", "/exams/generate")
+        assert [budget.name for budget in bank] == ["bank", "db"]
+        assert [budget.name for budget in controller.budgets("GET", "/licences/1")] == ["cached"]
+
+        assert await controller.acquire(bank)
+        # Exámenes tiene hueco en su clase pero no en el pool: se rechaza y devuelve su hueco
+        assert await controller.acquire(exams) is False
+        assert controller.classes["exams"].active == 0
+        assert controller.classes["db"].rejected_timeout == 1
+
+        controller.release(bank)
+        assert await controller.acquire(exams)
+        controller.release(exams)
+        assert all(budget.active == 0 for budget in controller.classes.values())
+
+    run(scenario())
@@ -0,0 +1,35 @@
+# tests/test_bank_watcher.py
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_cli_import_invalidates_running_server(client, make_licence, tmp_path):
+    licence_id = make_licence([1, 2])
+    url = f"/questions/by_licence/{licence_id}"
+    before = client.get(url).json()
+    # Carga la clave de respuestas en memoria antes de importar
+    answers = [{"question_id": question["id"]} for question in before]
+    assert client.post("/exams/grade?record=false", json={"licence_id": licence_id, "answers": answers}).status_code == 200
+
+    rows = tmp_path / "preguntas.jsonl"
+    rows.write_text(json.dumps({
+        "licence_type_id": licence_id, "question_type_id": 1, "text": "Pregunta importada",
+        "choices": [{"text": "Sí", "is_correct": True}, {"text": "No", "is_correct": False}],
+    }) + "\n", encoding="utf-8")
+    # Otro proceso, como una importación por línea de comandos contra el mismo servidor
+    subprocess.run([sys.executable, "-m", "importer", str(rows)], cwd=ROOT, check=True, capture_output=True)
+
+    assert client.post("/admin/bank-watcher/check").json()["invalidations"] >= 1
+    after = client.get(url).json()
+    assert [question["num"] for question in after] == [1, 2, 3]
+    imported = after[-1]
+    correct = next(choice["id"] for choice in imported["choices"] if choice["is_correct"])
+    graded = client.post("/exams/grade?record=false", json={
+        "licence_id": licence_id, "answers": [{"question_id": imported["id"], "choice_id": correct}],
+    })
+    assert graded.status_code == 200
+    assert graded.json()["correct"] == 1
@@ -0,0 +1,51 @@
+# tests/test_images.py
+import io
+
+from PIL import Image
+
+from images import IMAGE_VARIANT_WIDTHS
+from uploads import LocalUploader
+
+WIDTH = IMAGE_VARIANT_WIDTHS[0]
+
+
+def upload_png(color: str) -> str:
+    buffer = io.BytesIO()
+    Image.new("RGB", (WIDTH * 2, WIDTH), color).save(buffer, format="PNG")
+    # Misma carpeta y URL que las subidas locales (IMAGE_UPLOADER=local en conftest)
+    return LocalUploader().upload(buffer.getvalue(), "senal.png")
+
+
+def test_variant_is_webp_with_etag_and_revalidates(client):
+    src = upload_png("blue")
+
+    response = client.get(f"/images/{WIDTH}", params={"src": src}, headers={"Accept": "image/webp,*/*"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/webp"
+    assert response.headers["vary"] == "Accept"
+    etag = response.headers["etag"]
+    with Image.open(io.BytesIO(response.content)) as variant:
+        assert variant.format == "WEBP"
+        assert variant.size == (WIDTH, WIDTH // 2)
+
+    revalidated = client.get(
+        f"/images/{WIDTH}", params={"src": src}, headers={"Accept": "image/webp,*/*", "If-None-Match": etag}
+    )
+    assert revalidated.status_code == 304
+    assert revalidated.headers["etag"] == etag
+    assert revalidated.content == b""
+
+
+def test_rejects_unknown_hosts_paths_and_widths(client):
+    src = upload_png("green")
+    assert client.get("/images/123", params={"src": src}).status_code == 404
+    assert client.get(f"/images/{WIDTH}", params={"src": "https://example.com/senal.png"}).status_code == 400
+    assert client.get(f"/images/{WIDTH}", params={"src": "file:///etc/passwd"}).status_code == 400
+    assert client.get(f"/images/{WIDTH}", params={"src": "/media/../conftest.py"}).status_code == 400
+    assert client.get(f"/images/{WIDTH}", params={"src": "/media/no-existe.png"}).status_code == 404
+
+
+def test_corrupt_image_is_a_client_error(client):
+    src = LocalUploader().upload(b"\x89PNG\r\n\x1a\nesto no es una imagen", "rota.png")
+    response = client.get(f"/images/{WIDTH}", params={"src": src, "fmt": "jpeg"})
+    assert response.status_code == 422
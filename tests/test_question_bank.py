@@ -0,0 +1,23 @@
+# tests/test_question_bank.py
+import json
+
+
+def test_unnumbered_questions_in_full_paged_and_stream_responses(client, make_licence):
+    licence_id = make_licence([2, None, 1])
+    url = f"/questions/by_licence/{licence_id}"
+
+    full = client.get(url)
+    assert full.status_code == 200
+    assert [question["num"] for question in full.json()] == [1, 2, None]
+
+    first = client.get(url, params={"limit": 2})
+    assert first.status_code == 200
+    assert [question["num"] for question in first.json()] == [1, 2]
+    second = client.get(url, params={"limit": 2, "after": first.headers["X-Next-After"]})
+    assert second.status_code == 200
+    assert second.json() == full.json()[2:]
+    assert "X-Next-After" not in second.headers
+
+    stream = client.get(url, params={"stream": "true"})
+    assert stream.status_code == 200
+    assert [json.loads(line) for line in stream.text.splitlines()] == full.json()
@@ -0,0 +1,54 @@
+# tests/test_question_numbering.py
+from concurrent.futures import ThreadPoolExecutor
+import json
+
+import pytest
+from sqlalchemy import select
+
+from database import SessionLocal
+import models
+import question_numbering
+
+CHOICES = [{"text": "Sí", "is_correct": True}, {"text": "No", "is_correct": False}]
+CREATES = 12
+IMPORTS = 4
+IMPORTED_PER_FILE = 5
+
+
+def test_concurrent_creates_and_imports_get_unique_gapless_nums(client, make_licence):
+    licence_id = make_licence([])
+
+    def create(i):
+        return client.post("/questions/", data={
+            "text": f"Pregunta creada {i}", "licence_type_id": licence_id, "question_type_id": 1,
+            "choices_json": json.dumps(CHOICES),
+        })
+
+    def import_file(i):
+        rows = "".join(
+            json.dumps({
+                "licence_type_id": licence_id, "question_type_id": 1,
+                "text": f"Pregunta importada {i}.{j}", "choices": CHOICES,
+            }) + "\n"
+            for j in range(IMPORTED_PER_FILE)
+        )
+        return client.post("/questions/import", files={"file": (f"preguntas-{i}.jsonl", rows.encode())})
+
+    # Las peticiones de varios hilos se ejecutan a la vez en el bucle de eventos del cliente
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        creates = [pool.submit(create, i) for i in range(CREATES)]
+        imports = [pool.submit(import_file, i) for i in range(IMPORTS)]
+        responses = [future.result() for future in creates + imports]
+    assert [response.status_code for response in responses] == [201] * CREATES + [200] * IMPORTS
+
+    with SessionLocal() as db:
+        nums = db.scalars(select(models.Question.num).where(models.Question.licence_type_id == licence_id)).all()
+    expected = CREATES + IMPORTS * IMPORTED_PER_FILE
+    # Únicos y sin huecos: exactamente 1..N
+    assert sorted(nums) == list(range(1, expected + 1))
+
+
+def test_unsupported_dialect_fails_fast():
+    question_numbering.check_dialect("sqlite")
+    with pytest.raises(RuntimeError, match="mysql"):
+        question_numbering.check_dialect("mysql")
@@ -0,0 +1,68 @@
+# tests/test_replicas.py
+from fastapi import Depends, FastAPI
+from sqlalchemy import create_engine, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+import httpx
+
+import database
+from database import PRIMARY_COOKIE, ReplicaFallbackMiddleware, ReplicaRouter, get_async_db, get_read_db
+import models
+
+PRIMARY_YEAR = 2025  # El de la versión 1 que crea conftest en el primario
+REPLICA_YEAR = 1999
+
+
+def replica_app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(ReplicaFallbackMiddleware)
+
+    @app.get("/year")
+    async def read_year(db: AsyncSession = Depends(get_read_db)):
+        return {"year": await db.scalar(select(models.Version.year).where(models.Version.id == 1))}
+
+    @app.post("/enable")
+    async def write(db: AsyncSession = Depends(get_async_db)):
+        await db.execute(update(models.Version).where(models.Version.id == 1).values(enable=True))
+        await db.commit()
+        return {}
+
+    return app
+
+
+def test_reads_route_to_healthy_replica_and_fall_back_to_primary(client, tmp_path, monkeypatch):
+    # Réplica sana: otro archivo SQLite con un año distinto para saber de dónde se leyó
+    healthy_url = f"sqlite:///{tmp_path / 'replica.db'}"
+    engine = create_engine(healthy_url)
+    models.Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(models.Version.__table__.insert().values(id=1, year=REPLICA_YEAR, enable=True))
+    engine.dispose()
+    # La réplica caída va primero en el round-robin
+    router = ReplicaRouter([f"sqlite:///{tmp_path / 'no-existe' / 'replica.db'}", healthy_url], check_seconds=0)
+    monkeypatch.setattr(database, "replica_router", router)
+    broken, healthy = router.replicas
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=replica_app())
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as http:
+            # La réplica caída falla al conectar: la petición se repite en el primario
+            first = await http.get("/year")
+            assert first.status_code == 200
+            assert first.json() == {"year": PRIMARY_YEAR}
+            assert router.retries == 1
+            assert not broken.healthy and broken.failures == 1
+
+            # Las siguientes lecturas van a la réplica sana
+            assert (await http.get("/year")).json() == {"year": REPLICA_YEAR}
+            assert healthy.reads == 1
+
+            # Tras escribir, el mismo cliente lee del primario (cookie de lectura tras escritura)
+            written = await http.post("/enable")
+            assert PRIMARY_COOKIE in written.cookies
+            router.last_write = 0.0  # Solo cuenta la cookie, no la escritura de este worker
+            assert (await http.get("/year")).json() == {"year": PRIMARY_YEAR}
+            assert healthy.reads == 1
+        await router.stop()
+
+    # En el bucle de eventos del cliente, que es el dueño del pool del primario
+    client.portal.call(scenario)
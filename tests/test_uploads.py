@@ -0,0 +1,91 @@
+# tests/test_uploads.py
+import io
+
+from PIL import Image
+from sqlalchemy import select
+
+from cache import question_bank_cache
+from database import SessionLocal
+import models
+import uploads
+from uploads import ImageJob, LocalUploader, UploadPipeline
+
+
+def png_bytes() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), "red").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class FlakyUploader:
+    """Falla las primeras `failures` subidas y después delega en `uploader`."""
+
+    def __init__(self, uploader, failures: int):
+        self.uploader = uploader
+        self.failures = failures
+        self.calls = 0
+
+    def upload(self, data: bytes, filename: str) -> str:
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError("subida fallida")
+        return self.uploader.upload(data, filename)
+
+
+def first_question(licence_id: int) -> models.Question:
+    with SessionLocal() as db:
+        return db.scalars(select(models.Question).where(models.Question.licence_type_id == licence_id)).first()
+
+
+def run_job(client, pipeline: UploadPipeline, job: ImageJob):
+    # En el bucle de eventos del cliente, como lo encola create_question
+    async def scenario():
+        pipeline.submit(job)
+        await pipeline.drain()
+
+    client.portal.call(scenario)
+
+
+def test_upload_fills_image_and_invalidates_bank(client, make_licence, tmp_path):
+    licence_id = make_licence([1])
+    question = first_question(licence_id)
+    revision = question_bank_cache.revision(licence_id)
+    pipeline = UploadPipeline(uploader=LocalUploader(str(tmp_path), "/media"), retries=0)
+
+    run_job(client, pipeline, ImageJob(models.Question, question.id, licence_id, png_bytes(), "senal.png"))
+
+    assert pipeline.stats() == {"pending": 0, "completed": 1, "failed": 0}
+    image = first_question(licence_id).image
+    assert image.startswith("/media/") and image.endswith(".png")
+    assert (tmp_path / image.rsplit("/", 1)[1]).exists()
+    assert question_bank_cache.revision(licence_id) > revision
+
+
+def test_upload_retries_then_succeeds(client, make_licence, tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_RETRY_BACKOFF", 0)
+    licence_id = make_licence([1])
+    question = first_question(licence_id)
+    uploader = FlakyUploader(LocalUploader(str(tmp_path), "/media"), failures=2)
+    pipeline = UploadPipeline(uploader=uploader, retries=2)
+
+    run_job(client, pipeline, ImageJob(models.Question, question.id, licence_id, png_bytes(), "senal.png"))
+
+    assert uploader.calls == 3
+    assert pipeline.stats()["completed"] == 1
+    assert first_question(licence_id).image is not None
+
+
+def test_upload_counts_failure_after_retries(client, make_licence, tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_RETRY_BACKOFF", 0)
+    licence_id = make_licence([1])
+    question = first_question(licence_id)
+    revision = question_bank_cache.revision(licence_id)
+    uploader = FlakyUploader(LocalUploader(str(tmp_path), "/media"), failures=10)
+    pipeline = UploadPipeline(uploader=uploader, retries=2)
+
+    run_job(client, pipeline, ImageJob(models.Question, question.id, licence_id, png_bytes(), "senal.png"))
+
+    assert uploader.calls == 3
+    assert pipeline.stats() == {"pending": 0, "completed": 0, "failed": 1}
+    assert first_question(licence_id).image is None
+    assert question_bank_cache.revision(licence_id) == revision
@@ -0,0 +1,164 @@
+# uploads.py
+"""
+Subida de imágenes fuera del camino de la petición.
+
+`create_question` guarda la pregunta sin esperar a Cloudinary: la imagen se encola en
+`upload_pipeline`, que la sube en un pool de hilos (con concurrencia limitada y reintentos)
+y después rellena la columna `image` de la fila correspondiente. Al terminar genera las
+versiones reducidas de la imagen para /images (ver images.py).
+
+IMAGE_UPLOADER=local guarda las imágenes en disco (UPLOAD_DIR) en lugar de Cloudinary,
+útil para desarrollo y pruebas sin credenciales.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional, Set
+from dotenv import load_dotenv
+from sqlalchemy import update
+import asyncio
+import hashlib
+import io
+import logging
+import os
+
+import cloudinary
+import cloudinary.uploader
+
+from cache import question_bank_cache
+import models
+
+load_dotenv()
+
+IMAGE_UPLOADER = os.getenv("IMAGE_UPLOADER", "cloudinary")
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", "4"))
+UPLOAD_RETRIES = int(os.getenv("UPLOAD_RETRIES", "3"))
+UPLOAD_RETRY_BACKOFF = float(os.getenv("UPLOAD_RETRY_BACKOFF", "0.5")) # Segundos; se duplica en cada intento
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "media")
+UPLOAD_BASE_URL = os.getenv("UPLOAD_BASE_URL", "/media")
+
+logger = logging.getLogger("uploads")
+
+# Solo guarda las credenciales en memoria: no abre conexiones
+cloudinary.config(
+    cloud_name=os.getenv('CLOUDINARY_CLOUD_NAME'),
+    api_key=os.getenv('CLOUDINARY_API_KEY'),
+    api_secret=os.getenv('CLOUDINARY_API_SECRET'),
+    secure=True
+)
+
+
+class CloudinaryUploader:
+    def upload(self, data: bytes, filename: str) -> str:
+        upload_result = cloudinary.uploader.upload(io.BytesIO(data), resource_type="image")
+        image_url = upload_result.get("secure_url")
+        if not image_url:
+            raise RuntimeError("No se pudo obtener la URL de la imagen de Cloudinary.")
+        return image_url
+
+
+class LocalUploader:
+    """Guarda las imágenes en un directorio local con el hash del contenido como nombre."""
+
+    def __init__(self, directory: str = UPLOAD_DIR, base_url: str = UPLOAD_BASE_URL):
+        self.directory = directory
+        self.base_url = base_url.rstrip("/")
+
+    def upload(self, data: bytes, filename: str) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        extension = os.path.splitext(filename or "")[1].lower() or ".bin"
+        name = hashlib.sha256(data).hexdigest()[:24] + extension
+        path = os.path.join(self.directory, name)
+        if not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(data)
+        return f"{self.base_url}/{name}"
+
+
+def get_uploader():
+    if IMAGE_UPLOADER == "local":
+        return LocalUploader()
+    return CloudinaryUploader()
+
+
+@dataclass
+class ImageJob:
+    model: type  # models.Question o models.Choice
+    row_id: int
+    licence_id: int  # Para invalidar la caché del banco cuando se rellene la URL
+    data: bytes
+    filename: str
+
+
+class UploadPipeline:
+    """
+    Cola de subidas en segundo plano: limita las subidas simultáneas, reintenta con
+    espera exponencial y guarda la URL resultante en la fila cuando termina.
+    """
+
+    def __init__(self, uploader=None, concurrency: int = UPLOAD_CONCURRENCY, retries: int = UPLOAD_RETRIES):
+        self.uploader = uploader or get_uploader()
+        self.retries = retries
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="image-upload")
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._concurrency = concurrency
+        self._tasks: Set[asyncio.Task] = set()
+        self.completed = 0
+        self.failed = 0
+
+    def submit(self, job: ImageJob) -> asyncio.Task:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._concurrency)
+        task = asyncio.create_task(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _upload(self, job: ImageJob) -> str:
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.retries + 1):
+            try:
+                return await loop.run_in_executor(self._executor, self.uploader.upload, job.data, job.filename)
+            except Exception as e:
+                if attempt == self.retries:
+                    raise
+                delay = UPLOAD_RETRY_BACKOFF * 2 ** attempt
+                logger.warning("Fallo al subir %s (intento %d): %s. Reintentando en %.1fs",
+                               job.filename, attempt + 1, e, delay)
+                await asyncio.sleep(delay)
+
+    async def _run(self, job: ImageJob):
+        from database import AsyncSessionLocal
+        from question_numbering import bump_generation
+        from snapshots import snapshot_store
+
+        async with self._semaphore:
+            try:
+                image_url = await self._upload(job)
+                async with AsyncSessionLocal() as db:
+                    await db.execute(update(job.model).where(job.model.id == job.row_id).values(image=image_url))
+                    await bump_generation(db, job.licence_id)
+                    await db.commit()
+            except Exception as e:
+                self.failed += 1
+                logger.error("No se pudo subir la imagen %s de %s %d: %s",
+                             job.filename, job.model.__tablename__, job.row_id, e)
+                return
+        self.completed += 1
+        question_bank_cache.invalidate(job.licence_id)
+        snapshot_store.discard(job.licence_id)
+        # Versiones reducidas para /images, a partir de los bytes que ya están en memoria
+        from images import IMAGE_VARIANT_WIDTHS, image_store
+
+        if IMAGE_VARIANT_WIDTHS:
+            await image_store.pregenerate(image_url, job.data)
+
+    async def drain(self):
+        """Espera a que terminen las subidas pendientes (al apagar la aplicación)."""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {"pending": len(self._tasks), "completed": self.completed, "failed": self.failed}
+
+
+upload_pipeline = UploadPipeline()